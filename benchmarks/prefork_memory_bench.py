@@ -0,0 +1,97 @@
+"""Benchmark of the memory used by each worker of a pre-fork server.
+
+Registers a number of wide schemas with a SchemaRegistry and forks workers
+which each validate a document against every schema, reporting the RSS of
+each worker and how much of it is private to the worker (i.e. not shared with
+the master). Compares building the schemas in each worker with preparing the
+registry in the master before forking. Requires Linux's /proc.
+
+Run from the repository root:
+
+    python benchmarks/prefork_memory_bench.py [num_schemas] [num_workers]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemer import Schema, Array
+from schemer.registry import SchemaRegistry
+from schemer.validators import gte, lte, one_of, length
+
+
+def wide_schema(num_fields=100):
+    address = Schema({
+        "street": {"type": basestring, "required": True, "validates": length(1, 100)},
+        "city":   {"type": basestring, "required": True},
+        "zip":    {"type": basestring, "validates": length(5, 10)}
+    })
+    doc_spec = {"addresses": {"type": Array(address), "default": []}}
+    for i in range(num_fields):
+        doc_spec["field_{}".format(i)] = {"type": int, "default": 0,
+                                          "validates": [gte(0), lte(1000), one_of(range(0, 1000, 5))]}
+    return Schema(doc_spec)
+
+
+def document(num_fields=100):
+    doc = dict(("field_{}".format(i), 5 * i) for i in range(num_fields))
+    doc["addresses"] = [{"street": u"1 Main St", "city": u"Springfield", "zip": u"12345"}]
+    return doc
+
+
+def memory():
+    """Returns the RSS and the private (unshared) memory of this process in kB."""
+    totals = {'Rss': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    path = '/proc/self/smaps_rollup' if os.path.exists('/proc/self/smaps_rollup') else '/proc/self/smaps'
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in totals:
+                totals[key] += int(value.split()[0])
+    return totals['Rss'], totals['Private_Clean'] + totals['Private_Dirty']
+
+
+def worker(registry, num_schemas, write):
+    doc = document()
+    for i in range(num_schemas):
+        registry["schema_{}".format(i)].validate(doc)
+    os.write(write, "{} {}\n".format(*memory()))
+    os._exit(0)
+
+
+def run(num_schemas, num_workers, prepare):
+    registry = SchemaRegistry()
+    for i in range(num_schemas):
+        registry.register("schema_{}".format(i), wide_schema)
+    if prepare:
+        registry.prepare()
+
+    read, write = os.pipe()
+    pids = []
+    for _ in range(num_workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            worker(registry, num_schemas, write)
+        pids.append(pid)
+    os.close(write)
+
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read) as f:
+        results = [map(int, line.split()) for line in f]
+
+    rss = sum(r for r, _ in results) / len(results)
+    private = sum(p for _, p in results) / len(results)
+    print "{:<28} RSS {:>8} kB   private {:>8} kB   total private {:>9} kB".format(
+        "prepared before fork:" if prepare else "built in each worker:", rss, private, private * num_workers)
+
+
+def main(num_schemas=50, num_workers=8):
+    print "{} schemas, {} workers (per worker averages)".format(num_schemas, num_workers)
+    run(num_schemas, num_workers, False)
+    run(num_schemas, num_workers, True)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,82 @@
+"""Microbenchmark of applying field validations across a wide schema.
+
+Compares the previous approach of applying a field's validations, which
+allocated a closure and checked for a list on every call, with calling the
+validator chain built when the Schema is created.
+
+Run from the repository root:
+
+    python benchmarks/validation_bench.py [num_fields]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemer import Schema
+from schemer.validators import gte, lte, one_of
+
+
+def wide_schema(num_fields):
+    doc_spec = {}
+    for i in range(num_fields):
+        if i % 3 == 0:
+            validates = gte(0)
+        elif i % 3 == 1:
+            validates = [gte(0), lte(1000)]
+        else:
+            validates = [gte(0), lte(1000), one_of(range(0, 100, 7))]
+        doc_spec["field_{}".format(i)] = {"type": int, "validates": validates}
+    return Schema(doc_spec)
+
+
+def apply_closure(errors, path, validations, value):
+    """The previous implementation of Schema._apply_validations."""
+    def apply(fn):
+        error = fn(value)
+        if error:
+            errors[path] = error
+
+    if isinstance(validations, list):
+        for validation in validations:
+            apply(validation)
+    else:
+        apply(validations)
+
+
+def previous(schema, document):
+    errors = {}
+    for field, spec in schema.doc_spec.iteritems():
+        apply_closure(errors, field, spec['validates'], document[field])
+    return errors
+
+
+def current(schema, document):
+    errors = {}
+    for field_spec in schema._fields:
+        field = field_spec.name
+        error = field_spec.validation(document[field])
+        if error:
+            errors[field] = error
+    return errors
+
+
+def main(num_fields=200, number=2000):
+    schema = wide_schema(num_fields)
+    document = dict(("field_{}".format(i), 7 * (i % 14)) for i in range(num_fields))
+    schema.validate(document)
+
+    results = []
+    for name, fn in [("closure per call", previous), ("validator chain", current)]:
+        seconds = min(timeit.repeat(lambda: fn(schema, document), number=number, repeat=3))
+        results.append(seconds)
+        print "{:<20} {:8.2f} us per document".format(name, seconds / number * 1e6)
+    print "{:<20} {:8.2f}x".format("speedup", results[0] / results[1])
+
+    seconds = min(timeit.repeat(lambda: schema.validate(document), number=number, repeat=3))
+    print "{:<20} {:8.2f} us per document".format("Schema.validate", seconds / number * 1e6)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -1,23 +1,273 @@
-import types, copy
+import os, types, copy, time, threading
+from functools import partial
 from inspect import getargspec
-from exceptions import ValidationException, SchemaFormatException
+from multiprocessing.pool import ThreadPool
+from random import Random
+from exceptions import ValidationException, SchemaFormatException, BudgetExceededException
 from extension_types import Mixed
+from validators import Validator, Chain, Length, chain
+from coercion import coerce as _coerce
+from type_checks import type_check as _type_check
+
+
+class Sample(object):
+    """Describes the items of an Array which should be validated when a
+    document is validated with sampling enabled: the first and last items,
+    every stride'th item and a random selection of the remaining items
+    (deterministic if a seed is given). If escalate is True and any sampled
+    item is invalid, all the items in the Array are validated."""
+    __slots__ = ('first', 'last', 'stride', 'random', 'seed', 'escalate')
+
+    def __init__(self, first=0, last=0, stride=None, random=0, seed=None, escalate=False):
+        if stride is not None and stride < 1:
+            raise ValueError("Sample stride must be at least 1")
+        self.first = first
+        self.last = last
+        self.stride = stride
+        self.random = random
+        self.seed = seed
+        self.escalate = escalate
+
+    def indices(self, length):
+        """Returns the sorted indices of the items to validate in a list of
+        the given length."""
+        start = min(self.first, length)
+        end = max(length - self.last, start)
+        indices = set(xrange(start))
+        indices.update(xrange(end, length))
+        if self.stride:
+            indices.update(xrange(0, length, self.stride))
+        if self.random and start < end:
+            middle = xrange(start, end)
+            indices.update(Random(self.seed).sample(middle, min(self.random, len(middle))))
+        return sorted(indices)
+
+
+class Budget(object):
+    """Limits on the cost of validating a document, beyond which validation
+    is abandoned: the total number of values (fields and array items)
+    visited, the number of items in any array, the depth of any embedded
+    document or array (the number of segments in its path, so a document in a
+    field of the validated document is at depth 1) and the time taken in
+    seconds. Limits which are None are not enforced."""
+    __slots__ = ('max_nodes', 'max_array_length', 'max_depth', 'timeout')
+
+    def __init__(self, max_nodes=None, max_array_length=None, max_depth=None, timeout=None):
+        if any(limit is not None and limit < 0 for limit in (max_nodes, max_array_length, max_depth, timeout)):
+            raise ValueError("Budget limits must not be negative")
+        self.max_nodes = max_nodes
+        self.max_array_length = max_array_length
+        self.max_depth = max_depth
+        self.timeout = timeout
 
 
 class Array(object):
-    def __init__(self, contained_type):
+    __slots__ = ('contained_type', 'sample')
+
+    def __init__(self, contained_type, sample=None):
         self.contained_type = contained_type
+        self.sample = sample
+
+
+class SchemaRef(object):
+    """A reference to the Schema registered under the given name with the
+    given SchemaRegistry (by default schemer.registry.default_registry), for
+    use as a field type wherever a Schema may be used. Schemas may refer to
+    themselves, e.g. for trees of documents, or to schemas registered later.
+    The reference is resolved when first used and the schema cached."""
+    __slots__ = ('name', 'registry', '_schema')
+
+    def __init__(self, name, registry=None):
+        self.name = name
+        self.registry = registry
+        self._schema = None
+
+    @property
+    def schema(self):
+        """The Schema referred to."""
+        schema = self._schema
+        if schema is None:
+            registry = self.registry
+            if registry is None:
+                from schemer.registry import default_registry as registry
+            try:
+                schema = self._schema = registry.get(self.name)
+            except KeyError:
+                raise SchemaFormatException("Referenced schema {} is not registered", self.name)
+        return schema
+
+    def __repr__(self):
+        return "SchemaRef({!r})".format(self.name)
+
+
+class OneOf(object):
+    """A field type for embedded documents of one of several schemas: the
+    Schema (or SchemaRef) which the given mapping maps the value of the
+    document's discriminator field to. Each Schema should declare the
+    discriminator field."""
+    __slots__ = ('discriminator', 'mapping')
+
+    def __init__(self, discriminator, mapping):
+        self.discriminator = discriminator
+        self.mapping = mapping
+
+    def schema_for(self, document):
+        """Returns the Schema of the given document, or None if its
+        discriminator field doesn't hold a value in the mapping."""
+        try:
+            return _resolve(self.mapping.get(document.get(self.discriminator)))
+        except TypeError:
+            return None  # unhashable discriminator
+
+    def unknown(self, document, path):
+        """Returns the error for the given document, whose discriminator field
+        (at the given path) doesn't hold a value in the mapping."""
+        if self.discriminator not in document:
+            return "{} is required.".format(path)
+        return "{!r} is not a known {} (expected one of {})".format(
+            document[self.discriminator], self.discriminator, ", ".join(repr(tag) for tag in sorted(self.mapping)))
+
+
+def _resolve(field_type):
+    """Returns the Schema referred to by the given field type if it's a
+    SchemaRef, otherwise the field type itself."""
+    if isinstance(field_type, SchemaRef):
+        return field_type.schema
+    return field_type
+
+
+def _is_instance(value, field_type, check):
+    """Returns True if the given value is of the given type, using the given
+    check if it isn't None or isinstance otherwise."""
+    if check is None:
+        return isinstance(value, field_type)
+    return check(value)
+
+
+# The kinds of field type: a Python type, an embedded document, an embedded
+# array, a function returning one of these given the field's value, a
+# reference to a registered schema or a OneOf.
+_TYPE, _EMBEDDED, _ARRAY, _DYNAMIC, _REFERENCE, _UNION = range(6)
+
+
+def _kind(field_type):
+    """Returns the kind of the given field type."""
+    if isinstance(field_type, Schema):
+        return _EMBEDDED
+    if isinstance(field_type, Array):
+        return _ARRAY
+    if isinstance(field_type, types.FunctionType):
+        return _DYNAMIC
+    if isinstance(field_type, SchemaRef):
+        return _REFERENCE
+    if isinstance(field_type, OneOf):
+        return _UNION
+    return _TYPE
+
+
+def _length(validation):
+    """Returns the Length validator applied by the given validation, merged
+    from all of its length validators, or None if there isn't one."""
+    if isinstance(validation, Length):
+        return validation
+    if isinstance(validation, Chain):
+        for check in validation._checks:
+            if isinstance(check, Length):
+                return check
+    return None
+
+
+def _length_error(validation, value):
+    """Returns the error of the first of the Length validators applied by the
+    given validation to fail for the given value, without applying any other
+    validators, as they may examine every item of an oversized array."""
+    validators = validation.validators if isinstance(validation, Chain) else (validation,)
+    for validator in validators:
+        if isinstance(validator, Length):
+            error = validator(value)
+            if error:
+                return error
+    return _length(validation)(value)
+
+
+class FieldSpec(object):
+    """The normalized form of a field spec used internally during validation,
+    built once when a Schema is verified. Declared dict-based field specs
+    remain available via Schema.doc_spec."""
+    __slots__ = ('name', 'spec', 'type', 'kind', 'check', 'required', 'nullable', 'validation', 'length',
+                 'has_default', 'default')
+
+    def __init__(self, name, spec, validation=None):
+        self.name = name
+        self.spec = spec
+        self.type = spec['type']
+        self.kind = _kind(self.type)
+        # The check that values are of the type, if not made with isinstance
+        self.check = _type_check(self.type) if self.kind == _TYPE else None
+        self.required = spec.get('required', False)
+        # Note that for backward compatibility reasons, the default value of 'nullable'
+        # is the inverse of 'required' (which use to mean both that the key be present
+        # and not set to None).
+        self.nullable = spec.get('nullable', not self.required)
+        self.validation = validation
+        # Bounds on the length of an array are checked before its items
+        self.length = _length(validation)
+        self.has_default = 'default' in spec
+        self.default = spec.get('default')
+
+
+class _UnknownFields(list):
+    """The paths of the unknown fields found during validation, which are
+    stripped from the document if strip is True."""
+    __slots__ = ('strip',)
+
+    def __init__(self, strip):
+        list.__init__(self)
+        self.strip = strip
+
+
+class _ErrorLimitReached(Exception):
+    """Raised internally to abandon validation once an error limit is hit."""
+
+
+class _BudgetExceeded(Exception):
+    """Raised internally to abandon validation once its Budget is exceeded
+    at the given path."""
+
+    def __init__(self, message, path):
+        Exception.__init__(self, message)
+        self.path = path
+
+
+class _BoundedErrors(dict):
+    """An errors collection which stops validation, by raising
+    _ErrorLimitReached, when asked to hold more than a given number of errors."""
+
+    def __init__(self, max_errors):
+        super(_BoundedErrors, self).__init__()
+        self._max_errors = max_errors
+
+    def __setitem__(self, path, error):
+        if path not in self and len(self) >= self._max_errors:
+            raise _ErrorLimitReached()
+        dict.__setitem__(self, path, error)
 
 
 class Schema(object):
-    """A Schema encapsulates the structure and constraints of a dict."""
+    """A Schema encapsulates the structure and constraints of a dict.
+
+    A Schema is not modified after construction, so a single instance may be
+    shared between threads and used to validate and apply defaults to
+    different documents concurrently."""
+    __slots__ = ('_doc_spec', '_virtuals', '_strict', '_validates', '_validation',
+                 '_fields', '_fields_by_name', '_required', '__weakref__')
 
     def __init__(self, doc_spec, strict=True, validates=[]):
         self._doc_spec = doc_spec
         self._virtuals = {}
         self._strict = strict
-        self._verify()
         self._validates = validates
+        self._verify()
 
     @property
     def doc_spec(self):
@@ -27,57 +277,204 @@ class Schema(object):
         """Applies the defaults described by the this schema to the given
         document instance as appropriate. Defaults are only applied to
         fields which are currently unset."""
-        for field, spec in self.doc_spec.iteritems():
-            field_type = spec['type']
-            if field not in instance:
-                if 'default' in spec:
-                    default = spec['default']
-                    if callable(default):
-                        instance[field] = default()
-                    else:
-                        instance[field] = copy.deepcopy(default)
-            # Determine if a value already exists for the field
-            if field in instance:
-                value = instance[field]
-
-                # recurse into nested docs
-                if isinstance(field_type, Schema) and isinstance(value, dict):
-                    field_type.apply_defaults(value)
-
-                elif isinstance(field_type, Array) and isinstance(field_type.contained_type, Schema) and isinstance(value, list):
-                    for item in value:
-                        field_type.contained_type.apply_defaults(item)
-
-    def validate(self, instance):
+        # Embedded documents are visited using an explicit stack rather than
+        # by recursion, so documents may be nested to any depth.
+        stack = [(self, instance)]
+        while stack:
+            schema, instance = stack.pop()
+            for field_spec in schema._fields:
+                field, field_type = field_spec.name, _resolve(field_spec.type)
+                if field not in instance:
+                    if field_spec.has_default:
+                        default = field_spec.default
+                        if callable(default):
+                            instance[field] = default()
+                        else:
+                            instance[field] = copy.deepcopy(default)
+                # Determine if a value already exists for the field
+                if field in instance:
+                    value = instance[field]
+
+                    # visit nested docs
+                    if isinstance(field_type, OneOf) and isinstance(value, dict):
+                        field_type = field_type.schema_for(value)
+                    if isinstance(field_type, Schema) and isinstance(value, dict):
+                        stack.append((field_type, value))
+
+                    elif isinstance(field_type, Array) and isinstance(field_type.contained_type, (Schema, SchemaRef)) and isinstance(value, list):
+                        contained_type = _resolve(field_type.contained_type)
+                        stack.extend((contained_type, item) for item in value if isinstance(item, dict))
+
+                    elif isinstance(field_type, Array) and isinstance(field_type.contained_type, OneOf) and isinstance(value, list):
+                        for item in value:
+                            schema = field_type.contained_type.schema_for(item) if isinstance(item, dict) else None
+                            if schema is not None:
+                                stack.append((schema, item))
+
+    def prune(self, instance):
+        """Removes the fields of the given document instance which are not
+        declared by this schema, including those of any embedded documents,
+        in place. Returns the dotted paths of the removed fields."""
+        removed = []
+        stack = [(self, instance, '')]
+        while stack:
+            schema, instance, path_prefix = stack.pop()
+            for field, value in instance.items():
+                path = _append_path(path_prefix, field)
+                field_spec = schema._fields_by_name.get(field)
+                if field_spec is None:
+                    del instance[field]
+                    removed.append(path)
+                    continue
+                if value is None:
+                    continue
+
+                field_type = field_spec.type
+                if isinstance(field_type, types.FunctionType):
+                    field_type = field_type(value)
+                field_type = _resolve(field_type)
+                if isinstance(field_type, OneOf) and isinstance(value, dict):
+                    field_type = field_type.schema_for(value)
+                if isinstance(field_type, Schema):
+                    if isinstance(value, dict):
+                        stack.append((field_type, value, path))
+                elif isinstance(field_type, Array) and isinstance(value, list):
+                    contained_type = field_type.contained_type
+                    is_dynamic = isinstance(contained_type, types.FunctionType)
+                    for i, item in enumerate(value):
+                        item_type = _resolve(contained_type(item) if is_dynamic else contained_type)
+                        if isinstance(item_type, OneOf) and isinstance(item, dict):
+                            item_type = item_type.schema_for(item)
+                        if isinstance(item_type, Schema) and isinstance(item, dict):
+                            stack.append((item_type, item, _append_path(path, i)))
+        return removed
+
+    def validate(self, instance, max_errors=None, sampled=False, fields=None, coerce=False, unknown=None,
+                 budget=None):
         """Validates the given document against this schema. Raises a
-        ValidationException if there are any failures."""
-        errors = {}
-        self._validate_instance(instance, errors)
+        ValidationException if there are any failures. If max_errors is given,
+        validation stops as soon as more than that many failures are found and
+        the raised exception is marked as truncated. If sampled is True, only
+        the items chosen by the Sample of any Array declaring one are validated.
+        If fields is given, only the fields at the given dotted paths (e.g. as
+        fetched using a projection) are validated. If coerce is True, values
+        which aren't of their field's declared type are first coerced to it
+        where possible (e.g. the string "42" to an int), modifying the
+        document in place.
+
+        By default, fields not present in the schema fail validation unless
+        the schema isn't strict. If unknown is 'error' or 'ignore' they fail
+        or are ignored regardless of strictness. If it's 'count' or 'strip',
+        they're ignored, or removed from the document in place, and the
+        dotted paths of the fields found are returned.
+
+        If a Budget is given, validation is abandoned as soon as it's
+        exceeded, raising a BudgetExceededException."""
+        if unknown in ('count', 'strip'):
+            unknown = _UnknownFields(unknown == 'strip')
+        elif unknown not in (None, 'error', 'ignore'):
+            raise ValueError("unknown must be one of 'error', 'ignore', 'count' or 'strip'")
+
+        projection = None if fields is None else self._projection(fields)
+        if max_errors is None:
+            errors = {}
+        elif max_errors < 1:
+            raise ValueError("max_errors must be at least 1")
+        else:
+            errors = _BoundedErrors(max_errors)
+
+        truncated = False
+        try:
+            self._validate_instance(instance, errors, sampled=sampled, projection=projection,
+                                    coerce=coerce, unknown=unknown, budget=budget)
+        except _ErrorLimitReached:
+            truncated = True
+        except _BudgetExceeded as e:
+            raise BudgetExceededException(dict(errors), str(e), e.path)
 
         if len(errors) > 0:
-            raise ValidationException(errors)
+            raise ValidationException(dict(errors), truncated)
+        if isinstance(unknown, _UnknownFields):
+            return list(unknown)
+
+    def validate_many(self, instances, threads=None, pool=None, **kwargs):
+        """Validates each of the given documents against this schema using a
+        pool of threads. Returns a list containing, for each document in
+        order, either None if the document is valid or the ValidationException
+        describing its failures. Validation only runs in parallel where
+        validators release the GIL (e.g. C extensions). Any keyword arguments
+        are passed on to validate().
+
+        The given pool (e.g. a multiprocessing.pool.ThreadPool) is used if
+        there is one, and left open. Otherwise a pool of the given number of
+        threads (one per CPU by default) is shared by every call, being
+        created on first use (and again in each forked child process, which
+        doesn't inherit the pool's threads) and kept for the life of the
+        process."""
+        if pool is None:
+            pool = _shared_pool(threads)
+        return pool.map(partial(self._validation_failure, **kwargs), instances)
+
+    def to_json_schema(self):
+        """Returns a JSON Schema (draft 7) describing the documents this schema
+        validates, as serialized to JSON by schemer.serialization, along with
+        a list of the (path, validator) pairs of the validators (and types)
+        which have no equivalent in JSON Schema and so are left out."""
+        from schemer.json_schema import to_json_schema
+        return to_json_schema(self)
+
+    def _validation_failure(self, instance, **kwargs):
+        """Validates the given document, returning rather than raising any
+        ValidationException."""
+        try:
+            self.validate(instance, **kwargs)
+        except ValidationException as e:
+            return e
+
+    def _projection(self, fields):
+        """Builds a tree of nested dicts from the given dotted field paths, in
+        which None marks a field to be validated in its entirety."""
+        projection = {}
+        for field in fields:
+            node = projection
+            parts = field.split('.')
+            for part in parts[:-1]:
+                child = node.setdefault(part, {})
+                if child is None:
+                    break
+                node = child
+            else:
+                node[parts[-1]] = None
+        return projection
 
     def _append_path(self, prefix, field):
         """Appends the given field to the given path prefix."""
-        if prefix:
-            return "{}.{}".format(prefix, field)
-        else:
-            return field
+        return _append_path(prefix, field)
 
     def _verify(self, path_prefix=None):
-        """Verifies that this schema's doc spec is valid and makes sense."""
+        """Verifies that this schema's doc spec is valid and makes sense, building
+        the normalized field specs used during validation."""
+        fields = []
         for field, spec in self.doc_spec.iteritems():
             path = self._append_path(path_prefix, field)
 
             # Standard dict-based spec
             if isinstance(spec, dict):
-                self._verify_field_spec(spec, path)
+                fields.append(self._verify_field_spec(field, spec, path))
             else:
                 raise SchemaFormatException("Invalid field definition for {}", path)
 
+        self._fields = tuple(fields)
+        self._fields_by_name = dict((field_spec.name, field_spec) for field_spec in fields)
+        self._required = tuple(field_spec for field_spec in fields if field_spec.required)
 
-    def _verify_field_spec(self, spec, path):
-        """Verifies a given field specification is valid, recursing into nested schemas if required."""
+        # Schema level validators are fused into a single chain like those of fields
+        self._validation = chain(self._validates) if self._validates else None
+
+
+    def _verify_field_spec(self, field, spec, path):
+        """Verifies a given field specification is valid, recursing into nested schemas if
+        required, and returns its normalized FieldSpec."""
 
         # Required should be a boolean
         if 'required' in spec and not isinstance(spec['required'], bool):
@@ -94,8 +491,9 @@ class Schema(object):
         self._verify_type(spec, path)
 
         # Validations should be either a single function or array of functions
+        validation = None
         if 'validates' in spec:
-            self._verify_validates(spec, path)
+            validation = self._verify_validates(spec, path)
 
         # Defaults must be of the correct type or a function
         if 'default' in spec:
@@ -105,23 +503,43 @@ class Schema(object):
         if not set(spec.keys()).issubset(set(['type', 'required', 'validates', 'default', 'nullable'])):
             raise SchemaFormatException("Unsupported field spec item at {}. Items: "+repr(spec.keys()), path)
 
+        return FieldSpec(field, spec, validation)
+
     def _verify_type(self, spec, path):
         """Verify that the 'type' in the spec is valid"""
         field_type = spec['type']
 
-        if isinstance(field_type, Schema):
+        if isinstance(field_type, (Schema, SchemaRef, OneOf)):
             # Nested documents cannot have validation
             if not set(spec.keys()).issubset(set(['type', 'required', 'nullable', 'default'])):
                 raise SchemaFormatException("Unsupported field spec item at {}. Items: "+repr(spec.keys()), path)
+            if isinstance(field_type, OneOf):
+                self._verify_one_of(field_type, path)
             return
 
         elif isinstance(field_type, Array):
-            if not isinstance(field_type.contained_type, (type, Schema, Array, types.FunctionType)):
+            if not isinstance(field_type.contained_type, (type, Schema, SchemaRef, OneOf, Array, types.FunctionType)):
                 raise SchemaFormatException("Unsupported field type contained by Array at {}.", path)
+            if isinstance(field_type.contained_type, OneOf):
+                self._verify_one_of(field_type.contained_type, path)
+            if field_type.sample is not None and not isinstance(field_type.sample, Sample):
+                raise SchemaFormatException("Array sample at {} should be a Sample.", path)
 
         elif not isinstance(field_type, type) and not isinstance(field_type, types.FunctionType):
             raise SchemaFormatException("Unsupported field type at {}. Type must be a type, a function, an Array or another Schema", path)
 
+    def _verify_one_of(self, one_of, path):
+        """Verifies that the given OneOf maps each discriminator value to a
+        Schema declaring the discriminator field, or a SchemaRef."""
+        if not isinstance(one_of.mapping, dict) or not one_of.mapping:
+            raise SchemaFormatException("OneOf at {} should map discriminator values to schemas.", path)
+        for schema in one_of.mapping.itervalues():
+            if isinstance(schema, Schema):
+                if one_of.discriminator not in schema._fields_by_name:
+                    raise SchemaFormatException("Schema of OneOf at {} does not declare the discriminator field.", path)
+            elif not isinstance(schema, SchemaRef):
+                raise SchemaFormatException("OneOf at {} should map discriminator values to schemas.", path)
+
     def _valid_schema_default(self, value):
         return isinstance(value, dict)
 
@@ -141,13 +559,13 @@ class Schema(object):
 
             # Ensure the contents are of the correct type
             for i, item in enumerate(default):
-                if isinstance(field_type.contained_type, Schema):
+                if isinstance(field_type.contained_type, (Schema, SchemaRef, OneOf)):
                     if not self._valid_schema_default(item):
                         raise SchemaFormatException("Default value for Schema is not valid.", path)
                 elif not isinstance(item, field_type.contained_type):
                         raise SchemaFormatException("Not all items in the default list for the Array field at {} are of the correct type.", path)
 
-        elif isinstance(field_type, Schema):
+        elif isinstance(field_type, (Schema, SchemaRef, OneOf)):
             if not self._valid_schema_default(default):
                 raise SchemaFormatException("Default value for Schema is not valid.", path)
 
@@ -157,7 +575,8 @@ class Schema(object):
 
 
     def _verify_validates(self, spec, path):
-        """Verify thats the 'validates' argument is valid."""
+        """Verify thats the 'validates' argument is valid, returning the single
+        validator chain fusing its validators."""
         validates = spec['validates']
 
         if isinstance(validates, list):
@@ -166,6 +585,8 @@ class Schema(object):
         else:
             self._verify_validator(validates, path)
 
+        return chain(validates)
+
 
     def _verify_validator(self, validator, path):
         """Verifies that a given validator associated with the field at the given path is legitimate."""
@@ -174,114 +595,405 @@ class Schema(object):
         if not callable(validator):
             raise SchemaFormatException("Invalid validations for {}", path)
 
+        # Schemer's own validators are known to be valid
+        if isinstance(validator, Validator):
+            return
+
         # Validator should accept a single argument
         (args, varargs, keywords, defaults) = getargspec(validator)
         if len(args) != 1:
             raise SchemaFormatException("Invalid validations for {}", path)
 
 
-    def _validate_instance(self, instance, errors, path_prefix=''):
+    def _validate_instance(self, instance, errors, path_prefix='', sampled=False, projection=None,
+                           coerce=False, unknown=None, budget=None):
         """Validates that the given instance of a document conforms to the given schema's
         structure and validations. Any validation errors are added to the given errors
         collection. The caller should assume the instance is considered valid if the
         errors collection is empty when this method returns."""
+        validation = _Validation(errors, sampled, coerce, unknown, budget)
+        validation.stack.append((_DOCUMENT, self, instance, path_prefix, projection))
+        validation.run()
 
+    def _validate_value(self, value, field_spec, path, errors, sampled=False, projection=None, coerce=False,
+                        unknown=None, budget=None):
+        """Validates that the given field value is valid given the associated
+        FieldSpec and path. Any validation failures are added to the given errors
+        collection. If a projection is given, only the projected fields of embedded
+        documents are validated. Returns the value, which if coerce is True may
+        have been coerced to the field's type."""
+        validation = _Validation(errors, sampled, coerce, unknown, budget)
+        pending = []
+        value = validation.value(value, field_spec, path, projection, pending)
+        validation.push(pending)
+        validation.run()
+        return value
+
+    def _validate_items(self, array_type, items, indices, path, errors, sampled, projection=None, coerce=False,
+                        unknown=None):
+        """Validates the items at the given indices of the given list against
+        the type contained by the given Array."""
+        validation = _Validation(errors, sampled, coerce, unknown)
+        pending = []
+        validation.items(array_type, items, indices, path, projection, pending)
+        validation.push(pending)
+        validation.run()
+
+
+# The pools shared by calls to validate_many, with the id of the process
+# which created them, by number of threads.
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _shared_pool(threads):
+    """Returns this process's shared pool of the given number of threads,
+    creating it if it doesn't yet exist. A pool inherited from the parent of a
+    forked process has no threads, so is replaced."""
+    pid = os.getpid()
+    pool_pid, pool = _POOLS.get(threads, (None, None))
+    if pool_pid != pid:
+        with _POOLS_LOCK:
+            pool_pid, pool = _POOLS.get(threads, (None, None))
+            if pool_pid != pid:
+                pool = ThreadPool(threads)
+                _POOLS[threads] = (pid, pool)
+    return pool
+
+
+def _append_path(prefix, field):
+    """Appends the given field to the given path prefix."""
+    if prefix:
+        return "%s.%s" % (prefix, field)
+    else:
+        return field
+
+
+# The kinds of task on the stack of a _Validation: validating an embedded
+# document, applying a validator once an embedded document or array has been
+# validated, marking the number of errors found before an array's sampled
+# items are validated and, once they have been, validating the rest if any
+# were invalid.
+_DOCUMENT, _CHECK, _MARK, _ESCALATE = range(4)
+
+
+class _Validation(object):
+    """The validation of a document against a schema with the given options.
+
+    Rather than recursing into embedded documents, they are validated in turn
+    from an explicit stack of tasks, so documents may be nested to any depth
+    without reaching the interpreter's recursion limit. The values of fields
+    which are not embedded documents are validated as soon as the document
+    holding them is visited."""
+    __slots__ = ('errors', 'sampled', 'coerce', 'unknown', 'budget', 'nodes', 'deadline', 'stack')
+
+    def __init__(self, errors, sampled=False, coerce=False, unknown=None, budget=None):
+        self.errors = errors
+        self.sampled = sampled
+        self.coerce = coerce
+        self.unknown = unknown
+        self.budget = budget
+        self.nodes = 0
+        self.deadline = None
+        if budget is not None and budget.timeout is not None:
+            self.deadline = time.time() + budget.timeout
+        self.stack = []
+
+    def run(self):
+        """Performs the tasks on the stack until there are none left."""
+        stack = self.stack
+        while stack:
+            task = stack.pop()
+            kind = task[0]
+            if kind == _DOCUMENT:
+                self.document(task[1], task[2], task[3], task[4])
+            elif kind == _CHECK:
+                error = task[1](task[2])
+                if error:
+                    self.errors[task[3]] = error
+            elif kind == _MARK:
+                task[1][0] = len(self.errors)
+            else:
+                _, array_type, items, indices, path, projection, mark = task
+                if len(self.errors) > mark[0]:
+                    self.remaining_items(array_type, items, indices, path, projection)
+
+    def charge(self, path, size):
+        """Charges the visit of the given number of values held by the
+        document or array at the given path to the budget, raising
+        _BudgetExceeded if it's been exceeded."""
+        budget = self.budget
+        if budget.max_depth is not None and path and path.count('.') + 1 > budget.max_depth:
+            raise _BudgetExceeded("{} is nested more than {} deep".format(path, budget.max_depth), path)
+        self.nodes += size
+        if budget.max_nodes is not None and self.nodes > budget.max_nodes:
+            raise _BudgetExceeded("Validation visited more than {} values".format(budget.max_nodes), path)
+        if self.deadline is not None and time.time() > self.deadline:
+            raise _BudgetExceeded("Validation took longer than {}s".format(budget.timeout), path)
+
+    def push(self, pending):
+        """Pushes the given tasks onto the stack to be performed in order."""
+        if pending:
+            pending.reverse()
+            self.stack.extend(pending)
+
+    def document(self, schema, instance, path_prefix, projection):
+        """Validates the given instance of a document of the given schema."""
+        errors = self.errors
         if not isinstance(instance, dict):
             errors[path_prefix] = "Expected instance of dict to validate against schema."
             return
+        if self.budget is not None:
+            self.charge(path_prefix, len(instance))
 
-        # validate against the schema level validators
-        self._apply_validations(errors, path_prefix, self._validates, instance)
-
-        # Loop over each field in the schema and check the instance value conforms
-        # to its spec
-        for field, spec in self.doc_spec.iteritems():
-            path = self._append_path(path_prefix, field)
+        pending = []
+        if projection is not None:
+            self.projected_document(schema, instance, path_prefix, projection, pending)
+            self.push(pending)
+            return
 
-            # If the field is present, validate it's value.
-            if field in instance:
-                self._validate_value(instance[field], spec, path, errors)
+        # validate against the schema level validators (after any coercion
+        # of the fields they depend upon)
+        validation = schema._validation
+        if validation is not None:
+            if self.coerce:
+                self.stack.append((_CHECK, validation, instance, path_prefix))
             else:
-                # If not, add an error if it was a required key.
-                if spec.get('required', False):
+                error = validation(instance)
+                if error:
+                    errors[path_prefix] = error
+
+        # Loop over each field in the instance once, checking its value conforms
+        # to its spec or dealing with it as an unknown field if it has none.
+        fields_by_name = schema._fields_by_name
+        required_present = 0
+        stripped = None
+        value_of = self.value
+        for field, value in instance.iteritems():
+            field_spec = fields_by_name.get(field)
+            path = "%s.%s" % (path_prefix, field) if path_prefix else field
+            if field_spec is None:
+                if self.unknown_field(schema, path):
+                    if stripped is None:
+                        stripped = []
+                    stripped.append(field)
+                continue
+
+            if field_spec.required:
+                required_present += 1
+            coerced = value_of(value, field_spec, path, None, pending)
+            if coerced is not value:
+                instance[field] = coerced
+
+        # Only look for the missing required fields if there are any
+        if required_present < len(schema._required):
+            for field_spec in schema._required:
+                if field_spec.name not in instance:
+                    path = _append_path(path_prefix, field_spec.name)
                     errors[path] = "{} is required.".format(path)
 
-        # Now loop over each field in the given instance and make sure we don't
-        # have any fields not declared in the schema, unless strict mode has been
-        # explicitly disabled.
-        if self._strict:
-            for field in instance:
-                if field not in self.doc_spec:
-                    errors[self._append_path(path_prefix, field)] = "Unexpected document field not present in schema"
+        if stripped:
+            for field in stripped:
+                del instance[field]
+
+        self.push(pending)
 
-    def _validate_value(self, value, field_spec, path, errors):
+    def projected_document(self, schema, instance, path_prefix, projection, pending):
+        """Validates only the fields of the given instance of a document which are
+        included in the given projection. Schema level validators are skipped as
+        they may depend on fields which are not present."""
+        for field, field_projection in projection.iteritems():
+            path = _append_path(path_prefix, field)
+            field_spec = schema._fields_by_name.get(field)
+
+            if field_spec is None:
+                if field in instance and self.unknown_field(schema, path):
+                    del instance[field]
+            elif field in instance:
+                value = instance[field]
+                coerced = self.value(value, field_spec, path, field_projection, pending)
+                if coerced is not value:
+                    instance[field] = coerced
+            elif field_spec.required:
+                self.errors[path] = "{} is required.".format(path)
+
+    def unknown_field(self, schema, path):
+        """Deals with the field at the given path which isn't present in the
+        given schema as the unknown option requires, returning True if the
+        field should be stripped from the document."""
+        unknown = self.unknown
+        if unknown is None:
+            # Unknown fields are errors unless strict mode has been explicitly disabled
+            if schema._strict:
+                self.errors[path] = "Unexpected document field not present in schema"
+        elif unknown == 'error':
+            self.errors[path] = "Unexpected document field not present in schema"
+        elif unknown != 'ignore':
+            unknown.append(path)
+            return unknown.strip
+        return False
+
+    def value(self, value, field_spec, path, projection, pending):
         """Validates that the given field value is valid given the associated
-        field spec and path. Any validation failures are added to the given errors
-        collection."""
+        FieldSpec and path, adding the tasks validating any embedded documents
+        to pending. Returns the value, which may have been coerced to the
+        field's type."""
+        errors = self.errors
 
         # Check if the value is None and add an error if the field is not nullable.
-        # Note that for backward compatibility reasons, the default value of 'nullable'
-        # is the inverse of 'required' (which use to mean both that the key be present
-        # and not set to None).
         if value is None:
-            if not field_spec.get('nullable', not field_spec.get('required', False)):
+            if not field_spec.nullable:
                 errors[path] = "{} is not nullable.".format(path)
-            return
+            return value
 
         # All fields should have a type
-        field_type = field_spec['type']
-        if isinstance(field_type, types.FunctionType):
+        field_type, kind = field_spec.type, field_spec.kind
+        if kind == _DYNAMIC:
             try:
                 field_type = field_type(value)
             except Exception as e:
                 raise SchemaFormatException("Dynamic schema function raised exception: {}".format(str(e)), path)
-            if not isinstance(field_type, (type, Schema, Array)):
+            if not isinstance(field_type, (type, Schema, SchemaRef, OneOf, Array)):
                 raise SchemaFormatException("Dynamic schema function did not return a type at path {}", path)
-
-
-        # If our field is an embedded document, recurse into it
-        if isinstance(field_type, Schema):
+            kind = _kind(field_type)
+        if kind == _REFERENCE:
+            field_type, kind = field_type.schema, _EMBEDDED
+        elif kind == _UNION:
+            if isinstance(value, dict):
+                field_type = self.union(field_type, value, path)
+                if field_type is None:
+                    return value
+            kind = _EMBEDDED
+
+        if kind == _TYPE:
+            check = field_spec.check if field_type is field_spec.type else _type_check(field_type)
+            if not (isinstance(value, field_type) if check is None else check(value)):
+                if self.coerce:
+                    value = _coerce(value, field_type)
+                if not (self.coerce and _is_instance(value, field_type, check)):
+                    errors[path] = "Field should be of type {}".format(field_type)
+                    return value
+
+        # If our field is an embedded document, validate it in turn
+        elif kind == _EMBEDDED:
             if isinstance(value, dict):
-                field_type._validate_instance(value, errors, path)
+                pending.append((_DOCUMENT, field_type, value, path, projection))
             else:
                 errors[path] = "{} should be an embedded document".format(path)
-            return
+            return value
 
-        elif isinstance(field_type, Array):
-            if isinstance(value, list):
-                is_dynamic = isinstance(field_type.contained_type, types.FunctionType)
-                for i, item in enumerate(value):
-                    contained_type = field_type.contained_type
-                    if is_dynamic:
-                        contained_type = contained_type(item)
-                    instance_path = self._append_path(path, i)
-                    if isinstance(contained_type, Schema):
-                        contained_type._validate_instance(item, errors, instance_path)
-                    elif not isinstance(item, contained_type):
-                        errors[instance_path] = "Array item at {} is of incorrect type".format(instance_path)
-                        continue
-            else:
+        else:
+            if not isinstance(value, list):
                 errors[path] = "{} should be an embedded array".format(path)
-                return
-
-        elif not isinstance(value, field_type):
-            errors[path] = "Field should be of type {}".format(field_type)
+                return value
+
+            # The budget is enforced before the length of an array is checked, so
+            # that an oversized array is rejected by it whatever its validators
+            budget = self.budget
+            if budget is not None:
+                if budget.max_array_length is not None and len(value) > budget.max_array_length:
+                    raise _BudgetExceeded("{} has more than {} items".format(path, budget.max_array_length), path)
+                self.charge(path, 0)
+
+            # An array of the wrong length is rejected without validating its items
+            length = field_spec.length
+            if length is not None and projection is None and length(value):
+                errors[path] = _length_error(field_spec.validation, value)
+                return value
+
+            pending_count = len(pending)
+            self.array(field_type, value, path, projection, pending)
+
+            # Validations of an array apply to its items in their entirety, so are
+            # skipped if only some fields of those items are being validated. They
+            # are applied once any embedded documents held have been validated.
+            validation = field_spec.validation
+            if validation is None or projection is not None:
+                return value
+            if len(pending) > pending_count:
+                pending.append((_CHECK, validation, value, path))
+                return value
+
+        validation = field_spec.validation
+        if validation is not None:
+            error = validation(value)
+            if error:
+                errors[path] = error
+        return value
+
+    def array(self, array_type, items, path, projection, pending):
+        """Validates the items of the given list, or a sample of them if
+        sampling and the given Array declares a Sample."""
+        sample = array_type.sample if self.sampled else None
+        if sample is None:
+            self.items(array_type, items, xrange(len(items)), path, projection, pending)
             return
 
-        validations = field_spec.get('validates', None)
-        if validations is None:
+        indices = sample.indices(len(items))
+        error_count = len(self.errors)
+        pending_count = len(pending)
+        self.items(array_type, items, indices, path, projection, pending)
+        if not sample.escalate:
             return
-        self._apply_validations(errors, path, validations, value)
 
-    def _apply_validations(self, errors, path, validations, value):
-        def apply(fn):
-            error = fn(value)
-            if error:
-                errors[path] = error
-
-        if isinstance(validations, list):
-            for validation in validations:
-                apply(validation)
+        if len(self.errors) > error_count:
+            self.remaining_items(array_type, items, indices, path, projection, pending)
+        elif len(pending) > pending_count:
+            # Escalate if any of the sampled embedded documents are invalid
+            mark = [0]
+            pending.insert(pending_count, (_MARK, mark))
+            pending.append((_ESCALATE, array_type, items, indices, path, projection, mark))
+
+    def remaining_items(self, array_type, items, indices, path, projection, pending=None):
+        """Validates the items of the given list other than those at the given indices."""
+        validated = set(indices)
+        remaining = [i for i in xrange(len(items)) if i not in validated]
+        if pending is not None:
+            self.items(array_type, items, remaining, path, projection, pending)
         else:
-            apply(validations)
-
+            pending = []
+            self.items(array_type, items, remaining, path, projection, pending)
+            self.push(pending)
+
+    def items(self, array_type, items, indices, path, projection, pending):
+        """Validates the items at the given indices of the given list against
+        the type contained by the given Array."""
+        if self.budget is not None:
+            self.charge(path, len(indices))
+        errors = self.errors
+        coerce = self.coerce
+        contained_type = _resolve(array_type.contained_type)
+        is_dynamic = isinstance(contained_type, types.FunctionType)
+        is_union = isinstance(contained_type, OneOf)
+        check = _type_check(contained_type) if isinstance(contained_type, type) else None
+        for i in indices:
+            item = items[i]
+            item_type = contained_type
+            if is_dynamic:
+                item_type = _resolve(contained_type(item))
+                is_union = isinstance(item_type, OneOf)
+                check = _type_check(item_type) if isinstance(item_type, type) else None
+            instance_path = _append_path(path, i)
+            if is_union:
+                item_type = self.union(item_type, item, instance_path)
+                if item_type is None:
+                    continue
+            if isinstance(item_type, Schema):
+                pending.append((_DOCUMENT, item_type, item, instance_path, projection))
+            elif not (isinstance(item, item_type) if check is None else check(item)):
+                if coerce:
+                    item = items[i] = _coerce(item, item_type)
+                if not (coerce and _is_instance(item, item_type, check)):
+                    errors[instance_path] = "Array item at {} is of incorrect type".format(instance_path)
+
+    def union(self, one_of, document, path):
+        """Returns the Schema of the given OneOf for the given document, or
+        None (adding an error) if it doesn't hold a known discriminator."""
+        if not isinstance(document, dict):
+            self.errors[path] = "Expected instance of dict to validate against schema."
+            return None
+        schema = one_of.schema_for(document)
+        if schema is None:
+            discriminator_path = _append_path(path, one_of.discriminator)
+            self.errors[discriminator_path] = one_of.unknown(document, discriminator_path)
+        return schema
@@ -0,0 +1,155 @@
+"""Validates files of newline delimited JSON documents against a Schema.
+
+    python -m schemer myapp.schemas.blog_post_schema posts.ndjson [...]
+
+Each document is first loaded as schemer.serialization would load it (e.g.
+converting ISO 8601 strings in datetime fields to datetimes) unless --raw is
+given. Each failure is reported as a line of the form `file:line: path:
+message`, followed by the number of documents validated and the time taken.
+Files are read in chunks of lines which are validated by a pool of
+processes. Exits with status 1 if any document is invalid."""
+
+from __future__ import absolute_import
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import sys
+import time
+from itertools import islice
+
+from schemer import Schema
+from schemer.exceptions import ValidationException, SchemaFormatException
+from schemer.serialization import Serializer
+
+
+def load_schema(path):
+    """Returns the Schema at the given dotted path, e.g. myapp.schemas.post
+    (or myapp.schemas:post)."""
+    module_name, _, name = path.replace(':', '.').rpartition('.')
+    if not module_name:
+        raise ValueError("{} is not a dotted path to a Schema".format(path))
+    schema = getattr(importlib.import_module(module_name), name)
+    if not isinstance(schema, Schema):
+        raise TypeError("{} is not a Schema".format(path))
+    return schema
+
+
+# The schema validated against by each worker process, and the Serializer
+# loading documents of the schema (None if documents aren't loaded).
+_schema = None
+_serializer = None
+
+
+def _init_worker(schema_path, raw=False):
+    global _schema, _serializer
+    _schema = load_schema(schema_path)
+    _serializer = None if raw else Serializer(_schema)
+
+
+def _validate_chunk(chunk):
+    """Validates the given chunk of lines of a file, returning the file name,
+    the number of documents validated and the line number and errors of each
+    invalid document."""
+    filename, first_line, lines, max_errors = chunk
+    documents = 0
+    failures = []
+    for number, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line:
+            continue
+        documents += 1
+        try:
+            document = json.loads(line)
+        except ValueError as e:
+            failures.append((number, {'': "Invalid JSON: {}".format(e)}))
+            continue
+        try:
+            if _serializer is not None:
+                document = _serializer.load(document)
+            _schema.validate(document, max_errors=max_errors)
+        except ValidationException as e:
+            failures.append((number, e.errors))
+        except SchemaFormatException as e:
+            # e.g. raised by a dynamic type function given an unexpected value
+            failures.append((number, {e.path or '': "Schema error: {}".format(e)}))
+    return filename, documents, failures
+
+
+def _encode(text):
+    """Returns the given text encoded as UTF-8, as field names (and so paths
+    and messages) read from JSON are unicode."""
+    if isinstance(text, unicode):
+        return text.encode('utf-8')
+    return str(text)
+
+
+def _chunks(filenames, chunk_size, max_errors):
+    """Yields the chunks of lines of the given files to be validated."""
+    for filename in filenames:
+        with open(filename) as f:
+            first_line = 1
+            while True:
+                lines = list(islice(f, chunk_size))
+                if not lines:
+                    break
+                yield filename, first_line, lines, max_errors
+                first_line += len(lines)
+
+
+def main(argv=None, out=sys.stdout, err=sys.stderr):
+    parser = argparse.ArgumentParser(prog="python -m schemer", description=__doc__.splitlines()[0])
+    parser.add_argument("schema", help="dotted path to the Schema, e.g. myapp.schemas.post")
+    parser.add_argument("files", nargs="+", help="files of newline delimited JSON documents")
+    parser.add_argument("-p", "--processes", type=int, default=multiprocessing.cpu_count(),
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="number of lines sent to a worker at a time (default: 1000)")
+    parser.add_argument("--max-errors", type=int, default=None,
+                        help="maximum number of errors reported per document")
+    parser.add_argument("--raw", action="store_true",
+                        help="validate documents as parsed from JSON, without loading them")
+    args = parser.parse_args(argv)
+    if args.processes < 1 or args.chunk_size < 1 or (args.max_errors is not None and args.max_errors < 1):
+        parser.error("--processes, --chunk-size and --max-errors must be at least 1")
+    for filename in args.files:
+        try:
+            open(filename).close()
+        except IOError as e:
+            parser.error("cannot read {}: {}".format(filename, e.strerror))
+
+    try:
+        _init_worker(args.schema, args.raw)
+    except (ImportError, AttributeError, ValueError, TypeError, SchemaFormatException) as e:
+        parser.error("cannot load schema {}: {}".format(args.schema, e))
+
+    start = time.time()
+    chunks = _chunks(args.files, args.chunk_size, args.max_errors)
+    pool = None
+    if args.processes == 1:
+        results = (_validate_chunk(chunk) for chunk in chunks)
+    else:
+        pool = multiprocessing.Pool(args.processes, _init_worker, (args.schema, args.raw))
+        results = pool.imap(_validate_chunk, chunks)
+
+    documents = invalid = 0
+    try:
+        for filename, count, failures in results:
+            documents += count
+            invalid += len(failures)
+            for number, errors in failures:
+                for path in sorted(errors):
+                    out.write("{}:{}: {}: {}\n".format(filename, number, _encode(path), _encode(errors[path])))
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    elapsed = time.time() - start
+    err.write("{} documents, {} invalid, in {:.2f}s ({:.0f} documents/s)\n".format(
+        documents, invalid, elapsed, documents / elapsed if elapsed else 0))
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
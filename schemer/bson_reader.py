@@ -0,0 +1,351 @@
+"""Validation of BSON encoded documents without first decoding them.
+
+Documents are read in place from any buffer supporting the struct module's
+unpack_from (str, bytearray, memoryview or mmap), so files of concatenated
+BSON documents can be audited via mmap. Field presence and types are checked
+using each element's type code; values are only decoded when a dynamic type
+function or a validator needs them."""
+
+from __future__ import absolute_import
+
+import mmap
+import struct
+from datetime import datetime, timedelta
+from itertools import islice
+
+from schemer import (Schema, Array, _BoundedErrors, _ErrorLimitReached, _resolve, _length_error,
+    _is_instance)
+from schemer.exceptions import ValidationException
+from schemer.type_checks import type_check
+from schemer.validators import _ABBREVIATED_ITEMS
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+
+_INT32 = struct.Struct('<i')
+_INT64 = struct.Struct('<q')
+_UINT64 = struct.Struct('<Q')
+_DOUBLE = struct.Struct('<d')
+_BYTE = struct.Struct('<B')
+
+_EPOCH = datetime(1970, 1, 1)
+
+DOUBLE = 0x01
+STRING = 0x02
+DOCUMENT = 0x03
+ARRAY = 0x04
+BINARY = 0x05
+UNDEFINED = 0x06
+OBJECT_ID = 0x07
+BOOLEAN = 0x08
+DATETIME = 0x09
+NULL = 0x0A
+REGEX = 0x0B
+DB_POINTER = 0x0C
+CODE = 0x0D
+SYMBOL = 0x0E
+CODE_WITH_SCOPE = 0x0F
+INT32 = 0x10
+TIMESTAMP = 0x11
+INT64 = 0x12
+DECIMAL128 = 0x13
+MIN_KEY = 0xFF
+MAX_KEY = 0x7F
+
+# Sizes of the elements whose values have a fixed length.
+_FIXED_SIZES = {
+    DOUBLE: 8, UNDEFINED: 0, OBJECT_ID: 12, BOOLEAN: 1, DATETIME: 8, NULL: 0,
+    INT32: 4, TIMESTAMP: 8, INT64: 8, DECIMAL128: 16, MIN_KEY: 0, MAX_KEY: 0
+}
+
+# A value of the Python type each element type code decodes to, used to test
+# whether the code satisfies a schema type without decoding the element.
+_PROTOTYPES = {
+    DOUBLE: 0.0, STRING: u'', DOCUMENT: {}, ARRAY: [], BINARY: b'',
+    BOOLEAN: False, DATETIME: _EPOCH, INT32: 0, INT64: 0L
+}
+if ObjectId is not None:
+    _PROTOTYPES[OBJECT_ID] = ObjectId(b'\x00' * 12)
+
+# Cache of (type code, schema type, type check) to whether the code satisfies
+# the type, keyed on the check too as checks can be registered at any time.
+_type_matches = {}
+
+
+def iter_documents(data, offset=0):
+    """Yields the offset of each document in the given buffer of concatenated
+    BSON documents."""
+    end = len(data)
+    while offset < end:
+        yield offset
+        offset += _document_size(data, offset)
+
+
+def decode_document(data, offset=0):
+    """Decodes the BSON document at the given offset of the given buffer into
+    a dict."""
+    _document_size(data, offset)
+    return dict((name, _decode(data, code, pos))
+                for name, code, pos in _elements(data, offset))
+
+
+def validate_bson(schema, data, offset=0, max_errors=None):
+    """Validates the BSON document at the given offset of the given buffer
+    against the given schema, raising a ValidationException if there are any
+    failures, exactly as Schema.validate would for the decoded document."""
+    if max_errors is None:
+        errors = {}
+    elif max_errors < 1:
+        raise ValueError("max_errors must be at least 1")
+    else:
+        errors = _BoundedErrors(max_errors)
+
+    truncated = False
+    try:
+        _document_size(data, offset)
+        _validate_document(schema, data, offset, errors, '')
+    except _ErrorLimitReached:
+        truncated = True
+    except struct.error:
+        raise ValueError("Invalid BSON document at offset {}".format(offset))
+
+    if len(errors) > 0:
+        raise ValidationException(dict(errors), truncated)
+
+
+def validate_bson_file(schema, path, max_errors=None):
+    """Validates each document in the given file of concatenated BSON
+    documents against the given schema, reading the file via mmap. Yields the
+    offset and ValidationException of each invalid document."""
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return  # empty file
+        try:
+            for offset in iter_documents(data):
+                try:
+                    validate_bson(schema, data, offset, max_errors)
+                except ValidationException as e:
+                    yield offset, e
+        finally:
+            data.close()
+
+
+def _document_size(data, offset):
+    """Returns the size of the document at the given offset, checking that
+    it lies within the buffer."""
+    if offset + 5 > len(data):
+        raise ValueError("Truncated BSON document at offset {}".format(offset))
+    size = _INT32.unpack_from(data, offset)[0]
+    if size < 5 or offset + size > len(data):
+        raise ValueError("Invalid BSON document size at offset {}".format(offset))
+    return size
+
+
+def _find_nul(data, pos):
+    """Returns the position of the next NUL byte at or after pos."""
+    if isinstance(data, memoryview):
+        while _BYTE.unpack_from(data, pos)[0]:
+            pos += 1
+        return pos
+    end = data.find(b'\x00', pos)
+    if end < 0:
+        raise ValueError("Unterminated BSON string at offset {}".format(pos))
+    return end
+
+
+def _elements(data, offset):
+    """Yields the name, type code and value position of each element of the
+    document at the given offset."""
+    end = offset + _INT32.unpack_from(data, offset)[0] - 1
+    pos = offset + 4
+    while pos < end:
+        code = _BYTE.unpack_from(data, pos)[0]
+        name_end = _find_nul(data, pos + 1)
+        name = _bytes(data, pos + 1, name_end).decode('utf-8')
+        pos = name_end + 1
+        yield name, code, pos
+        pos += _value_size(data, code, pos)
+
+
+def _value_size(data, code, pos):
+    """Returns the size of the value of the given type at the given position."""
+    size = _FIXED_SIZES.get(code)
+    if size is not None:
+        return size
+    if code in (STRING, CODE, SYMBOL):
+        return 4 + _INT32.unpack_from(data, pos)[0]
+    if code in (DOCUMENT, ARRAY, CODE_WITH_SCOPE):
+        return _INT32.unpack_from(data, pos)[0]
+    if code == BINARY:
+        return 5 + _INT32.unpack_from(data, pos)[0]
+    if code == REGEX:
+        return _find_nul(data, _find_nul(data, pos) + 1) + 1 - pos
+    if code == DB_POINTER:
+        return 16 + _INT32.unpack_from(data, pos)[0]
+    raise ValueError("Unsupported BSON element type {} at offset {}".format(code, pos))
+
+
+def _bytes(data, start, end):
+    """Returns a copy of the given range of bytes of the buffer."""
+    value = data[start:end]
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    return bytes(value)
+
+
+def _string(data, pos):
+    """Decodes the string value at the given position."""
+    length = _INT32.unpack_from(data, pos)[0]
+    return _bytes(data, pos + 4, pos + 3 + length).decode('utf-8')
+
+
+def _decode(data, code, pos):
+    """Decodes the value of the given type at the given position."""
+    if code == DOUBLE:
+        return _DOUBLE.unpack_from(data, pos)[0]
+    if code == STRING:
+        return _string(data, pos)
+    if code == DOCUMENT:
+        return decode_document(data, pos)
+    if code == ARRAY:
+        return [_decode(data, item_code, item_pos)
+                for name, item_code, item_pos in _elements(data, pos)]
+    if code == BINARY:
+        length = _INT32.unpack_from(data, pos)[0]
+        return _bytes(data, pos + 5, pos + 5 + length)
+    if code == OBJECT_ID:
+        raw = _bytes(data, pos, pos + 12)
+        return raw if ObjectId is None else ObjectId(raw)
+    if code == BOOLEAN:
+        return _BYTE.unpack_from(data, pos)[0] != 0
+    if code == DATETIME:
+        return _EPOCH + timedelta(milliseconds=_INT64.unpack_from(data, pos)[0])
+    if code in (NULL, UNDEFINED):
+        return None
+    if code == INT32:
+        return _INT32.unpack_from(data, pos)[0]
+    if code == INT64:
+        return long(_INT64.unpack_from(data, pos)[0])
+    if code == TIMESTAMP:
+        return _UINT64.unpack_from(data, pos)[0]
+    raise ValueError("Cannot decode BSON element type {} at offset {}".format(code, pos))
+
+
+def _matches(code, field_type):
+    """Returns True if values of the given type code are instances of the
+    given schema type."""
+    check = type_check(field_type)
+    key = (code, field_type, check)
+    match = _type_matches.get(key)
+    if match is None:
+        prototype = _PROTOTYPES.get(code, _PROTOTYPES)
+        if prototype is _PROTOTYPES:
+            return None  # the value must be decoded to check its type
+        match = _type_matches[key] = _is_instance(prototype, field_type, check)
+    return match
+
+
+def _validate_document(schema, data, offset, errors, path_prefix):
+    """Validates the document at the given offset against the given schema,
+    adding any failures to errors."""
+    if schema._validation is not None:
+        # Schema level validators need the whole document
+        schema._validate_instance(decode_document(data, offset), errors, path_prefix)
+        return
+
+    fields = schema._fields_by_name
+    seen = set()
+    for name, code, pos in _elements(data, offset):
+        seen.add(name)
+        path = schema._append_path(path_prefix, name)
+        field_spec = fields.get(name)
+        if field_spec is not None:
+            _validate_element(schema, data, code, pos, field_spec, path, errors)
+        elif schema._strict:
+            errors[path] = "Unexpected document field not present in schema"
+
+    for field_spec in schema._fields:
+        if field_spec.required and field_spec.name not in seen:
+            path = schema._append_path(path_prefix, field_spec.name)
+            errors[path] = "{} is required.".format(path)
+
+
+def _validate_element(schema, data, code, pos, field_spec, path, errors):
+    """Validates the element of the given type at the given position against
+    the given FieldSpec, adding any failures to errors."""
+    field_type = _resolve(field_spec.type)
+    if code == NULL or not isinstance(field_type, (type, Schema, Array)):
+        # Dynamic types need the value, and None is dealt with the same way
+        schema._validate_value(_decode(data, code, pos), field_spec, path, errors)
+        return
+
+    if isinstance(field_type, Schema):
+        if code == DOCUMENT:
+            _validate_document(field_type, data, pos, errors, path)
+        else:
+            errors[path] = "{} should be an embedded document".format(path)
+        return
+
+    elif isinstance(field_type, Array):
+        if code != ARRAY:
+            errors[path] = "{} should be an embedded array".format(path)
+            return
+        length = field_spec.length
+        if length is not None:
+            # An array of the wrong length is rejected without validating its items
+            size = sum(1 for _ in _elements(data, pos))
+            if (length.min is not None and size < length.min) or (length.max is not None and size > length.max):
+                items = _Items(_decode(data, item_code, item_pos) for name, item_code, item_pos
+                               in islice(_elements(data, pos), _ABBREVIATED_ITEMS))
+                items.size = size
+                errors[path] = _length_error(field_spec.validation, items)
+                return
+        contained_type = _resolve(field_type.contained_type)
+        if not isinstance(contained_type, (type, Schema)):
+            # Dynamic types need the items
+            items = _decode(data, code, pos)
+            schema._validate_items(field_type, items, xrange(len(items)), path, errors, False)
+        else:
+            for i, (name, item_code, item_pos) in enumerate(_elements(data, pos)):
+                item_path = schema._append_path(path, i)
+                if isinstance(contained_type, Schema):
+                    if item_code == DOCUMENT:
+                        _validate_document(contained_type, data, item_pos, errors, item_path)
+                    else:
+                        errors[item_path] = "Expected instance of dict to validate against schema."
+                elif not _value_matches(data, item_code, item_pos, contained_type):
+                    errors[item_path] = "Array item at {} is of incorrect type".format(item_path)
+
+    elif not _value_matches(data, code, pos, field_type):
+        errors[path] = "Field should be of type {}".format(field_type)
+        return
+
+    validation = field_spec.validation
+    if validation is not None:
+        error = validation(_decode(data, code, pos))
+        if error:
+            errors[path] = error
+
+
+class _Items(list):
+    """The first items of an array of the given size, which stand in for the
+    array when formatting the error of a Length validator, as only the first
+    items of a long array are shown."""
+    __slots__ = ('size',)
+
+    def __len__(self):
+        return self.size
+
+
+def _value_matches(data, code, pos, field_type):
+    """Returns True if the value of the given type code at the given position
+    is an instance of the given schema type."""
+    match = _matches(code, field_type)
+    if match is None:
+        match = _is_instance(_decode(data, code, pos), field_type, type_check(field_type))
+    return match
@@ -0,0 +1,106 @@
+"""Coercion of field values to the types declared by a schema, e.g. of the
+strings read from a form or CSV file to ints, floats and datetimes."""
+
+import re
+from datetime import datetime, timedelta, tzinfo
+
+
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+# The UTC offset ending an ISO 8601 datetime, e.g. Z or +05:30.
+_OFFSET = re.compile(r'(?:Z|([+-])(\d\d):?(\d\d))$')
+
+
+class FixedOffset(tzinfo):
+    """A time zone with the given fixed offset from UTC in minutes, as given
+    by an ISO 8601 datetime."""
+
+    def __init__(self, minutes):
+        self._offset = timedelta(minutes=minutes)
+        self._minutes = minutes
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def dst(self, dt):
+        return timedelta(0)
+
+    def tzname(self, dt):
+        sign = '-' if self._minutes < 0 else '+'
+        return "{}{:02d}:{:02d}".format(sign, *divmod(abs(self._minutes), 60))
+
+    def __getinitargs__(self):
+        return (self._minutes,)
+
+    def __repr__(self):
+        return "FixedOffset({})".format(self._minutes)
+
+
+def parse_datetime(value):
+    """Parses the given ISO 8601 string into a datetime, which is aware of its
+    time zone if the string ends with a UTC offset (Z or e.g. +05:30)."""
+    offset = _OFFSET.search(value)
+    tz = None
+    if offset is not None and 'T' in value:
+        sign, hours, minutes = offset.groups()
+        minutes = 0 if sign is None else int(hours) * 60 + int(minutes)
+        tz = FixedOffset(-minutes if sign == '-' else minutes)
+        value = value[:offset.start()]
+    for format in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, format).replace(tzinfo=tz)
+        except ValueError:
+            pass
+    raise ValueError("{} is not an ISO 8601 datetime".format(value))
+
+
+def _string_only(convert):
+    def coerce(value):
+        if not isinstance(value, basestring):
+            raise TypeError("Only strings can be coerced")
+        return convert(value.strip())
+    return coerce
+
+
+def _float(value):
+    if isinstance(value, bool):
+        raise TypeError("Booleans are not coerced to floats")
+    return float(value)
+
+
+_BOOLEANS = {'true': True, 'yes': True, '1': True, 'false': False, 'no': False, '0': False}
+
+def _bool(value):
+    return _BOOLEANS[value.lower()]
+
+
+# The function which coerces a value to each type, raising a ValueError or
+# TypeError if the value can't be coerced.
+_COERCERS = {
+    int: _string_only(int),
+    long: _string_only(long),
+    float: _float,
+    bool: _string_only(_bool),
+    datetime: _string_only(parse_datetime)
+}
+
+
+def register_coercer(field_type, coercer):
+    """Registers the function which coerces values to the given type. The
+    function should raise a ValueError or TypeError if a value can't be
+    coerced."""
+    _COERCERS[field_type] = coercer
+
+
+def coerce(value, field_type):
+    """Returns the given value coerced to the given type, or the value itself
+    if it's already of that type or can't be coerced."""
+    if isinstance(value, field_type):
+        return value
+    coercer = _COERCERS.get(field_type)
+    if coercer is None:
+        return value
+    try:
+        return coercer(value)
+    except (TypeError, ValueError, KeyError):
+        return value
@@ -0,0 +1,237 @@
+"""Validation of batches of records held column-wise.
+
+Rather than a list of dicts, a batch is given as a dict mapping each field
+name to a column holding that field's value for every record: a list, tuple,
+array.array or NumPy array (NumPy is optional). Nullness and type checks are
+made a column at a time and the gte, lte, gt, lt, between and one_of
+validators are applied to whole columns, using NumPy where possible, so no
+per-record dicts are built unless the schema has schema level validators."""
+
+from __future__ import absolute_import
+
+from schemer.type_checks import type_check
+from schemer.validators import Chain
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def validate_columns(schema, columns, length=None):
+    """Validates a batch of records held as columns against the given flat
+    schema. A value of None (or a masked NumPy value) indicates that a record
+    has no value for the field. The number of records is taken from the
+    columns unless given. Returns a dict mapping each field for which any
+    record is invalid to the sorted indices of the invalid records. Records
+    failing the schema's own validators are listed under the empty path, as
+    they are by validate(); for these a dict is built for each record."""
+    length = _batch_length(columns, length)
+    failures = {}
+
+    for field_spec in schema._fields:
+        field = field_spec.name
+        column = columns.get(field)
+        if column is None:
+            failed = range(length) if field_spec.required else []
+        else:
+            failed = _validate_column(schema, column, field_spec, field)
+        if failed:
+            failures[field] = failed
+
+    if schema._strict:
+        for field, column in columns.iteritems():
+            if field not in schema._fields_by_name:
+                nulls = set(_null_indices(column))
+                failed = [i for i in xrange(length) if i not in nulls]
+                if failed:
+                    failures[field] = failed
+
+    if schema._validation is not None:
+        failed = _validate_records(schema._validation, columns, length)
+        if failed:
+            failures[''] = failed
+
+    return failures
+
+
+def _validate_records(validation, columns, length):
+    """Returns the indices of the records, built as dicts from the given
+    columns, which fail the given schema level validation."""
+    values = {}
+    for field, column in columns.iteritems():
+        nulls = set(_null_indices(column))
+        if _is_array(column):
+            column = numpy.ma.getdata(column).tolist()
+        values[field] = [None if i in nulls else value for i, value in enumerate(column)]
+
+    failed = []
+    for i in xrange(length):
+        record = dict((field, column[i]) for field, column in values.iteritems() if column[i] is not None)
+        if validation(record):
+            failed.append(i)
+    return failed
+
+
+def _batch_length(columns, length):
+    """Returns the number of records in the batch, checking all the columns
+    hold the same number of values."""
+    for field, column in columns.iteritems():
+        if length is None:
+            length = len(column)
+        elif len(column) != length:
+            raise ValueError("Column {} holds {} values, expected {}".format(field, len(column), length))
+    return length or 0
+
+
+def _is_array(column):
+    """Returns True if the given column is a NumPy array of a native dtype."""
+    return numpy is not None and isinstance(column, numpy.ndarray) and column.dtype.kind != 'O'
+
+
+def _null_indices(column):
+    """Returns the indices of the null values in the given column."""
+    if _is_array(column):
+        return numpy.flatnonzero(numpy.ma.getmaskarray(column)).tolist()
+    return [i for i, value in enumerate(column) if value is None]
+
+
+def _validate_column(schema, column, field_spec, path):
+    """Returns the sorted indices of the values in the given column which are
+    invalid according to the given FieldSpec."""
+    field_type = field_spec.type
+    if not isinstance(field_type, type):
+        # Embedded documents, arrays and dynamic types are validated per value
+        return _validate_values(schema, column, field_spec, path)
+
+    if _is_array(column):
+        return _validate_array(column, field_type, field_spec.nullable, _checks(field_spec))
+    return _validate_list(column, field_type, field_spec.nullable, _checks(field_spec))
+
+
+def _checks(field_spec):
+    """Returns the checks which together make up the given field's validation,
+    with bounds already fused into intervals."""
+    validation = field_spec.validation
+    if validation is None:
+        return ()
+    if isinstance(validation, Chain):
+        return validation._checks
+    return (validation,)
+
+
+def _validate_values(schema, column, field_spec, path):
+    """Validates each value in the given column in turn."""
+    if _is_array(column):
+        column = numpy.ma.getdata(column).tolist()
+    failed = []
+    for i, value in enumerate(column):
+        errors = {}
+        schema._validate_value(value, field_spec, path, errors)
+        if errors:
+            failed.append(i)
+    return failed
+
+
+def _validate_list(column, field_type, nullable, validators):
+    """Validates a column held as a sequence of Python values."""
+    failed = []
+    indices, values = [], []
+    accepted = {}
+    check = type_check(field_type)
+
+    for i, value in enumerate(column):
+        if value is None:
+            if not nullable:
+                failed.append(i)
+            continue
+        if check is not None:
+            accept = check(value)
+        else:
+            value_type = type(value)
+            accept = accepted.get(value_type)
+            if accept is None:
+                accept = accepted[value_type] = isinstance(value, field_type)
+        if accept:
+            indices.append(i)
+            values.append(value)
+        else:
+            failed.append(i)
+
+    for validator in validators:
+        kind, args = getattr(validator, 'kind', None), getattr(validator, 'args', ())
+        if kind == 'gte':
+            failed.extend(i for i, value in zip(indices, values) if value < args[0])
+        elif kind == 'lte':
+            failed.extend(i for i, value in zip(indices, values) if value > args[0])
+        elif kind == 'gt':
+            failed.extend(i for i, value in zip(indices, values) if value <= args[0])
+        elif kind == 'lt':
+            failed.extend(i for i, value in zip(indices, values) if value >= args[0])
+        elif kind == 'between':
+            failed.extend(i for i, value in zip(indices, values) if value < args[0] or value > args[1])
+        elif kind == 'interval':
+            failed.extend(i for i, value in zip(indices, values) if validator(value))
+        elif kind == 'one_of':
+            items = _lookup(args[0])
+            failed.extend(i for i, value in zip(indices, values) if value not in items)
+        else:
+            failed.extend(i for i, value in zip(indices, values) if validator(value))
+
+    return sorted(set(failed))
+
+
+def _lookup(items):
+    """Returns a set of the given items if they are hashable, otherwise the
+    items themselves."""
+    try:
+        return set(items)
+    except TypeError:
+        return items
+
+
+def _outside(data, min_value, min_inclusive, max_value, max_inclusive):
+    """Returns a mask of the values in the given array outside the given interval."""
+    invalid = numpy.zeros(len(data), dtype=bool)
+    if min_value is not None:
+        invalid |= (data < min_value) if min_inclusive else (data <= min_value)
+    if max_value is not None:
+        invalid |= (data > max_value) if max_inclusive else (data >= max_value)
+    return invalid
+
+
+def _validate_array(column, field_type, nullable, validators):
+    """Validates a column held as a NumPy array."""
+    nulls = numpy.ma.getmaskarray(column)
+    data = numpy.ma.getdata(column)
+    failed = nulls.copy() if not nullable else numpy.zeros(len(data), dtype=bool)
+    present = ~nulls
+
+    # All the values in an array are of the same type
+    if len(data):
+        first = data[:1].tolist()[0]
+        check = type_check(field_type)
+        if not (isinstance(first, field_type) if check is None else check(first)):
+            return numpy.flatnonzero(present | failed).tolist()
+
+    for validator in validators:
+        kind, args = getattr(validator, 'kind', None), getattr(validator, 'args', ())
+        if kind == 'gte':
+            invalid = data < args[0]
+        elif kind == 'lte':
+            invalid = data > args[0]
+        elif kind == 'gt':
+            invalid = data <= args[0]
+        elif kind == 'lt':
+            invalid = data >= args[0]
+        elif kind == 'between':
+            invalid = (data < args[0]) | (data > args[1])
+        elif kind == 'interval':
+            invalid = _outside(data, *args)
+        elif kind == 'one_of':
+            invalid = ~numpy.isin(data, args[0])
+        else:
+            invalid = numpy.array([bool(validator(value)) for value in data.tolist()], dtype=bool)
+        failed |= invalid & present
+
+    return numpy.flatnonzero(failed).tolist()
@@ -0,0 +1,187 @@
+"""Comparison of two versions of a schema, for migrating the documents of a
+collection from one to the other.
+
+A SchemaDiff finds the changes which could make a document valid against an
+old Schema invalid against a new one (e.g. added required fields, changed
+types and added validators) and the fields they affect. A collection can then
+be checked against the new schema by validating only those fields, rather
+than re-validating every document in full.
+
+Changes which only widen a schema, such as adding an optional field to a
+strict schema or removing a validator, can't make a valid document invalid,
+so aren't reported."""
+
+from __future__ import absolute_import
+
+from schemer import Schema, Array, OneOf, _resolve, _append_path
+from schemer.exceptions import ValidationException
+from schemer.validators import Chain
+
+
+# The kinds of change.
+ADDED_REQUIRED = 'added_required'        # A required field was added
+ADDED = 'added'                          # A field was added to a schema which wasn't strict
+REMOVED = 'removed'                      # A field was removed from a strict schema
+REQUIRED = 'required'                    # A field became required
+NOT_NULLABLE = 'not_nullable'            # A field is no longer nullable
+TYPE = 'type'                            # A field's type changed
+VALIDATION = 'validation'                # A field's validators were added to or changed
+STRICT = 'strict'                        # A schema became strict
+SCHEMA_VALIDATION = 'schema_validation'  # A schema's schema level validators were added to or changed
+
+
+class Change(object):
+    """A change to the field (or embedded document) at the given dotted
+    path. Arrays don't add a segment to the path, so the change to the field
+    of the documents held by an Array is at the same path for every item."""
+    __slots__ = ('path', 'kind', 'description')
+
+    def __init__(self, path, kind, description):
+        self.path = path
+        self.kind = kind
+        self.description = description
+
+    def __repr__(self):
+        return "Change({!r}, {!r})".format(self.path, self.kind)
+
+
+class SchemaDiff(object):
+    """The changes from the given old Schema to the given new one which could
+    make documents invalid, ordered by path."""
+    __slots__ = ('old', 'new', 'changes', 'fields')
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.changes = []
+        self._documents(old, new, '', set())
+        self.changes.sort(key=lambda change: change.path)
+        self.fields = self._affected_fields()
+
+    @property
+    def breaking(self):
+        """True if any documents valid against the old schema may be invalid
+        against the new one."""
+        return bool(self.changes)
+
+    def validate(self, instance, **kwargs):
+        """Validates only the fields of the given document affected by the
+        changes against the new schema, raising a ValidationException if there
+        are any failures. Takes the same options as Schema.validate."""
+        if self.changes:
+            return self.new.validate(instance, fields=self.fields, **kwargs)
+
+    def scan(self, instances, **kwargs):
+        """Validates the affected fields of each of the given documents
+        (which are assumed to be valid against the old schema), yielding the
+        index and ValidationException of each one which is invalid against the
+        new schema."""
+        if not self.changes:
+            return
+        for i, instance in enumerate(instances):
+            try:
+                self.new.validate(instance, fields=self.fields, **kwargs)
+            except ValidationException as e:
+                yield i, e
+
+    def _affected_fields(self):
+        """Returns the dotted paths of the fields to be validated to check the
+        changes, or None if whole documents need to be validated."""
+        fields = []
+        for path in sorted(set(change.path for change in self.changes)):
+            if not path:
+                return None
+            if not any(path.startswith(field + '.') for field in fields):
+                fields.append(path)
+        return fields
+
+    def _change(self, path, kind, description, *args):
+        self.changes.append(Change(path, kind, description.format(path or "document", *args)))
+
+    def _documents(self, old, new, path, in_progress):
+        """Finds the changes between the given schemas of the embedded
+        documents at the given path."""
+        if old is new:
+            return
+        key = (id(old), id(new))
+        if key in in_progress:
+            # The schemas contain themselves, so any change applies at every
+            # depth and the documents have to be validated in their entirety.
+            self._change(path, TYPE, "{} holds a recursive schema which changed")
+            return
+        in_progress.add(key)
+
+        if new._strict and not old._strict:
+            self._change(path, STRICT, "{} became strict")
+        if _narrowed(old._validation, new._validation):
+            self._change(path, SCHEMA_VALIDATION, "{} has new schema level validators")
+
+        for field_spec in new._fields:
+            field_path = _append_path(path, field_spec.name)
+            old_spec = old._fields_by_name.get(field_spec.name)
+            if old_spec is not None:
+                self._fields(old_spec, field_spec, field_path, in_progress)
+            elif field_spec.required:
+                self._change(field_path, ADDED_REQUIRED, "{} was added as a required field")
+            elif not old._strict:
+                self._change(field_path, ADDED, "{} was added to a schema which wasn't strict")
+
+        if new._strict:
+            for old_spec in old._fields:
+                if old_spec.name not in new._fields_by_name:
+                    self._change(_append_path(path, old_spec.name), REMOVED, "{} was removed from a strict schema")
+
+        in_progress.discard(key)
+
+    def _fields(self, old_spec, new_spec, path, in_progress):
+        """Finds the changes between the given FieldSpecs of the field at the
+        given path."""
+        if new_spec.required and not old_spec.required:
+            self._change(path, REQUIRED, "{} became required")
+        if old_spec.nullable and not new_spec.nullable:
+            self._change(path, NOT_NULLABLE, "{} is no longer nullable")
+        if _narrowed(old_spec.validation, new_spec.validation):
+            self._change(path, VALIDATION, "{} has new validators")
+        self._types(old_spec.type, new_spec.type, path, in_progress)
+
+    def _types(self, old, new, path, in_progress):
+        """Finds the changes between the given types of the field at the
+        given path."""
+        old, new = _resolve(old), _resolve(new)
+        if old is new:
+            return
+        if isinstance(old, Schema) and isinstance(new, Schema):
+            self._documents(old, new, path, in_progress)
+        elif isinstance(old, Array) and isinstance(new, Array):
+            self._types(old.contained_type, new.contained_type, path, in_progress)
+        elif isinstance(old, OneOf) and isinstance(new, OneOf):
+            removed = [tag for tag in old.mapping if tag not in new.mapping]
+            if old.discriminator != new.discriminator or removed:
+                self._change(path, TYPE, "{} is discriminated differently")
+                return
+            for tag, schema in old.mapping.iteritems():
+                self._types(schema, new.mapping[tag], path, in_progress)
+        elif not (isinstance(old, type) and isinstance(new, type) and issubclass(old, new)):
+            self._change(path, TYPE, "{} changed type from {} to {}", _name(old), _name(new))
+
+
+def _validators(validation):
+    """Returns the list of validators fused into the given validation."""
+    if validation is None:
+        return []
+    if isinstance(validation, Chain):
+        return list(validation.validators)
+    return [validation]
+
+
+def _narrowed(old, new):
+    """Returns True if the given new validation applies any validators the
+    given old validation doesn't."""
+    old = _validators(old)
+    return any(validator not in old for validator in _validators(new))
+
+
+def _name(field_type):
+    if isinstance(field_type, type):
+        return field_type.__name__
+    return type(field_type).__name__
@@ -0,0 +1,200 @@
+"""A compact collection of validation errors, for jobs which aggregate the
+errors of many documents.
+
+The errors of ValidationExceptions are added after validation: each message
+is classified into a code by matching it against the messages validation
+reports, and held as the code and indices into shared tables of paths and
+details, in parallel arrays. Paths are held as tuples of segments and each
+distinct path, segment and detail is stored once, however many documents
+fail the same way, rather than keeping every exception's dict of messages.
+Errors can be grouped and counted by path pattern, where `*` matches any one
+segment:
+
+    errors = ValidationErrors()
+    for document in documents:
+        try:
+            schema.validate(document)
+        except ValidationException as e:
+            errors.add_all(e)
+
+    errors.count("comments.*.votes")
+    errors.summary()  # {("comments.*.votes", WRONG_TYPE): 1203, ...}"""
+
+from __future__ import absolute_import
+
+from array import array
+
+from schemer.exceptions import ValidationException
+
+
+# The kinds of error reported by validation.
+INVALID = 0          # Rejected by a validator; the detail is its message
+REQUIRED = 1
+NOT_NULLABLE = 2
+WRONG_TYPE = 3       # The detail is the name of the expected type
+NOT_DOCUMENT = 4
+NOT_ARRAY = 5
+NOT_DICT = 6
+WRONG_ITEM_TYPE = 7
+UNKNOWN_FIELD = 8
+
+_TYPE_PREFIX = "Field should be of type "
+
+# The message format of each kind of error (other than INVALID and WRONG_TYPE,
+# whose messages hold their detail), given the error's path.
+_FORMATS = {
+    REQUIRED: "{} is required.",
+    NOT_NULLABLE: "{} is not nullable.",
+    NOT_DOCUMENT: "{} should be an embedded document",
+    NOT_ARRAY: "{} should be an embedded array",
+    NOT_DICT: "Expected instance of dict to validate against schema.",
+    WRONG_ITEM_TYPE: "Array item at {} is of incorrect type",
+    UNKNOWN_FIELD: "Unexpected document field not present in schema"
+}
+
+
+def _split(path):
+    return tuple(path.split('.')) if path else ()
+
+
+def _pattern(segments):
+    """Returns the given path with each array index replaced by `*`."""
+    return '.'.join('*' if segment.isdigit() else segment for segment in segments)
+
+
+class ValidationErrors(object):
+    """A compact, append only collection of validation errors. Iterating over
+    it yields the path, code and message of each error in the order added."""
+    __slots__ = ('_codes', '_path_ids', '_detail_ids', '_paths', '_path_index',
+                 '_segments', '_details', '_detail_index')
+
+    def __init__(self, errors=None):
+        self._codes = array('B')
+        self._path_ids = array('l')
+        self._detail_ids = array('l')
+        self._paths = []
+        self._path_index = {}
+        self._segments = {}
+        self._details = []
+        self._detail_index = {}
+        if errors is not None:
+            self.add_all(errors)
+
+    def add(self, path, message):
+        """Adds the error with the given path and message, as reported by
+        validation."""
+        code, detail = self._classify(path, message)
+        segments = tuple(self._segments.setdefault(segment, segment) for segment in _split(path))
+        path_id = self._path_index.get(segments)
+        if path_id is None:
+            path_id = self._path_index[segments] = len(self._paths)
+            self._paths.append(segments)
+
+        detail_id = -1
+        if detail is not None:
+            detail_id = self._detail_index.get(detail)
+            if detail_id is None:
+                detail_id = self._detail_index[detail] = len(self._details)
+                self._details.append(detail)
+
+        self._codes.append(code)
+        self._path_ids.append(path_id)
+        self._detail_ids.append(detail_id)
+
+    def add_all(self, errors):
+        """Adds each of the given errors, held by a dict of messages by path,
+        a ValidationException or another ValidationErrors."""
+        if isinstance(errors, ValidationException):
+            errors = errors.errors
+        if isinstance(errors, ValidationErrors):
+            errors = ((path, message) for path, _, message in errors)
+        elif isinstance(errors, dict):
+            errors = errors.iteritems()
+        for path, message in errors:
+            self.add(path, message)
+
+    def count(self, pattern=None, code=None):
+        """Returns the number of errors, optionally only those whose path
+        matches the given pattern and/or with the given code."""
+        if pattern is None and code is None:
+            return len(self._codes)
+        return sum(1 for _ in self._matching(pattern, code))
+
+    def matching(self, pattern=None, code=None):
+        """Yields the path, code and message of each error whose path matches
+        the given pattern and/or with the given code."""
+        for i in self._matching(pattern, code):
+            yield self._error(i)
+
+    def summary(self):
+        """Returns a dict of the number of errors of each code at each path
+        pattern, where the patterns are the errors' paths with each array
+        index replaced by `*`."""
+        patterns = [_pattern(segments) for segments in self._paths]
+        counts = {}
+        for path_id, code in zip(self._path_ids, self._codes):
+            key = (patterns[path_id], code)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def to_dict(self):
+        """Returns the errors as a dict of messages by path, as held by
+        ValidationException.errors."""
+        return dict((path, message) for path, _, message in self)
+
+    def _matching(self, pattern, code):
+        """Yields the index of each error matching the given pattern and code."""
+        if pattern is not None:
+            pattern = _split(pattern)
+            matches = [self._matches(pattern, segments) for segments in self._paths]
+        for i, error_code in enumerate(self._codes):
+            if code is not None and error_code != code:
+                continue
+            if pattern is not None and not matches[self._path_ids[i]]:
+                continue
+            yield i
+
+    def _matches(self, pattern, segments):
+        if len(pattern) != len(segments):
+            return False
+        for expected, segment in zip(pattern, segments):
+            if expected != '*' and expected != segment:
+                return False
+        return True
+
+    def _classify(self, path, message):
+        """Returns the code and detail (or None) of the given error. A
+        validator's message which is the same as one reported by validation
+        itself is classified under that message's code."""
+        if message.startswith(_TYPE_PREFIX):
+            return WRONG_TYPE, message[len(_TYPE_PREFIX):]
+        for code, format in _FORMATS.iteritems():
+            if message == format.format(path):
+                return code, None
+        return INVALID, message
+
+    def _error(self, i):
+        path = '.'.join(self._paths[self._path_ids[i]])
+        code = self._codes[i]
+        detail_id = self._detail_ids[i]
+        if code == INVALID:
+            message = self._details[detail_id]
+        elif code == WRONG_TYPE:
+            message = _TYPE_PREFIX + self._details[detail_id]
+        else:
+            message = _FORMATS[code].format(path)
+        return path, code, message
+
+    def __iter__(self):
+        for i in xrange(len(self._codes)):
+            yield self._error(i)
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._codes)
+        if not 0 <= i < len(self._codes):
+            raise IndexError("ValidationErrors index out of range")
+        return self._error(i)
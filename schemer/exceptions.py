@@ -21,13 +21,42 @@ class ValidationException(Exception):
     """Exception which is thrown in response to the failed validation of a document
     against it's associated schema."""
 
-    def __init__(self, errors):
+    def __init__(self, errors, truncated=False):
         self._errors = errors
+        self._truncated = truncated
 
     @property
     def errors(self):
         """A dict containing the validation error(s) found at each field path."""
         return self._errors
 
+    @property
+    def truncated(self):
+        """True if validation was stopped early because the maximum number of
+        errors was reached, in which case the document has further failures
+        which are not described by errors."""
+        return self._truncated
+
     def __str__(self):
+        if self._truncated:
+            return "{} (truncated after {} errors)".format(repr(self._errors), len(self._errors))
         return repr(self._errors)
+
+
+class BudgetExceededException(ValidationException):
+    """Exception which is thrown when the validation of a document is abandoned
+    because it exceeded the given Budget, e.g. because the document is too
+    large or too deeply nested. errors holds the failures found beforehand."""
+
+    def __init__(self, errors, message, path):
+        super(BudgetExceededException, self).__init__(errors, True)
+        self._message = message
+        self._path = path
+
+    @property
+    def path(self):
+        """The path of the document or array at which the budget was exceeded."""
+        return self._path
+
+    def __str__(self):
+        return self._message
@@ -25,4 +25,6 @@ def Mixed(*types):
     class Mixed(object):
         __metaclass__ = MixedType
 
+    # The types enclosed, so schemas using the type can be inspected
+    Mixed.types = tuple(types)
     return Mixed
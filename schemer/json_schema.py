@@ -0,0 +1,329 @@
+"""Translation of schemas into JSON Schema (draft 7).
+
+The JSON Schema describes documents as they're serialized to JSON by
+schemer.serialization, e.g. with datetimes as ISO 8601 strings, so documents
+can be checked by other services and processes without schemer. Schemas
+referred to with a SchemaRef become definitions, so recursive schemas can be
+translated.
+
+Validators with no equivalent in JSON Schema (e.g. custom validation
+functions and schema level validators) are left out and reported, as are
+types which can't be translated, so the JSON Schema never rejects a document
+schemer accepts but may accept some which schemer rejects."""
+
+from __future__ import absolute_import
+
+import re
+import types
+from datetime import datetime
+
+from schemer import Schema, Array, SchemaRef, OneOf
+from schemer.validators import (Chain, Gte, Lte, Gt, Lt, Between, Interval, Length, OneOfValues,
+                                Match, IsEmail, IsUrl, EachItem, Distinct)
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+
+DRAFT = "http://json-schema.org/draft-07/schema#"
+
+
+# The JSON Schema of values of each Python type. Python bools are ints, so
+# int fields accept JSON booleans.
+_TYPES = [
+    (bool, {"type": "boolean"}),
+    ((int, long), {"type": ["integer", "boolean"]}),
+    (float, {"type": "number"}),
+    (basestring, {"type": "string"}),
+    (datetime, {"type": "string"}),
+    (list, {"type": "array"}),
+    (dict, {"type": "object"}),
+]
+if ObjectId is not None:
+    _TYPES.append((ObjectId, {"type": "string", "pattern": "^[0-9a-fA-F]{24}$"}))
+
+# A pattern accepting (at least) the URLs accepted by is_url().
+_URL = r"^(?:[Hh][Tt][Tt][Pp]|[Ff][Tt][Pp])[Ss]?://\S+$"
+
+_NUMBERS = (int, long, float)
+_JSON_VALUES = (basestring, int, long, float, bool, type(None))
+
+# The regular expression syntax Python supports but ECMA 262 (used by JSON
+# Schema patterns) doesn't: inline flags, named groups, comments, conditionals
+# and the \A and \Z anchors.
+_PYTHON_ONLY = set(['\\A', '\\Z'] + ['(?' + c for c in 'aiLmsux#(P'])
+_PATTERN_TOKENS = re.compile(r'\\.|\(\?.?', re.DOTALL)
+# Escapes, character classes and end anchors, found in that order of precedence.
+_END_ANCHORS = re.compile(r'\\.|\[\^?\]?(?:\\.|[^\]\\])*\]|\$', re.DOTALL)
+
+
+def to_json_schema(schema):
+    """Returns the JSON Schema of documents of the given Schema and a list of
+    the (path, validator or type) pairs which couldn't be translated."""
+    translator = _Translator()
+    json_schema = {"$schema": DRAFT}
+    json_schema.update(translator.document(schema, ''))
+    if translator.definitions:
+        json_schema["definitions"] = translator.definitions
+    return json_schema, translator.untranslated
+
+
+class _Translator(object):
+    def __init__(self):
+        self.definitions = {}
+        self.untranslated = []
+
+    def document(self, schema, path):
+        """Returns the JSON Schema of the embedded documents of the given
+        schema at the given path."""
+        properties = {}
+        for field_spec in schema._fields:
+            field_path = schema._append_path(path, field_spec.name)
+            properties[field_spec.name] = self.field(field_spec, field_path)
+
+        json_schema = {"type": "object", "properties": properties}
+        required = sorted(field_spec.name for field_spec in schema._required)
+        if required:
+            json_schema["required"] = required
+        if schema._strict:
+            json_schema["additionalProperties"] = False
+        for validator in schema._validates:
+            self.untranslated.append((path, validator))
+        return json_schema
+
+    def field(self, field_spec, path):
+        json_schema = self.type(field_spec.type, path)
+        constraints = self.validators(field_spec.validation, field_spec.type, path)
+        if constraints:
+            json_schema = _merge(json_schema, constraints)
+        default = field_spec.default
+        if field_spec.has_default and _is_json(default):
+            json_schema = dict(json_schema, default=default)
+        if field_spec.nullable:
+            json_schema = _nullable(json_schema)
+        return json_schema
+
+    def type(self, field_type, path):
+        """Returns the JSON Schema of values of the given field type."""
+        if isinstance(field_type, Schema):
+            return self.document(field_type, path)
+        if isinstance(field_type, SchemaRef):
+            return self.reference(field_type, path)
+        if isinstance(field_type, Array):
+            return {"type": "array", "items": self.type(field_type.contained_type, path)}
+        if isinstance(field_type, OneOf):
+            return self.union(field_type, path)
+        if isinstance(field_type, types.FunctionType):
+            # The type depends on the value
+            self.untranslated.append((path, field_type))
+            return {}
+
+        mixed_types = getattr(field_type, 'types', None)
+        if isinstance(mixed_types, tuple):
+            options = sorted(self.type(mixed_type, path) for mixed_type in mixed_types)
+            if {} in options:
+                return {}
+            if all(option.keys() == ["type"] for option in options):
+                return {"type": sorted(set(_types(options)))}
+            return {"anyOf": options}
+        for python_type, json_schema in _TYPES:
+            if issubclass(field_type, python_type):
+                return dict(json_schema)
+        if field_type is not object:
+            self.untranslated.append((path, field_type))
+        return {}
+
+    def reference(self, schema_ref, path):
+        """Returns a reference to the definition of the schema referred to,
+        adding the definition if it's the first reference to it."""
+        if schema_ref.name not in self.definitions:
+            self.definitions[schema_ref.name] = {}  # for references within the schema
+            self.definitions[schema_ref.name] = self.document(schema_ref.schema, path)
+        return {"$ref": "#/definitions/{}".format(schema_ref.name)}
+
+    def union(self, one_of, path):
+        options = []
+        for tag, schema in sorted(one_of.mapping.items()):
+            options.append({"allOf": [
+                self.type(schema, path),
+                {"properties": {one_of.discriminator: {"enum": [tag]}}, "required": [one_of.discriminator]}
+            ]})
+        return {"anyOf": options}
+
+    def validators(self, validation, field_type, path):
+        """Returns the JSON Schema keywords equivalent to the given validation
+        of values of the given type, reporting any validators which have no
+        equivalent."""
+        if validation is None:
+            return {}
+        validators = validation.validators if isinstance(validation, Chain) else [validation]
+        keywords = {}
+        for validator in validators:
+            translated = self.validator(validator, field_type, path)
+            if translated is None:
+                self.untranslated.append((path, validator))
+            else:
+                keywords = _merge(keywords, translated)
+        return keywords
+
+    def validator(self, validator, field_type, path):
+        """Returns the JSON Schema keywords equivalent to the given validator
+        of values of the given type, or None if there aren't any."""
+        if isinstance(validator, (Gte, Lte, Gt, Lt, Between, Interval)):
+            return _bounds(validator)
+        if isinstance(validator, Length):
+            return _length(validator, field_type)
+        if isinstance(validator, OneOfValues):
+            if all(_is_json(item) for item in validator.items):
+                return {"enum": _enum(validator.items)}
+        elif isinstance(validator, Match):
+            if not _python_only(validator.pattern):
+                return {"pattern": _anchored(_end_anchored(validator.pattern))}
+        elif isinstance(validator, IsEmail):
+            return {"pattern": IsEmail.email}
+        elif isinstance(validator, IsUrl):
+            # Python's pattern ignores case, which JSON Schema patterns can't
+            return {"pattern": _URL}
+        elif isinstance(validator, Distinct):
+            return {"uniqueItems": True}
+        elif isinstance(validator, EachItem) and isinstance(field_type, Array):
+            items = {}
+            for item_validator in validator.validators:
+                translated = self.validator(item_validator, field_type.contained_type, path)
+                if translated is None:
+                    self.untranslated.append((path, item_validator))
+                else:
+                    items = _merge(items, translated)
+            return {"items": items}
+        return None
+
+
+def _bounds(validator):
+    """Returns the JSON Schema keywords bounding numbers as the given
+    validator does, or None if its bounds aren't numbers."""
+    if isinstance(validator, Gte):
+        keywords = {"minimum": validator.min_value}
+    elif isinstance(validator, Lte):
+        keywords = {"maximum": validator.max_value}
+    elif isinstance(validator, Gt):
+        keywords = {"exclusiveMinimum": validator.gt_value}
+    elif isinstance(validator, Lt):
+        keywords = {"exclusiveMaximum": validator.lt_value}
+    elif isinstance(validator, Between):
+        keywords = {"minimum": validator.min_value, "maximum": validator.max_value}
+    else:
+        keywords = {}
+        if validator.min_value is not None:
+            keywords["minimum" if validator.min_inclusive else "exclusiveMinimum"] = validator.min_value
+        if validator.max_value is not None:
+            keywords["maximum" if validator.max_inclusive else "exclusiveMaximum"] = validator.max_value
+    if all(isinstance(bound, _NUMBERS) and not isinstance(bound, bool) for bound in keywords.values()):
+        return keywords
+    return None
+
+
+def _length(validator, field_type):
+    """Returns the JSON Schema keywords bounding the length of values of the
+    given type as the given validator does, or None if the type has no
+    equivalent keywords."""
+    if isinstance(field_type, Array):
+        names = ("minItems", "maxItems")
+    elif isinstance(field_type, type) and issubclass(field_type, basestring):
+        names = ("minLength", "maxLength")
+    else:
+        return None
+    keywords = {}
+    if validator.min is not None:
+        keywords[names[0]] = validator.min
+    if validator.max is not None:
+        keywords[names[1]] = validator.max
+    return keywords
+
+
+def _enum(items):
+    """Returns the JSON values equal to any of the given items. As True == 1
+    and False == 0 in Python, but not in JSON, each of those values stands for
+    the other too."""
+    values = []
+    seen = set()
+    for item in items:
+        equal = [item]
+        if isinstance(item, _NUMBERS) and item in (0, 1):
+            equal = [item, bool(item)] if not isinstance(item, bool) else [item, int(item)]
+        for value in equal:
+            key = (isinstance(value, bool), value)
+            if key not in seen:
+                seen.add(key)
+                values.append(value)
+    return values
+
+
+def _python_only(pattern):
+    """Returns True if the given regular expression uses syntax which ECMA 262
+    regular expressions don't support."""
+    return any(token in _PYTHON_ONLY for token in _PATTERN_TOKENS.findall(pattern))
+
+
+def _anchored(pattern):
+    """Returns the given regular expression anchored to the start of the
+    value, as JSON Schema patterns may match anywhere in a value but Python's
+    re.match only matches at its start."""
+    if pattern.startswith('^'):
+        return pattern
+    return "^(?:{})".format(pattern)
+
+
+def _end_anchored(pattern):
+    """Returns the given regular expression with each end anchor also
+    matching before a newline ending the value, as Python's $ does but ECMA
+    262's doesn't."""
+    return _END_ANCHORS.sub(lambda m: r'\n?$' if m.group() == '$' else m.group(), pattern)
+
+
+def _merge(json_schema, keywords):
+    """Returns the given JSON Schema constrained by the given keywords."""
+    merged = dict(json_schema)
+    for keyword, value in keywords.iteritems():
+        if keyword == "items" and keyword in merged:
+            value = _merge(merged[keyword], value)
+        elif keyword in merged and merged[keyword] != value:
+            # Both constraints apply
+            return {"allOf": [json_schema, keywords]}
+        merged[keyword] = value
+    return merged
+
+
+def _nullable(json_schema):
+    """Returns the given JSON Schema also accepting null."""
+    if not json_schema:
+        return json_schema
+    if json_schema.keys() == ["anyOf"]:
+        return {"anyOf": json_schema["anyOf"] + [{"type": "null"}]}
+    if "type" not in json_schema:
+        return {"anyOf": [json_schema, {"type": "null"}]}
+    nullable = dict(json_schema, type=_types([json_schema]) + ["null"])
+    if "enum" in json_schema:
+        nullable["enum"] = json_schema["enum"] + [None]
+    return nullable
+
+
+def _types(json_schemas):
+    """Returns the list of the JSON types of the given JSON Schemas."""
+    json_types = []
+    for json_schema in json_schemas:
+        json_type = json_schema["type"]
+        json_types.extend(json_type if isinstance(json_type, list) else [json_type])
+    return json_types
+
+
+def _is_json(value):
+    """Returns True if the given value can be represented in JSON as it is."""
+    if isinstance(value, _JSON_VALUES):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_json(item) for item in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, basestring) and _is_json(item) for key, item in value.iteritems())
+    return False
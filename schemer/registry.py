@@ -0,0 +1,142 @@
+"""A registry of named schemas for pre-fork servers.
+
+Schemas registered with a SchemaRegistry, either directly or as factories
+which build them, are all built and verified when the registry is prepared.
+Preparing the registry in the master process before forking means each
+worker shares the master's copy of every schema rather than building its own,
+and collects (and where supported, freezes) garbage first so the workers'
+garbage collector doesn't write to the pages holding the schemas.
+
+A SchemaRef refers to a schema of a registry by name, so schemas may refer to
+themselves or to schemas registered later. Preparing a registry resolves the
+references held by its schemas."""
+
+from __future__ import absolute_import
+
+import gc
+import threading
+
+from schemer import Schema, Array, SchemaRef, OneOf
+
+
+class SchemaRegistry(object):
+    """A collection of schemas by name."""
+    __slots__ = ('_factories', '_schemas', '_prepared', '_lock', '_building')
+
+    def __init__(self):
+        self._factories = {}
+        self._schemas = {}
+        self._prepared = False
+        # Held while building schemas, so each is built once however many
+        # threads first need it at the same time
+        self._lock = threading.RLock()
+        self._building = set()
+
+    @property
+    def prepared(self):
+        """True once the registry has been prepared, after which no further
+        schemas can be registered."""
+        return self._prepared
+
+    def register(self, name, schema):
+        """Registers the given Schema, or a function of no arguments which
+        returns a Schema, under the given name. Factory functions are called
+        when the schema is first needed or the registry is prepared."""
+        if self._prepared:
+            raise ValueError("Cannot register schema {} with a prepared registry".format(name))
+        if name in self:
+            raise ValueError("A schema is already registered as {}".format(name))
+
+        if isinstance(schema, Schema):
+            self._schemas[name] = schema
+        elif callable(schema):
+            self._factories[name] = schema
+        else:
+            raise TypeError("Expected a Schema or a function returning one for {}".format(name))
+        return schema
+
+    def get(self, name):
+        """Returns the schema registered under the given name, building it if
+        required."""
+        schema = self._schemas.get(name)
+        if schema is None:
+            schema = self._build(name)
+        return schema
+
+    def prepare(self, freeze=True):
+        """Builds and verifies all the registered schemas and then collects
+        garbage, so the registry can be shared by processes forked from this
+        one. If freeze is True and the interpreter supports it (Python 3.7+),
+        all the objects which survive collection are frozen so they're never
+        examined by the garbage collector again. Returns the registry."""
+        for name in list(self._factories):
+            self._build(name)
+        self._resolve_references()
+        self._prepared = True
+
+        gc.collect()
+        if freeze and hasattr(gc, 'freeze'):
+            gc.freeze()
+        return self
+
+    def _resolve_references(self):
+        """Resolves every SchemaRef held by the registered schemas (and the
+        schemas they embed), raising a SchemaFormatException if any refer to
+        a schema which isn't registered."""
+        seen = set()
+        stack = list(self._schemas.values())
+        while stack:
+            schema = stack.pop()
+            if id(schema) in seen:
+                continue
+            seen.add(id(schema))
+            for field_spec in schema._fields:
+                field_type = field_spec.type
+                if isinstance(field_type, Array):
+                    field_type = field_type.contained_type
+                field_types = field_type.mapping.values() if isinstance(field_type, OneOf) else [field_type]
+                for field_type in field_types:
+                    if isinstance(field_type, SchemaRef):
+                        field_type = field_type.schema
+                    if isinstance(field_type, Schema):
+                        stack.append(field_type)
+
+    def _build(self, name):
+        """Builds the schema registered under the given name from its factory,
+        unless another thread already has."""
+        with self._lock:
+            schema = self._schemas.get(name)
+            if schema is not None:
+                return schema
+            factory = self._factories.get(name)
+            if factory is None or name in self._building:
+                # A factory needing its own schema can't be built either
+                raise KeyError("No schema is registered as {}".format(name))
+
+            self._building.add(name)
+            try:
+                schema = factory()
+            finally:
+                self._building.discard(name)
+            if not isinstance(schema, Schema):
+                raise TypeError("The factory for schema {} did not return a Schema".format(name))
+            self._schemas[name] = schema
+            del self._factories[name]
+            return schema
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self._schemas or name in self._factories
+
+    def __iter__(self):
+        return iter(sorted(list(self._schemas) + list(self._factories)))
+
+    def __len__(self):
+        return len(self._schemas) + len(self._factories)
+
+
+# The registry holding the schemas referred to by SchemaRefs which aren't
+# given a registry.
+default_registry = SchemaRegistry()
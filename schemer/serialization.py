@@ -0,0 +1,386 @@
+"""Conversion of documents to and from JSON compatible values.
+
+A Serializer compiles a Schema into a converter for each field, so dumping a
+document (e.g. datetimes to ISO 8601 strings) or loading one (ISO 8601
+strings back to datetimes) is a single pass over the document using the
+types the schema declares, rather than a generic walk dispatching on the type
+of every value. The document can optionally be validated in the same pass.
+
+Conversions for further types can be added with register_type."""
+
+from __future__ import absolute_import
+
+import threading
+import types
+from datetime import datetime
+from inspect import getmro
+
+from schemer import Schema, Array, OneOf, _resolve, _is_instance
+from schemer.coercion import parse_datetime
+from schemer.exceptions import ValidationException
+from schemer.type_checks import MAX_CACHED_TYPES, type_check
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+
+# Types whose values are JSON compatible as they are.
+_PLAIN_TYPES = (basestring, int, long, float)
+
+
+# The functions which dump values of each type, and load them back.
+_DUMPERS = {datetime: datetime.isoformat}
+_LOADERS = {datetime: parse_datetime}
+if ObjectId is not None:
+    _DUMPERS[ObjectId] = str
+    _LOADERS[ObjectId] = ObjectId
+
+
+def register_type(value_type, dump, load):
+    """Registers the functions which convert values of the given type to a
+    JSON compatible value and back. Affects serializers created afterwards."""
+    _DUMPERS[value_type] = dump
+    _LOADERS[value_type] = load
+
+
+class Serializer(object):
+    """Dumps documents of the given schema to JSON compatible dicts and loads
+    them back. Each declared field is converted according to its type; the
+    values of undeclared fields, and of fields whose types don't determine
+    a conversion (e.g. Mixed), are converted according to their own type."""
+    __slots__ = ('_schema', '_dump', '_load')
+
+    def __init__(self, schema):
+        self._schema = schema
+        self._dump = _Compiler(schema, _DUMPERS, False).compile(schema)
+        self._load = _Compiler(schema, _LOADERS, True).compile(schema)
+
+    def dump(self, instance, validate=False):
+        """Returns a JSON compatible copy of the given document. If validate
+        is True, the document is validated at the same time, raising a
+        ValidationException if it's invalid."""
+        return self._convert(self._dump, instance, validate)
+
+    def load(self, data, validate=False):
+        """Returns the document held by the given dumped data. If validate is
+        True, the loaded document is validated at the same time, raising a
+        ValidationException if it's invalid."""
+        return self._convert(self._load, data, validate)
+
+    def _convert(self, convert, instance, validate):
+        errors = {} if validate else None
+        result = convert(instance, '', errors)
+        if errors:
+            raise ValidationException(errors)
+        return result
+
+
+class _Compiler(object):
+    """Builds the functions converting values of each type in a schema.
+
+    Each function is called with a value, its path and the errors collection
+    (None when not validating) and returns the converted value. Values are
+    validated before they're dumped and after they're loaded."""
+
+    def __init__(self, schema, converters, loading):
+        self._schema = schema
+        self._converters = converters
+        self._loading = loading
+        self._found = {}
+        # The functions compiled, which are only added once complete (along
+        # with the functions they call), so they can be shared by threads;
+        # those being compiled, while the lock is held; and the number of
+        # types returned by dynamic type functions which have been compiled.
+        self._compiled = {}
+        self._building = {}
+        self._depth = 0
+        self._lock = threading.RLock()
+        self._dynamic_types = 0
+
+    def compile(self, field_type, item=False):
+        """Returns the function which converts values of the given type,
+        either as a field value or an item of an Array."""
+        field_type = _resolve(field_type)
+        key = (field_type, item and not isinstance(field_type, Schema))
+        convert = self._compiled.get(key)
+        if convert is None:
+            with self._lock:
+                convert = self._compiled.get(key) or self._building.get(key)
+                if convert is None:
+                    self._depth += 1
+                    try:
+                        convert = self._build(field_type, key, item)
+                    finally:
+                        self._depth -= 1
+                        if not self._depth:
+                            self._compiled.update(self._building)
+                            self._building.clear()
+        return convert
+
+    def compile_dynamic(self, field_type, item=False):
+        """Returns the function which converts values of the given type,
+        returned by a dynamic type function. Functions returning new types
+        (e.g. new Schemas) for each value would fill the cache, so beyond a
+        limit new types are compiled without being cached."""
+        field_type = _resolve(field_type)
+        key = (field_type, item and not isinstance(field_type, Schema))
+        convert = self._compiled.get(key)
+        if convert is not None:
+            return convert
+        if self._dynamic_types < MAX_CACHED_TYPES:
+            self._dynamic_types += 1
+            return self.compile(field_type, item)
+        return _Compiler(self._schema, self._converters, self._loading).compile(field_type, item)
+
+    def _build(self, field_type, key, item):
+        if isinstance(field_type, Schema):
+            return self._document(field_type, key)
+        if isinstance(field_type, Array):
+            convert = self._building[key] = self._array(field_type)
+        elif isinstance(field_type, OneOf):
+            convert = self._building[key] = self._union(field_type, item)
+        else:
+            convert = self._building[key] = self._type(field_type, item)
+        return convert
+
+    def _document(self, schema, key):
+        fields = {}
+        required = [field_spec for field_spec in schema._fields if field_spec.required]
+        validation = schema._validation
+        strict = schema._strict
+        append_path = schema._append_path
+        convert_any = self._any
+        loading = self._loading
+
+        def convert(instance, path_prefix, errors):
+            if not isinstance(instance, dict):
+                if errors is not None:
+                    errors[path_prefix] = "Expected instance of dict to validate against schema."
+                return instance
+
+            if errors is not None and validation is not None and not loading:
+                error = validation(instance)
+                if error:
+                    errors[path_prefix] = error
+
+            result = {}
+            for field, value in instance.iteritems():
+                convert_field = fields.get(field)
+                if convert_field is not None:
+                    path = append_path(path_prefix, field) if errors is not None else None
+                    result[field] = convert_field(value, path, errors)
+                else:
+                    if errors is not None and strict:
+                        errors[append_path(path_prefix, field)] = "Unexpected document field not present in schema"
+                    result[field] = convert_any(value)
+
+            if errors is not None:
+                for field_spec in required:
+                    if field_spec.name not in instance:
+                        path = append_path(path_prefix, field_spec.name)
+                        errors[path] = "{} is required.".format(path)
+                if validation is not None and loading:
+                    error = validation(result)
+                    if error:
+                        errors[path_prefix] = error
+            return result
+
+        # Registered before compiling the fields so that schemas which
+        # (indirectly) contain themselves are compiled once.
+        self._building[key] = convert
+        for field_spec in schema._fields:
+            fields[field_spec.name] = self._field(schema, field_spec)
+        return convert
+
+    def _field(self, schema, field_spec):
+        field_type = field_spec.type
+        nullable = field_spec.nullable
+        validation = field_spec.validation
+        loading = self._loading
+
+        if isinstance(field_type, types.FunctionType):
+            return self._dynamic(schema, field_spec)
+        convert_value = self.compile(field_type)
+        if isinstance(_resolve(field_type), Schema):
+            convert_value = _embedded(convert_value)
+
+        def convert(value, path, errors):
+            if value is None:
+                if errors is not None and not nullable:
+                    errors[path] = "{} is not nullable.".format(path)
+                return None
+            if errors is None or validation is None:
+                return convert_value(value, path, errors)
+
+            if loading:
+                value = convert_value(value, path, errors)
+                original = value
+            else:
+                original, value = value, convert_value(value, path, errors)
+            if path not in errors:
+                error = validation(original)
+                if error:
+                    errors[path] = error
+            return value
+
+        return convert
+
+    def _dynamic(self, schema, field_spec):
+        """Returns the function converting the values of a field whose type
+        is determined by a dynamic type function."""
+        compile = self.compile_dynamic
+        loading = self._loading
+
+        def convert(value, path, errors):
+            if errors is not None and not loading:
+                schema._validate_value(value, field_spec, path, errors)
+            if value is None:
+                converted = None
+            else:
+                try:
+                    field_type = field_spec.type(value)
+                except Exception:
+                    # Left as it is, for validation to report as validate() does
+                    field_type = None
+                converted = value if field_type is None else compile(field_type)(value, path, None)
+            if errors is not None and loading:
+                schema._validate_value(converted, field_spec, path, errors)
+            return converted
+
+        return convert
+
+    def _array(self, array_type):
+        contained_type = array_type.contained_type
+        append_path = self._schema._append_path
+        if isinstance(contained_type, types.FunctionType):
+            compile = self.compile_dynamic
+            convert_item = lambda item, path, errors: compile(contained_type(item), True)(item, path, errors)
+        else:
+            convert_item = self.compile(contained_type, True)
+
+        def convert(value, path, errors):
+            if not isinstance(value, list):
+                if errors is not None:
+                    errors[path] = "{} should be an embedded array".format(path)
+                return value
+            if errors is None:
+                return [convert_item(item, None, None) for item in value]
+            return [convert_item(item, append_path(path, i), errors) for i, item in enumerate(value)]
+
+        return convert
+
+    def _union(self, one_of, item):
+        """Returns the function converting documents of any of the schemas of
+        the given OneOf."""
+        append_path = self._schema._append_path
+        convert_any = self._any
+        # Each schema's function is compiled now, so converting is lock free
+        converters = dict((tag, self.compile(schema)) for tag, schema in one_of.mapping.iteritems())
+        discriminator = one_of.discriminator
+
+        def convert(value, path, errors):
+            if not isinstance(value, dict):
+                if errors is not None:
+                    if item:
+                        errors[path] = "Expected instance of dict to validate against schema."
+                    else:
+                        errors[path] = "{} should be an embedded document".format(path)
+                return value
+            try:
+                convert_document = converters.get(value.get(discriminator))
+            except TypeError:
+                convert_document = None  # unhashable discriminator
+            if convert_document is None:
+                if errors is not None:
+                    discriminator_path = append_path(path, discriminator)
+                    errors[discriminator_path] = one_of.unknown(value, discriminator_path)
+                return convert_any(value)
+            return convert_document(value, path, errors)
+
+        return convert
+
+    def _type(self, field_type, item):
+        if item:
+            message = "Array item at {} is of incorrect type"
+        else:
+            message = "Field should be of type " + str(field_type).replace('{', '{{').replace('}', '}}')
+        converter = self._converter(field_type)
+        check = type_check(field_type)
+        loading = self._loading
+
+        def convert(value, path, errors):
+            if loading and converter is not None and not _is_instance(value, field_type, check):
+                try:
+                    value = converter(value)
+                except (TypeError, ValueError):
+                    pass
+            if not _is_instance(value, field_type, check):
+                if errors is not None:
+                    errors[path] = message.format(path)
+                return value
+            if not loading and converter is not None:
+                return converter(value)
+            return value
+
+        return convert
+
+    def _converter(self, field_type):
+        """Returns the function converting values of the given type, or None
+        if they need no conversion."""
+        converter = self._registered(field_type)
+        if converter is not None:
+            return converter
+        if issubclass(field_type, _PLAIN_TYPES) or self._loading:
+            return None
+        # The type doesn't determine the conversion (e.g. object or Mixed)
+        return self._any
+
+    def _any(self, value):
+        """Converts the given value according to its own type."""
+        if self._loading:
+            return value
+        if isinstance(value, dict):
+            return dict((key, self._any(item)) for key, item in value.iteritems())
+        if isinstance(value, list):
+            return [self._any(item) for item in value]
+        converter = self._registered(getattr(value, '__class__', type(value)))
+        if converter is not None:
+            return converter(value)
+        return value
+
+    def _registered(self, value_type):
+        """Returns the function registered to convert values of the given type:
+        the one registered for the type itself or else for the nearest of its
+        base classes, so subclasses can be converted differently. Types which
+        are only virtual subclasses (e.g. of abstract base classes) are
+        converted by the first function found for them, if any."""
+        found = self._found.get(value_type, False)
+        if found is False:
+            found = None
+            for base in getmro(value_type):
+                found = self._converters.get(base)
+                if found is not None:
+                    break
+            else:
+                for registered_type, converter in self._converters.iteritems():
+                    if issubclass(value_type, registered_type):
+                        found = converter
+                        break
+            self._found[value_type] = found
+        return found
+
+
+def _embedded(convert_document):
+    """Returns the function converting the values of a field holding embedded
+    documents using the given function, reporting values which aren't
+    documents as validate() does."""
+    def convert(value, path, errors):
+        if not isinstance(value, dict):
+            if errors is not None:
+                errors[path] = "{} should be an embedded document".format(path)
+            return value
+        return convert_document(value, path, errors)
+
+    return convert
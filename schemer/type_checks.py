@@ -0,0 +1,58 @@
+"""The checks made that field values are of their declared types.
+
+Values are checked against most types with isinstance, which is fastest for
+ordinary classes. Types whose metaclass implements its own instance check
+(e.g. Mixed types and abstract base classes) are instead checked once per
+exact type of value, the result being cached, as their checks run Python code.
+
+Faster checks for further types can be registered with register_type_check,
+e.g. to accept only exact instances of a type."""
+
+import types
+
+
+# The most exact types of value whose result is cached for each type, so
+# values of dynamically created classes can't grow the cache indefinitely.
+MAX_CACHED_TYPES = 64
+
+
+# The registered function checking values are of each type, and the cached
+# checks made for types with their own instance checks.
+_CHECKS = {}
+_CACHED_CHECKS = {}
+
+
+def register_type_check(field_type, check):
+    """Registers the function which checks a value is of the given type,
+    returning True or False, in place of isinstance. Checks should be
+    registered before the schemas using the type are created."""
+    _CHECKS[field_type] = check
+
+
+def type_check(field_type):
+    """Returns the function which checks values are of the given type, or
+    None if isinstance should be used."""
+    check = _CHECKS.get(field_type)
+    if check is None and type(field_type) is not type and isinstance(field_type, type):
+        check = _CACHED_CHECKS.get(field_type)
+        if check is None:
+            check = _CACHED_CHECKS[field_type] = _cached_check(field_type)
+    return check
+
+
+def _cached_check(field_type):
+    """Returns a function checking values are instances of the given type,
+    caching the result for each exact type of value."""
+    accepted = {}
+
+    def check(value):
+        value_type = type(value)
+        result = accepted.get(value_type)
+        if result is None:
+            result = isinstance(value, field_type)
+            # Old-style instances all share a type, whatever their class
+            if value_type is not types.InstanceType and len(accepted) < MAX_CACHED_TYPES:
+                accepted[value_type] = result
+        return result
+
+    return check
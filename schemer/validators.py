@@ -5,6 +5,39 @@ def e(string, *args):
     """Function which formats error messages."""
     return string.format(*[pformat(arg) for arg in args])
 
+
+class Validator(object):
+    """
+    Base class of the validators provided by Schemer. A validator is called
+    with a field value and returns an error message if the value is invalid.
+    Unlike a plain validation function, a Validator exposes its kind and the
+    arguments it was created with, so it can be inspected, compared and pickled.
+    Subclasses implement __call__.
+    """
+    __slots__ = ()
+    kind = None
+
+    @property
+    def args(self):
+        """The arguments the validator was created with."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __reduce__(self):
+        return (type(self), self.args)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.args == other.args
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), repr(self.args)))
+
+    def __repr__(self):
+        return "{}({})".format(self.kind, ", ".join(repr(arg) for arg in self.args))
+
+
 def one_of(*args):
     """
     Validates that a field value matches one of the values
@@ -14,11 +47,19 @@ def one_of(*args):
         items = args[0]
     else:
         items = list(args)
+    return OneOfValues(items)
+
+
+class OneOfValues(Validator):
+    __slots__ = ('items',)
+    kind = 'one_of'
 
-    def validate(value):
-        if not value in items:
-            return e("{} is not in the list {}", value, items)
-    return validate
+    def __init__(self, items):
+        self.items = items
+
+    def __call__(self, value):
+        if not value in self.items:
+            return e("{} is not in the list {}", value, self.items)
 
 
 def gte(min_value):
@@ -26,10 +67,19 @@ def gte(min_value):
     Validates that a field value is greater than or equal to the
     value given to this validator.
     """
-    def validate(value):
-        if value < min_value:
-            return e("{} is not greater than or equal to {}", value, min_value)
-    return validate
+    return Gte(min_value)
+
+
+class Gte(Validator):
+    __slots__ = ('min_value',)
+    kind = 'gte'
+
+    def __init__(self, min_value):
+        self.min_value = min_value
+
+    def __call__(self, value):
+        if value < self.min_value:
+            return e("{} is not greater than or equal to {}", value, self.min_value)
 
 
 def lte(max_value):
@@ -37,10 +87,19 @@ def lte(max_value):
     Validates that a field value is less than or equal to the
     value given to this validator.
     """
-    def validate(value):
-        if value > max_value:
-            return e("{} is not less than or equal to {}", value, max_value)
-    return validate
+    return Lte(max_value)
+
+
+class Lte(Validator):
+    __slots__ = ('max_value',)
+    kind = 'lte'
+
+    def __init__(self, max_value):
+        self.max_value = max_value
+
+    def __call__(self, value):
+        if value > self.max_value:
+            return e("{} is not less than or equal to {}", value, self.max_value)
 
 
 def gt(gt_value):
@@ -48,10 +107,19 @@ def gt(gt_value):
     Validates that a field value is greater than the
     value given to this validator.
     """
-    def validate(value):
-        if value <= gt_value:
-            return e("{} is not greater than {}", value, gt_value)
-    return validate
+    return Gt(gt_value)
+
+
+class Gt(Validator):
+    __slots__ = ('gt_value',)
+    kind = 'gt'
+
+    def __init__(self, gt_value):
+        self.gt_value = gt_value
+
+    def __call__(self, value):
+        if value <= self.gt_value:
+            return e("{} is not greater than {}", value, self.gt_value)
 
 
 def lt(lt_value):
@@ -59,10 +127,19 @@ def lt(lt_value):
     Validates that a field value is less than the
     value given to this validator.
     """
-    def validate(value):
-        if value >= lt_value:
-            return e("{} is not less than {}", value, lt_value)
-    return validate
+    return Lt(lt_value)
+
+
+class Lt(Validator):
+    __slots__ = ('lt_value',)
+    kind = 'lt'
+
+    def __init__(self, lt_value):
+        self.lt_value = lt_value
+
+    def __call__(self, value):
+        if value >= self.lt_value:
+            return e("{} is not less than {}", value, self.lt_value)
 
 
 def between(min_value, max_value):
@@ -70,14 +147,24 @@ def between(min_value, max_value):
     Validates that a field value is between the two values
     given to this validator.
     """
-    def validate(value):
-        if value < min_value:
+    return Between(min_value, max_value)
+
+
+class Between(Validator):
+    __slots__ = ('min_value', 'max_value')
+    kind = 'between'
+
+    def __init__(self, min_value, max_value):
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def __call__(self, value):
+        if value < self.min_value:
             return e("{} is not greater than or equal to {}",
-                value, min_value)
-        if value > max_value:
+                value, self.min_value)
+        if value > self.max_value:
             return e("{} is not less than or equal to {}",
-                value, max_value)
-    return validate
+                value, self.max_value)
 
 
 def length(min=None, max=None):
@@ -85,30 +172,72 @@ def length(min=None, max=None):
     Validates that a field value's length is between the bounds given to this
     validator.
     """
+    return Length(min, max)
 
-    def validate(value):
-        if min and len(value) < min:
-            return e("{} does not have a length of at least {}", value, min)
-        if max and len(value) > max:
-            return e("{} does not have a length of at most {}", value, max)
-    return validate
+
+class Length(Validator):
+    __slots__ = ('min', 'max')
+    kind = 'length'
+
+    def __init__(self, min=None, max=None):
+        self.min = min
+        self.max = max
+
+    def __call__(self, value):
+        size = len(value)
+        if self.min is not None and size < self.min:
+            return "{} does not have a length of at least {}".format(_abbreviate(value), pformat(self.min))
+        if self.max is not None and size > self.max:
+            return "{} does not have a length of at most {}".format(_abbreviate(value), pformat(self.max))
+
+
+# The number of items of a list or tuple shown in an error message, so that
+# rejecting an oversized one costs no more than formatting its first items.
+_ABBREVIATED_ITEMS = 20
+
+
+def _abbreviate(value):
+    """Formats the given value for an error message, showing only the first
+    items of long lists and tuples."""
+    if isinstance(value, (list, tuple)) and len(value) > _ABBREVIATED_ITEMS:
+        shown = pformat(value[:_ABBREVIATED_ITEMS])
+        return "{}, ... ({} items){}".format(shown[:-1], len(value), shown[-1])
+    return pformat(value)
 
 
 def match(pattern):
     """
     Validates that a field value matches the regex given to this validator.
     """
-    regex = re.compile(pattern)
+    return Match(pattern)
+
+
+class Match(Validator):
+    __slots__ = ('pattern', '_regex')
+    kind = 'match'
 
-    def validate(value):
-        if not regex.match(value):
-            return e("{} does not match the pattern {}", value, pattern)
-    return validate
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self._regex = re.compile(pattern)
+
+    @property
+    def args(self):
+        return (self.pattern,)
+
+    def __call__(self, value):
+        if not self._regex.match(value):
+            return e("{} does not match the pattern {}", value, self.pattern)
 
 def is_email():
     """
     Validates that a fields value is a valid email address.
     """
+    return IsEmail()
+
+
+class IsEmail(Validator):
+    __slots__ = ()
+    kind = 'is_email'
 
     email = (
         ur'(?!^\.)'     # No dot at start
@@ -123,15 +252,21 @@ def is_email():
 
     regex = re.compile(email, re.IGNORECASE | re.UNICODE)
 
-    def validate(value):
-        if not regex.match(value):
+    def __call__(self, value):
+        if not self.regex.match(value):
             return e("{} is not a valid email address", value)
-    return validate
 
 def is_url():
     """
     Validates that a fields value is a valid URL.
     """
+    return IsUrl()
+
+
+class IsUrl(Validator):
+    __slots__ = ()
+    kind = 'is_url'
+
     # Stolen from Django
     regex = re.compile(
         r'^(?:http|ftp)s?://' # http:// or https://
@@ -141,10 +276,9 @@ def is_url():
         r'(?::\d+)?' # optional port
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
 
-    def validate(value):
-        if not regex.match(value):
+    def __call__(self, value):
+        if not self.regex.match(value):
             return e("{} is not a valid URL", value)
-    return validate
 
 
 def each_item(*validators):
@@ -156,14 +290,27 @@ def each_item(*validators):
 
     "my_list_field": {"type": Array(int), "validates": each_item(lte(10))}
     """
-    def validate(value):
+    return EachItem(*validators)
+
+
+class EachItem(Validator):
+    __slots__ = ('validators',)
+    kind = 'each_item'
+
+    def __init__(self, *validators):
+        self.validators = validators
+
+    @property
+    def args(self):
+        return self.validators
+
+    def __call__(self, value):
         for item in value:
-            for validator in validators:
+            for validator in self.validators:
                 error = validator(item)
                 if error:
                     return error
         return None
-    return validate
 
 
 def distinct():
@@ -171,9 +318,147 @@ def distinct():
     Validates that all items in the given field list value are distinct,
     i.e. that the list contains no duplicates.
     """
-    def validate(value):
+    return Distinct()
+
+
+class Distinct(Validator):
+    __slots__ = ()
+    kind = 'distinct'
+
+    def __call__(self, value):
         for i, item in enumerate(value):
             if item in value[i+1:]:
                 return e("{} is not a distinct set of values", value)
-    return validate
 
+
+def chain(validators):
+    """
+    Combines the given validator, or list of validators, into a single
+    validator which returns the first error the validators would return if
+    applied in order. Duplicate validators are removed and, where there is
+    more than one validator, they are fused (e.g. `gte(0)` and `lte(10)` are
+    checked as a single interval) and cheap checks are made before expensive
+    ones.
+    """
+    if not isinstance(validators, (list, tuple)):
+        validators = [validators]
+
+    unique = []
+    for validator in validators:
+        if validator not in unique:
+            unique.append(validator)
+
+    if len(unique) == 1:
+        return unique[0]
+    return Chain(unique)
+
+
+class Chain(Validator):
+    __slots__ = ('validators', '_checks')
+    kind = 'chain'
+
+    def __init__(self, validators):
+        self.validators = tuple(validators)
+        self._checks = _fuse(self.validators)
+
+    @property
+    def args(self):
+        return (self.validators,)
+
+    def __call__(self, value):
+        for check in self._checks:
+            error = check(value)
+            if error:
+                # Report the error of the first failing validator
+                for validator in self.validators:
+                    first_error = validator(value)
+                    if first_error:
+                        return first_error
+                return error
+        return None
+
+
+class Interval(Validator):
+    __slots__ = ('min_value', 'min_inclusive', 'max_value', 'max_inclusive')
+    kind = 'interval'
+
+    def __init__(self, min_value=None, min_inclusive=True, max_value=None, max_inclusive=True):
+        self.min_value = min_value
+        self.min_inclusive = min_inclusive
+        self.max_value = max_value
+        self.max_inclusive = max_inclusive
+
+    def __call__(self, value):
+        if self.min_value is not None:
+            if value < self.min_value or (value == self.min_value and not self.min_inclusive):
+                return e("{} is not within the interval {}", value, self._bounds())
+        if self.max_value is not None:
+            if value > self.max_value or (value == self.max_value and not self.max_inclusive):
+                return e("{} is not within the interval {}", value, self._bounds())
+
+    def _bounds(self):
+        return "{}{}, {}{}".format('[' if self.min_inclusive else '(', self.min_value,
+                                   self.max_value, ']' if self.max_inclusive else ')')
+
+
+# Relative cost of the checks made by each kind of validator. Validators of
+# other kinds (e.g. custom validation functions) are assumed to cost 2.
+_COSTS = {
+    'interval': 0, 'gte': 0, 'lte': 0, 'gt': 0, 'lt': 0, 'between': 0,
+    'length': 0, 'one_of': 1,
+    'match': 3, 'is_email': 3, 'is_url': 3,
+    'each_item': 4, 'distinct': 4
+}
+
+
+def _fuse(validators):
+    """Returns a tuple of checks, ordered cheapest first, which together
+    accept exactly the values accepted by all the given validators."""
+    bounds = [v for v in validators if isinstance(v, (Gte, Lte, Gt, Lt, Between))]
+    lengths = [v for v in validators if isinstance(v, Length)]
+    checks = [v for v in validators if v not in bounds and v not in lengths]
+
+    if len(bounds) > 1 and _comparable([arg for bound in bounds for arg in bound.args]):
+        checks.append(_interval(bounds))
+    else:
+        checks.extend(bounds)
+
+    if len(lengths) > 1:
+        mins = [length.min for length in lengths if length.min is not None]
+        maxes = [length.max for length in lengths if length.max is not None]
+        checks.append(Length(max(mins) if mins else None, min(maxes) if maxes else None))
+    else:
+        checks.extend(lengths)
+
+    checks.sort(key=lambda check: _COSTS.get(getattr(check, 'kind', None), 2))
+    return tuple(checks)
+
+
+def _comparable(values):
+    """Returns True if the given values can be meaningfully compared with one
+    another, i.e. they're all numbers or all of the same type."""
+    if all(isinstance(value, (int, long, float)) for value in values):
+        return True
+    return len(set(type(value) for value in values)) == 1
+
+
+def _interval(bounds):
+    """Returns the single Interval equivalent to the given bound validators."""
+    lower, upper = [], []
+    for bound in bounds:
+        if isinstance(bound, Gte):
+            lower.append((bound.min_value, True))
+        elif isinstance(bound, Gt):
+            lower.append((bound.gt_value, False))
+        elif isinstance(bound, Lte):
+            upper.append((bound.max_value, True))
+        elif isinstance(bound, Lt):
+            upper.append((bound.lt_value, False))
+        else:
+            lower.append((bound.min_value, True))
+            upper.append((bound.max_value, True))
+
+    # The tightest bounds win, with exclusive bounds tighter than inclusive ones
+    min_value, min_inclusive = max(lower, key=lambda b: (b[0], not b[1])) if lower else (None, True)
+    max_value, max_inclusive = min(upper, key=lambda b: (b[0], b[1])) if upper else (None, True)
+    return Interval(min_value, min_inclusive, max_value, max_inclusive)
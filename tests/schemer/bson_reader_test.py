@@ -0,0 +1,217 @@
+from schemer import Schema, Array
+from schemer.bson_reader import (iter_documents, decode_document, validate_bson,
+    validate_bson_file, _decode)
+from schemer.exceptions import ValidationException
+from schemer.validators import one_of, length, lte, each_item
+from datetime import datetime
+from sample import blog_post_schema, valid_doc
+import os
+import struct
+import tempfile
+import unittest
+from mock import patch
+
+
+def encode(document):
+    """A minimal BSON encoder for the types used in these tests."""
+    return encode_elements(document.iteritems())
+
+
+def encode_elements(elements):
+    body = b''.join(encode_element(name, value) for name, value in elements)
+    return struct.pack('<i', len(body) + 5) + body + b'\x00'
+
+
+def encode_element(name, value):
+    name = name.encode('utf-8') + b'\x00'
+    if value is None:
+        return b'\x0a' + name
+    if isinstance(value, bool):
+        return b'\x08' + name + (b'\x01' if value else b'\x00')
+    if isinstance(value, int):
+        return b'\x10' + name + struct.pack('<i', value)
+    if isinstance(value, long):
+        return b'\x12' + name + struct.pack('<q', value)
+    if isinstance(value, float):
+        return b'\x01' + name + struct.pack('<d', value)
+    if isinstance(value, basestring):
+        encoded = value.encode('utf-8') + b'\x00'
+        return b'\x02' + name + struct.pack('<i', len(encoded)) + encoded
+    if isinstance(value, datetime):
+        millis = int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+        return b'\x09' + name + struct.pack('<q', millis)
+    if isinstance(value, dict):
+        return b'\x03' + name + encode(value)
+    if isinstance(value, list):
+        return b'\x04' + name + encode_elements((str(i), item) for i, item in enumerate(value))
+    raise TypeError(value)
+
+
+class TestDecodeDocument(unittest.TestCase):
+    def test_round_trip(self):
+        document = {u"name": u"bob", u"age": 32, u"big": 1L << 40, u"score": 1.5,
+                    u"admin": True, u"nothing": None, u"joined": datetime(2014, 3, 4, 5, 6, 7),
+                    u"tags": [u"a", u"b"], u"address": {u"city": u"London"}}
+        self.assertEqual(document, decode_document(encode(document)))
+
+    def test_memoryview(self):
+        self.assertEqual({u"name": u"bob"}, decode_document(memoryview(encode({"name": "bob"}))))
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            decode_document(encode({"name": "bob"})[:-1])
+
+
+class TestIterDocuments(unittest.TestCase):
+    def test_offsets(self):
+        first, second = encode({"a": 1}), encode({"b": u"two"})
+        self.assertEqual([0, len(first)], list(iter_documents(first + second)))
+
+
+# Schema level validators require the whole document to be decoded, so most
+# tests use a copy of the blog post schema without them.
+post_schema = Schema(blog_post_schema.doc_spec)
+
+
+class TestValidateBSON(unittest.TestCase):
+    def assert_paths_invalid(self, document, paths, schema=post_schema):
+        with self.assertRaises(ValidationException) as cm:
+            validate_bson(schema, encode(document))
+        self.assertEqual(sorted(paths), sorted(cm.exception.errors.keys()))
+
+        # The results should always match validating the decoded document
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate(document)
+        self.assertEqual(sorted(paths), sorted(cm.exception.errors.keys()))
+
+    def test_valid_document(self):
+        validate_bson(post_schema, encode(valid_doc()))
+        validate_bson(blog_post_schema, encode(valid_doc()))
+
+    def test_valid_memoryview(self):
+        validate_bson(post_schema, memoryview(encode(valid_doc())))
+
+    def test_missing_required_fields(self):
+        document = valid_doc()
+        del document['author']
+        del document['content']['title']
+        del document['comments'][1]['commenter']['first']
+        self.assert_paths_invalid(document, ['author', 'content.title', 'comments.1.commenter.first'])
+
+    def test_incorrect_types(self):
+        document = valid_doc()
+        document['likes'] = 1.5
+        document['tags'].append(55)
+        document['content'] = u'text'
+        document['comments'][0] = u'comment'
+        self.assert_paths_invalid(document, ['likes', 'tags.3', 'content', 'comments.0'])
+
+    def test_null_values(self):
+        document = valid_doc()
+        document['likes'] = None
+        document['external_code'] = None
+        self.assert_paths_invalid(document, ['external_code'])
+
+    def test_unexpected_field(self):
+        document = valid_doc()
+        document['something'] = u'extra'
+        self.assert_paths_invalid(document, ['something'])
+
+    def test_validators(self):
+        document = valid_doc()
+        document['category'] = u'gardening'
+        document['tags'] = []
+        self.assert_paths_invalid(document, ['category', 'tags'])
+
+    def test_dynamic_types(self):
+        document = valid_doc()
+        document['website'] = [{'url': u'a'}]
+        document['editors'] = [u'Jordan Gansey', {'last': u'Gansey'}]
+        self.assert_paths_invalid(document, ['website.0.name', 'editors.1.first'])
+
+    def test_schema_level_validators(self):
+        document = valid_doc()
+        document.update(
+            {'creation_date': datetime(2014, 1, 1),
+             'modification_date': datetime(2013, 1, 1),
+             'final_date': datetime(2015, 1, 1)})
+        self.assert_paths_invalid(document, [''], blog_post_schema)
+
+    def test_max_errors(self):
+        document = valid_doc()
+        document['comments'] = [{} for i in range(100)]
+        with self.assertRaises(ValidationException) as cm:
+            validate_bson(post_schema, encode(document), max_errors=10)
+        self.assertEqual(10, len(cm.exception.errors))
+        self.assertTrue(cm.exception.truncated)
+
+    def test_offset(self):
+        schema = Schema({"name": {"type": basestring, "validates": length(1)}})
+        data = encode({"name": u"bob"}) + encode({"name": u""})
+        validate_bson(schema, data)
+        with self.assertRaises(ValidationException):
+            validate_bson(schema, data, len(encode({"name": u"bob"})))
+
+    def test_validators_of_embedded_array(self):
+        schema = Schema({"colors": {"type": Array(basestring), "validates": length(max=1)},
+                         "size": {"type": int, "validates": one_of(1, 2)}})
+        validate_bson(schema, encode({"colors": [u"red"], "size": 1}))
+        with self.assertRaises(ValidationException) as cm:
+            validate_bson(schema, encode({"colors": [u"red", u"blue"], "size": 3}))
+        self.assertEqual(['colors', 'size'], sorted(cm.exception.errors.keys()))
+
+    def test_array_of_wrong_length(self):
+        schema = Schema({"colors": {"type": Array(basestring), "validates": length(1, 2)}})
+        for colors in [[], [1, 2, 3], [u"red", u"blue", u"green"]]:
+            with self.assertRaises(ValidationException) as cm:
+                validate_bson(schema, encode({"colors": colors}))
+            with self.assertRaises(ValidationException) as expected:
+                schema.validate({"colors": colors})
+            self.assertEqual(expected.exception.errors, cm.exception.errors)
+            self.assertEqual(['colors'], cm.exception.errors.keys())
+
+    @patch('schemer.bson_reader._decode', wraps=_decode)
+    def test_only_first_items_of_oversized_array_are_decoded(self, decode):
+        schema = Schema({"numbers": {"type": Array(int), "validates": length(max=2)}})
+        document = {"numbers": range(1000)}
+        with self.assertRaises(ValidationException) as cm:
+            validate_bson(schema, encode(document))
+        with self.assertRaises(ValidationException) as expected:
+            schema.validate(document)
+        self.assertEqual(expected.exception.errors, cm.exception.errors)
+        self.assertEqual(20, decode.call_count)
+
+    @patch('schemer.bson_reader._decode', wraps=_decode)
+    def test_validators_examining_items_of_array_of_wrong_length(self, decode):
+        schema = Schema({"numbers": {"type": Array(int), "validates": [each_item(lte(5)), length(max=2)]}})
+        document = {"numbers": [9] * 1000}
+        with self.assertRaises(ValidationException) as cm:
+            validate_bson(schema, encode(document))
+        with self.assertRaises(ValidationException) as expected:
+            schema.validate(document)
+        self.assertEqual(expected.exception.errors, cm.exception.errors)
+        self.assertEqual(20, decode.call_count)
+
+
+class TestValidateBSONFile(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_yields_invalid_documents(self):
+        invalid = valid_doc()
+        del invalid['author']
+        data = [encode(valid_doc()), encode(invalid), encode(valid_doc())]
+        with open(self.path, 'wb') as f:
+            f.write(b''.join(data))
+
+        results = list(validate_bson_file(post_schema, self.path))
+        self.assertEqual(1, len(results))
+        self.assertEqual(len(data[0]), results[0][0])
+        self.assertEqual(['author'], results[0][1].errors.keys())
+
+    def test_empty_file(self):
+        self.assertEqual([], list(validate_bson_file(post_schema, self.path)))
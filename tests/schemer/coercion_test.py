@@ -0,0 +1,49 @@
+from schemer.coercion import coerce, register_coercer, parse_datetime, FixedOffset, _COERCERS
+from datetime import datetime
+from decimal import Decimal
+import unittest
+
+
+class TestCoerce(unittest.TestCase):
+    def test_numbers(self):
+        self.assertEqual(42, coerce("42", int))
+        self.assertEqual(42, coerce(u" 42 ", int))
+        self.assertEqual(42L, coerce("42", long))
+        self.assertEqual(1.5, coerce("1.5", float))
+        self.assertEqual(2.0, coerce(2, float))
+
+    def test_booleans(self):
+        self.assertEqual(True, coerce("True", bool))
+        self.assertEqual(False, coerce("no", bool))
+        self.assertEqual(False, coerce("0", bool))
+
+    def test_datetimes(self):
+        self.assertEqual(datetime(2014, 3, 4), coerce("2014-03-04", datetime))
+        self.assertEqual(datetime(2014, 3, 4, 5, 6, 7), parse_datetime("2014-03-04T05:06:07"))
+        self.assertEqual(datetime(2014, 3, 4, 5, 6, 7, 8), parse_datetime("2014-03-04T05:06:07.000008"))
+
+    def test_datetimes_with_utc_offsets(self):
+        parsed = parse_datetime("2014-03-04T05:06:07.000008+05:30")
+        self.assertEqual(datetime(2014, 3, 4, 5, 6, 7, 8, FixedOffset(330)), parsed)
+        self.assertEqual("+05:30", parsed.tzname())
+        self.assertEqual(datetime(2014, 3, 4, 5, 6, 7, tzinfo=FixedOffset(0)), parse_datetime("2014-03-04T05:06:07Z"))
+        self.assertEqual(datetime(2014, 3, 4, 10, 6, 7, tzinfo=FixedOffset(0)),
+                         parse_datetime("2014-03-04T05:06:07-0500"))
+
+    def test_values_which_cannot_be_coerced_are_unchanged(self):
+        self.assertEqual("forty", coerce("forty", int))
+        self.assertEqual("maybe", coerce("maybe", bool))
+        self.assertEqual(1.5, coerce(1.5, int))
+        self.assertEqual(True, coerce(True, float))
+        self.assertEqual("today", coerce("today", datetime))
+        self.assertEqual(["1"], coerce(["1"], int))
+
+    def test_types_without_coercers(self):
+        self.assertEqual(42, coerce(42, basestring))
+
+    def test_register_coercer(self):
+        try:
+            register_coercer(Decimal, Decimal)
+            self.assertEqual(Decimal("1.50"), coerce("1.50", Decimal))
+        finally:
+            del _COERCERS[Decimal]
@@ -0,0 +1,138 @@
+from schemer import Schema, Array, Mixed
+from schemer.columnar import validate_columns
+from schemer.exceptions import ValidationException
+from schemer.validators import one_of, gte, lte, gt, lt, between, length
+from array import array
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestValidateColumns(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema({
+            "name":     {"type": basestring, "required": True, "validates": length(1)},
+            "age":      {"type": int, "validates": [gte(0), lte(150)]},
+            "score":    {"type": float, "validates": between(0.0, 1.0)},
+            "rank":     {"type": int, "validates": [gt(0), lt(10)]},
+            "color":    {"type": basestring, "validates": one_of("red", "blue")},
+            "nickname": {"type": basestring, "nullable": False},
+            "tags":     {"type": Array(basestring)}
+        })
+
+    def test_valid_batch(self):
+        self.assertEqual({}, validate_columns(self.schema, {
+            "name": ["a", "b"],
+            "age": [1, None],
+            "score": [0.5, 1.0],
+            "rank": [1, 9],
+            "color": ["red", None],
+            "tags": [["x"], None]
+        }))
+
+    def test_required_column_missing(self):
+        self.assertEqual({"name": [0, 1, 2]}, validate_columns(self.schema, {"age": [1, 2, 3]}))
+
+    def test_empty_batch(self):
+        self.assertEqual({}, validate_columns(self.schema, {}))
+
+    def test_null_values(self):
+        self.assertEqual(
+            {"name": [1], "nickname": [0]},
+            validate_columns(self.schema, {"name": ["a", None], "nickname": [None, "b"]}))
+
+    def test_types(self):
+        self.assertEqual(
+            {"age": [1, 3], "name": [2]},
+            validate_columns(self.schema, {"name": ["a", "b", 3, "d"], "age": [1, "2", 3, 4.0]}))
+
+    def test_numeric_validators(self):
+        self.assertEqual(
+            {"age": [0, 3], "score": [1], "rank": [0, 2]},
+            validate_columns(self.schema, {
+                "name": ["a", "b", "c", "d"],
+                "age": [-1, 0, 150, 151],
+                "score": [0.0, 1.5, 1.0, None],
+                "rank": [0, 1, 10, 9]}))
+
+    def test_one_of_and_other_validators(self):
+        self.assertEqual(
+            {"color": [1], "name": [0]},
+            validate_columns(self.schema, {"name": ["", "b"], "color": ["red", "green"]}))
+
+    def test_per_value_validation_of_arrays(self):
+        self.assertEqual(
+            {"tags": [1]},
+            validate_columns(self.schema, {"name": ["a", "b"], "tags": [["x"], [1]]}))
+
+    def test_unknown_columns(self):
+        self.assertEqual(
+            {"extra": [0]},
+            validate_columns(self.schema, {"name": ["a", "b"], "extra": [1, None]}))
+        self.assertEqual(
+            {},
+            validate_columns(Schema(self.schema.doc_spec, strict=False), {"name": ["a", "b"], "extra": [1, None]}))
+
+    def test_mismatched_column_lengths(self):
+        with self.assertRaises(ValueError):
+            validate_columns(self.schema, {"name": ["a", "b"], "age": [1]})
+
+    def test_array_module_columns(self):
+        self.assertEqual(
+            {"age": [1]},
+            validate_columns(self.schema, {"name": ["a", "b"], "age": array('l', [3, -3])}))
+
+    def test_mixed_type(self):
+        schema = Schema({"id": {"type": Mixed(int, basestring)}})
+        self.assertEqual({"id": [2]}, validate_columns(schema, {"id": [1, "a", 1.5]}))
+
+    def test_schema_level_validators(self):
+        def lo_le_hi(record):
+            if "lo" in record and "hi" in record and record["lo"] > record["hi"]:
+                return "lo is greater than hi"
+        schema = Schema({"lo": {"type": int}, "hi": {"type": int}}, validates=[lo_le_hi])
+        columns = {"lo": [1, 5, 5], "hi": [2, 3, None]}
+        self.assertEqual({"": [1]}, validate_columns(schema, columns))
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"lo": 5, "hi": 3})
+        self.assertEqual([""], cm.exception.errors.keys())
+        schema.validate({"lo": 5})
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestValidateNumPyColumns(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema({
+            "age":      {"type": int, "required": True, "validates": [gte(0), lte(150)]},
+            "score":    {"type": float, "validates": between(0.0, 1.0)},
+            "rank":     {"type": int, "validates": [gt(0), lt(10), one_of(1, 2, 3)]},
+            "odd":      {"type": int, "validates": lambda value: None if value % 2 else "even"}
+        })
+
+    def test_numeric_validators(self):
+        self.assertEqual(
+            {"age": [0, 3], "score": [1], "rank": [0, 2, 3], "odd": [1]},
+            validate_columns(self.schema, {
+                "age": numpy.array([-1, 0, 150, 151]),
+                "score": numpy.array([0.0, 1.5, 1.0, 0.5]),
+                "rank": numpy.array([0, 1, 10, 9]),
+                "odd": numpy.array([1, 2, 3, 5])}))
+
+    def test_column_of_incorrect_type(self):
+        self.assertEqual(
+            {"age": [0, 1]},
+            validate_columns(self.schema, {"age": numpy.array([1.0, 2.0])}))
+
+    def test_schema_level_validators(self):
+        schema = Schema({"age": {"type": int}}, validates=[lambda record: None if "age" in record else "no age"])
+        age = numpy.ma.masked_array([1, -1, 2], mask=[False, True, False])
+        self.assertEqual({"": [1]}, validate_columns(schema, {"age": age}))
+
+    def test_masked_values_are_null(self):
+        age = numpy.ma.masked_array([1, -1, 2], mask=[False, True, False])
+        score = numpy.ma.masked_array([0.5, 2.0], mask=[False, True])
+        self.assertEqual({"age": [1]}, validate_columns(self.schema, {"age": age}))
+        self.assertEqual({}, validate_columns(self.schema, {"age": numpy.array([1, 2]), "score": score}))
@@ -0,0 +1,160 @@
+from schemer import Schema, Array, SchemaRef, OneOf
+from schemer.diff import (SchemaDiff, ADDED_REQUIRED, ADDED, REMOVED, REQUIRED, NOT_NULLABLE,
+                          TYPE, VALIDATION, STRICT, SCHEMA_VALIDATION)
+from schemer.exceptions import ValidationException
+from schemer.registry import SchemaRegistry
+from schemer.validators import gte, lte, one_of
+from sample import blog_post_schema, valid_doc
+from mock import patch
+import unittest
+
+
+def comment_schema(**extra):
+    doc_spec = {
+        "comment":  {"type": basestring, "required": True},
+        "votes":    {"type": int, "validates": gte(0)},
+        "email":    {"type": basestring}
+    }
+    doc_spec.update(extra)
+    return Schema(doc_spec)
+
+
+def post_schema(comment=None, strict=True, validates=[], **extra):
+    doc_spec = {
+        "title":    {"type": basestring, "required": True},
+        "category": {"type": basestring, "validates": one_of("cooking", "politics")},
+        "comments": {"type": Array(comment or comment_schema())}
+    }
+    doc_spec.update(extra)
+    return Schema(doc_spec, strict=strict, validates=validates)
+
+
+class TestSchemaDiff(unittest.TestCase):
+    def changes(self, old, new):
+        return [(change.path, change.kind) for change in SchemaDiff(old, new).changes]
+
+    def test_identical_schemas(self):
+        diff = SchemaDiff(post_schema(), post_schema())
+        self.assertEqual([], diff.changes)
+        self.assertFalse(diff.breaking)
+        self.assertEqual([], diff.fields)
+        self.assertEqual([], SchemaDiff(blog_post_schema, blog_post_schema).changes)
+
+    def test_added_fields(self):
+        new = post_schema(author={"type": basestring, "required": True}, slug={"type": basestring})
+        self.assertEqual([("author", ADDED_REQUIRED)], self.changes(post_schema(), new))
+        self.assertEqual([("author", ADDED_REQUIRED), ("slug", ADDED)],
+                         self.changes(post_schema(strict=False), post_schema(strict=False, **new.doc_spec)))
+
+    def test_removed_fields(self):
+        old = post_schema(slug={"type": basestring})
+        self.assertEqual([("slug", REMOVED)], self.changes(old, post_schema()))
+        self.assertEqual([], self.changes(post_schema(strict=False, **old.doc_spec), post_schema(strict=False)))
+
+    def test_changed_fields(self):
+        new = post_schema(comments={"type": Array(comment_schema()), "nullable": False},
+                          category={"type": basestring, "required": True, "nullable": True,
+                                    "validates": one_of("cooking", "politics")})
+        self.assertEqual([("category", REQUIRED), ("comments", NOT_NULLABLE)], self.changes(post_schema(), new))
+
+    def test_changed_types(self):
+        self.assertEqual([("title", TYPE)],
+                         self.changes(post_schema(), post_schema(title={"type": int, "required": True})))
+        # Widening a type can't invalidate documents
+        self.assertEqual([], self.changes(post_schema(title={"type": str, "required": True}), post_schema()))
+        self.assertEqual([("comments", TYPE)],
+                         self.changes(post_schema(), post_schema(comments={"type": comment_schema()})))
+
+    def test_changed_validators(self):
+        self.assertEqual([("category", VALIDATION)], self.changes(post_schema(), post_schema(
+            category={"type": basestring, "validates": one_of("cooking")})))
+        # Removing validators can't invalidate documents
+        self.assertEqual([], self.changes(post_schema(), post_schema(category={"type": basestring})))
+        self.assertEqual([("comments.votes", VALIDATION)], self.changes(post_schema(), post_schema(
+            comment_schema(votes={"type": int, "validates": [gte(0), lte(100)]}))))
+
+    def test_schema_changes(self):
+        validator = lambda document: None
+        self.assertEqual([("", STRICT)], self.changes(post_schema(strict=False), post_schema()))
+        self.assertEqual([("", SCHEMA_VALIDATION)], self.changes(post_schema(), post_schema(validates=[validator])))
+        self.assertEqual([], self.changes(post_schema(validates=[validator]), post_schema()))
+
+    def test_changes_in_embedded_documents(self):
+        new = post_schema(comment_schema(votes={"type": float}, author={"type": basestring, "required": True}))
+        self.assertEqual([("comments.author", ADDED_REQUIRED), ("comments.votes", TYPE)],
+                         self.changes(post_schema(), new))
+
+    def test_changes_in_one_of(self):
+        kind = {"type": basestring}
+        old = post_schema(event={"type": OneOf("kind", {
+            "comment": comment_schema(kind=kind), "like": Schema({"kind": kind})})})
+        new = post_schema(event={"type": OneOf("kind", {
+            "comment": comment_schema(kind=kind, email={"type": basestring, "required": True}),
+            "like": Schema({"kind": kind}), "share": Schema({"kind": kind})})})
+        self.assertEqual([("event.email", REQUIRED), ("event.email", NOT_NULLABLE)], self.changes(old, new))
+        self.assertEqual([("event", TYPE)], self.changes(new, old))
+
+    def test_recursive_schemas(self):
+        old, new = SchemaRegistry(), SchemaRegistry()
+        old.register("reply", Schema({"replies": {"type": Array(SchemaRef("reply", old))}}))
+        new.register("reply", Schema({
+            "text": {"type": basestring, "required": True},
+            "replies": {"type": Array(SchemaRef("reply", new))}
+        }))
+        diff = SchemaDiff(old["reply"], new["reply"])
+        self.assertEqual([("replies", TYPE), ("text", ADDED_REQUIRED)],
+                         [(change.path, change.kind) for change in diff.changes])
+
+    def test_descriptions(self):
+        diff = SchemaDiff(post_schema(strict=False), post_schema(title={"type": int, "required": True}))
+        self.assertEqual(["document became strict", "title changed type from basestring to int"],
+                         [change.description for change in diff.changes])
+
+
+class TestTargetedValidation(unittest.TestCase):
+    def setUp(self):
+        self.old = post_schema(slug={"type": basestring})
+        self.new = post_schema(comment_schema(email={"type": basestring, "required": True}),
+                               author={"type": basestring, "required": True})
+        self.diff = SchemaDiff(self.old, self.new)
+        self.documents = [
+            {"title": "Cookies", "author": "John", "comments": [{"comment": "Yum", "email": "j@b.com"}]},
+            {"title": "Cake", "comments": [{"comment": "Yum", "email": "j@b.com"}]},
+            {"title": "Pie", "author": "John", "slug": "pie", "comments": [{"comment": "Yum"}]}
+        ]
+
+    def test_affected_fields(self):
+        self.assertEqual(["author", "comments.email", "slug"], self.diff.fields)
+        diff = SchemaDiff(self.old, post_schema(
+            comments={"type": Array(comment_schema(votes={"type": float})), "nullable": False}))
+        self.assertEqual(["comments", "comments.votes", "slug"], [change.path for change in diff.changes])
+        self.assertEqual(["comments", "slug"], diff.fields)
+        self.assertIsNone(SchemaDiff(post_schema(strict=False), post_schema()).fields)
+
+    def test_scan(self):
+        failures = dict(self.diff.scan(self.documents))
+        self.assertEqual([1, 2], sorted(failures))
+        self.assertEqual({"author": "author is required."}, failures[1].errors)
+        self.assertEqual({
+            "slug": "Unexpected document field not present in schema",
+            "comments.0.email": "comments.0.email is required."
+        }, failures[2].errors)
+
+    def test_scan_validates_only_affected_fields(self):
+        document = {"title": 42, "author": "John", "comments": [{"comment": "Yum", "email": "j@b.com"}]}
+        self.assertEqual([], list(self.diff.scan([document])))
+        with self.assertRaises(ValidationException):
+            self.new.validate(document)
+
+    def test_validate(self):
+        self.diff.validate(self.documents[0])
+        with self.assertRaises(ValidationException) as cm:
+            self.diff.validate(self.documents[2], max_errors=1)
+        self.assertTrue(cm.exception.truncated)
+
+    @patch.object(Schema, 'validate')
+    def test_no_changes_validate_nothing(self, validate):
+        diff = SchemaDiff(blog_post_schema, blog_post_schema)
+        self.assertEqual([], list(diff.scan([valid_doc()])))
+        diff.validate(valid_doc())
+        self.assertEqual(0, validate.call_count)
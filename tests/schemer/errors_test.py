@@ -0,0 +1,95 @@
+from schemer.errors import (ValidationErrors, INVALID, REQUIRED, NOT_NULLABLE, WRONG_TYPE,
+                            NOT_DOCUMENT, NOT_ARRAY, NOT_DICT, WRONG_ITEM_TYPE, UNKNOWN_FIELD)
+from schemer.exceptions import ValidationException
+from sample import blog_post_schema, valid_doc
+import unittest
+
+
+class TestValidationErrors(unittest.TestCase):
+    def setUp(self):
+        self.document = valid_doc()
+        self.document['comments'][0]['votes'] = "ten"
+        self.document['comments'][1]['votes'] = "eleven"
+        self.document['comments'].append({"commenter": "John", "comment": "Yum"})
+        self.document['tags'] = "cooking"
+        self.document['category'] = "knitting"
+        self.document['external_code'] = None
+        del self.document['content']
+        self.document['unexpected'] = True
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document)
+        self.exception = cm.exception
+
+    def test_round_trip(self):
+        errors = ValidationErrors(self.exception)
+        self.assertEqual(len(self.exception.errors), len(errors))
+        self.assertEqual(self.exception.errors, errors.to_dict())
+
+    def test_codes(self):
+        errors = ValidationErrors(self.exception)
+        codes = dict((path, code) for path, code, _ in errors)
+        self.assertEqual({
+            "comments.0.votes": WRONG_TYPE,
+            "comments.1.votes": WRONG_TYPE,
+            "comments.2.commenter": NOT_DOCUMENT,
+            "tags": NOT_ARRAY,
+            "category": INVALID,
+            "content": REQUIRED,
+            "unexpected": UNKNOWN_FIELD,
+            "external_code": NOT_NULLABLE
+        }, codes)
+
+    def test_messages_are_rendered_from_codes(self):
+        errors = ValidationErrors()
+        errors.add("", "Expected instance of dict to validate against schema.")
+        errors.add("tags.1", "Array item at tags.1 is of incorrect type")
+        errors.add("views", "Field should be of type <type 'int'>")
+        self.assertEqual([
+            ("", NOT_DICT, "Expected instance of dict to validate against schema."),
+            ("tags.1", WRONG_ITEM_TYPE, "Array item at tags.1 is of incorrect type"),
+            ("views", WRONG_TYPE, "Field should be of type <type 'int'>")
+        ], list(errors))
+        self.assertEqual(("views", WRONG_TYPE, "Field should be of type <type 'int'>"), errors[-1])
+        with self.assertRaises(IndexError):
+            errors[3]
+
+    def test_paths_and_details_are_stored_once(self):
+        errors = ValidationErrors()
+        for i in range(100):
+            errors.add_all(self.exception)
+        self.assertEqual(800, len(errors))
+        self.assertEqual(8, len(errors._paths))
+        self.assertEqual(2, len(errors._details))
+        comments = [segments[0] for segments in errors._paths if segments[0] == "comments"]
+        self.assertEqual(3, len(comments))
+        self.assertTrue(all(segment is comments[0] for segment in comments))
+
+    def test_count_and_matching(self):
+        errors = ValidationErrors(self.exception)
+        errors.add_all(self.exception)
+        self.assertEqual(16, errors.count())
+        self.assertEqual(4, errors.count("comments.*.votes"))
+        self.assertEqual(2, errors.count("comments.1.votes"))
+        self.assertEqual(6, errors.count("comments.*.*"))
+        self.assertEqual(2, errors.count(code=REQUIRED))
+        self.assertEqual(4, errors.count("comments.*.votes", code=WRONG_TYPE))
+        self.assertEqual(2, errors.count(code=NOT_NULLABLE))
+        self.assertEqual(0, errors.count("comments.*"))
+        self.assertEqual(
+            [("comments.0.votes", WRONG_TYPE, "Field should be of type <type 'int'>")] * 2 +
+            [("comments.1.votes", WRONG_TYPE, "Field should be of type <type 'int'>")] * 2,
+            sorted(errors.matching("comments.*.votes", WRONG_TYPE)))
+
+    def test_summary(self):
+        errors = ValidationErrors(self.exception)
+        errors.add_all(errors.to_dict())
+        summary = errors.summary()
+        self.assertEqual(4, summary[("comments.*.votes", WRONG_TYPE)])
+        self.assertEqual(2, summary[("external_code", NOT_NULLABLE)])
+        self.assertEqual(2, summary[("content", REQUIRED)])
+        self.assertEqual(16, sum(summary.values()))
+
+    def test_add_from_another_collection(self):
+        errors = ValidationErrors(self.exception)
+        copy = ValidationErrors(errors)
+        self.assertEqual(list(errors), list(copy))
@@ -0,0 +1,203 @@
+from schemer import Schema, Array, Mixed, SchemaRef, OneOf
+from schemer.json_schema import DRAFT
+from schemer.registry import SchemaRegistry
+from schemer.validators import (one_of, gte, lte, gt, lt, between, length, match, is_email, is_url,
+                                each_item, distinct)
+from sample import blog_post_schema
+from datetime import datetime
+import json
+import re
+import unittest
+
+
+class TestTypes(unittest.TestCase):
+    def translate(self, field_type, **spec):
+        spec["type"] = field_type
+        json_schema, untranslated = Schema({"field": spec}).to_json_schema()
+        return json_schema["properties"]["field"]
+
+    def test_document(self):
+        json_schema, untranslated = Schema({
+            "name":     {"type": basestring, "required": True},
+            "age":      {"type": int, "required": True},
+            "email":    {"type": basestring, "nullable": False}
+        }).to_json_schema()
+        self.assertEqual({
+            "$schema": DRAFT,
+            "type": "object",
+            "properties": {
+                "name":     {"type": "string"},
+                "age":      {"type": ["integer", "boolean"]},
+                "email":    {"type": "string"}
+            },
+            "required": ["age", "name"],
+            "additionalProperties": False
+        }, json_schema)
+        self.assertEqual([], untranslated)
+
+    def test_non_strict_document(self):
+        json_schema, untranslated = Schema({}, strict=False).to_json_schema()
+        self.assertNotIn("additionalProperties", json_schema)
+        self.assertNotIn("required", json_schema)
+
+    def test_python_types(self):
+        self.assertEqual({"type": "boolean"}, self.translate(bool, nullable=False))
+        self.assertEqual({"type": "number"}, self.translate(float, nullable=False))
+        self.assertEqual({"type": "string"}, self.translate(unicode, nullable=False))
+        self.assertEqual({"type": "string"}, self.translate(datetime, nullable=False))
+        self.assertEqual({"type": "array"}, self.translate(list, nullable=False))
+        self.assertEqual({"type": "object"}, self.translate(dict, nullable=False))
+        self.assertEqual({}, self.translate(object, nullable=False))
+
+    def test_nullable(self):
+        self.assertEqual({"type": ["number", "null"]}, self.translate(float))
+        self.assertEqual({"enum": ["a", "b", None], "type": ["string", "null"]},
+                         self.translate(basestring, validates=one_of("a", "b")))
+
+    def test_mixed(self):
+        self.assertEqual({"type": ["boolean", "integer", "string"]}, self.translate(Mixed(int, basestring),
+                                                                                   nullable=False))
+        self.assertEqual({"type": ["string"]}, self.translate(Mixed(basestring, datetime), nullable=False))
+        self.assertEqual({}, self.translate(Mixed(int, object)))
+
+    def test_embedded_documents_and_arrays(self):
+        json_schema = self.translate(Array(Schema({"tags": {"type": Array(basestring), "required": True}})),
+                                     nullable=False)
+        self.assertEqual({
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"tags": {"type": "array", "items": {"type": "string"}}},
+                "required": ["tags"],
+                "additionalProperties": False
+            }
+        }, json_schema)
+
+    def test_defaults(self):
+        self.assertEqual({"type": "string", "default": "draft"},
+                         self.translate(basestring, default="draft", nullable=False))
+        self.assertEqual({"type": "string"}, self.translate(datetime, default=datetime.now, nullable=False))
+
+    def test_references(self):
+        registry = SchemaRegistry()
+        registry.register("reply", Schema({
+            "text":     {"type": basestring, "required": True},
+            "replies":  {"type": Array(SchemaRef("reply", registry))}
+        }))
+        json_schema, untranslated = Schema({"thread": {"type": SchemaRef("reply", registry)}}).to_json_schema()
+        self.assertEqual({"anyOf": [{"$ref": "#/definitions/reply"}, {"type": "null"}]},
+                         json_schema["properties"]["thread"])
+        self.assertEqual({
+            "type": "object",
+            "properties": {
+                "text":     {"type": "string"},
+                "replies":  {"type": ["array", "null"], "items": {"$ref": "#/definitions/reply"}}
+            },
+            "required": ["text"],
+            "additionalProperties": False
+        }, json_schema["definitions"]["reply"])
+
+    def test_one_of(self):
+        kind = {"type": basestring, "required": True}
+        json_schema = self.translate(OneOf("kind", {
+            "click": Schema({"kind": kind}),
+            "key": Schema({"kind": kind, "code": {"type": int}})
+        }), nullable=False)
+        self.assertEqual(2, len(json_schema["anyOf"]))
+        click = json_schema["anyOf"][0]["allOf"]
+        self.assertEqual({"properties": {"kind": {"enum": ["click"]}}, "required": ["kind"]}, click[1])
+        self.assertEqual(["kind"], click[0]["properties"].keys())
+
+    def test_blog_post_schema(self):
+        json_schema, untranslated = blog_post_schema.to_json_schema()
+        json.dumps(json_schema)
+        self.assertEqual(["", "", "author", "editors", "website"], sorted(path for path, _ in untranslated))
+
+
+class TestValidators(unittest.TestCase):
+    def translate(self, field_type, validates):
+        schema = Schema({"field": {"type": field_type, "validates": validates, "nullable": False}})
+        json_schema, untranslated = schema.to_json_schema()
+        return json_schema["properties"]["field"], [validator for path, validator in untranslated]
+
+    def test_bounds(self):
+        self.assertEqual(({"type": "number", "minimum": 0, "maximum": 10}, []),
+                         self.translate(float, [gte(0), lte(10)]))
+        self.assertEqual(({"type": "number", "exclusiveMinimum": 0, "exclusiveMaximum": 1.5}, []),
+                         self.translate(float, [gt(0), lt(1.5)]))
+        self.assertEqual(({"type": "number", "minimum": 1, "maximum": 2}, []), self.translate(float, between(1, 2)))
+
+    def test_conflicting_bounds(self):
+        json_schema, untranslated = self.translate(float, [gte(0), gte(1)])
+        self.assertEqual({"type": "number", "allOf": [{"minimum": 0}, {"minimum": 1}]}, json_schema)
+
+    def test_non_numeric_bounds(self):
+        validator = gte(datetime(2012, 1, 1))
+        self.assertEqual(({"type": "string"}, [validator]), self.translate(datetime, validator))
+
+    def test_length(self):
+        self.assertEqual(({"type": "string", "minLength": 0, "maxLength": 3}, []),
+                         self.translate(basestring, length(0, 3)))
+        self.assertEqual(({"type": "array", "items": {"type": ["integer", "boolean"]}, "maxItems": 0}, []),
+                         self.translate(Array(int), length(max=0)))
+        validator = length(1)
+        self.assertEqual(({"type": "object"}, [validator]), self.translate(dict, validator))
+
+    def test_strings(self):
+        json_schema, untranslated = self.translate(basestring, [match("[a-z]+"), match("^b")])
+        self.assertEqual({"type": "string", "allOf": [{"pattern": "^(?:[a-z]+)"}, {"pattern": "^b"}]}, json_schema)
+
+        json_schema, untranslated = self.translate(basestring, is_email())
+        regex = re.compile(json_schema["pattern"], re.UNICODE)
+        self.assertTrue(regex.match("a@b.com"))
+        self.assertFalse(regex.match("a.@b.com"))
+
+        json_schema, untranslated = self.translate(basestring, is_url())
+        regex = re.compile(json_schema["pattern"])
+        self.assertTrue(regex.match("HTTPS://example.com/path"))
+        self.assertFalse(regex.match("example.com"))
+        self.assertEqual([], untranslated)
+
+    def test_end_anchors_match_before_a_trailing_newline(self):
+        json_schema, untranslated = self.translate(basestring, match(r"^[A-Z]{3}$"))
+        self.assertEqual(r"^[A-Z]{3}\n?$", json_schema["pattern"])
+        self.assertTrue(re.match(json_schema["pattern"], "ABC\n"))
+        for pattern in [r"a\$", r"[$]", r"[]$]", r"[^\]$]"]:
+            self.assertEqual(({"type": "string", "pattern": "^(?:{})".format(pattern)}, []),
+                             self.translate(basestring, match(pattern)))
+        self.assertEqual(r"^(?:a\n?$|b\\\n?$)", self.translate(basestring, match(r"a$|b\\$"))[0]["pattern"])
+
+    def test_enums_of_integers_accept_booleans(self):
+        self.assertEqual(({"type": ["integer", "boolean"], "enum": [1, True, 2]}, []),
+                         self.translate(int, one_of(1, 2)))
+        self.assertEqual(({"type": "boolean", "enum": [False, 0]}, []), self.translate(bool, one_of(False)))
+
+    def test_python_only_patterns_are_reported(self):
+        for pattern in ["(?i)abc", r"\Aabc\Z", "(?P<name>a)b"]:
+            validator = match(pattern)
+            self.assertEqual(({"type": "string"}, [validator]), self.translate(basestring, validator))
+        self.assertEqual(({"type": "string", "pattern": r"^(?:\\Aa(?=b))"}, []),
+                         self.translate(basestring, match(r"\\Aa(?=b)")))
+
+    def test_arrays(self):
+        self.assertEqual(({"type": "array", "items": {"type": "string", "minLength": 1}, "uniqueItems": True}, []),
+                         self.translate(Array(basestring), [each_item(length(1)), distinct()]))
+        self.assertEqual(({"type": "array", "items": {"type": "number", "minimum": 0}}, []),
+                         self.translate(Array(float), each_item(gte(0))))
+        validator = each_item(gte(0))
+        self.assertEqual(({"type": "string"}, [validator]), self.translate(basestring, validator))
+
+    def test_custom_validators_are_reported(self):
+        def custom(value):
+            pass
+        json_schema, untranslated = self.translate(basestring, [custom, length(1)])
+        self.assertEqual({"type": "string", "minLength": 1}, json_schema)
+        self.assertEqual([custom], untranslated)
+
+    def test_schema_level_validators_are_reported(self):
+        def validate(document):
+            pass
+        json_schema, untranslated = Schema({
+            "child": {"type": Schema({}, validates=[validate])}
+        }).to_json_schema()
+        self.assertEqual([("child", validate)], untranslated)
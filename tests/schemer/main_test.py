@@ -0,0 +1,131 @@
+from schemer import Schema
+from schemer.__main__ import main, load_schema
+from tests.schemer.sample import comment_schema
+from datetime import datetime
+from StringIO import StringIO
+import os
+import shutil
+import tempfile
+import unittest
+
+
+event_schema = Schema({"name": {"type": basestring}, "start": {"type": datetime, "required": True}})
+
+
+class TestLoadSchema(unittest.TestCase):
+    def test_load_schema(self):
+        self.assertIs(comment_schema, load_schema("tests.schemer.sample.comment_schema"))
+        self.assertIs(comment_schema, load_schema("tests.schemer.sample:comment_schema"))
+
+    def test_load_invalid_schema(self):
+        with self.assertRaises(ValueError):
+            load_schema("comment_schema")
+        with self.assertRaises(TypeError):
+            load_schema("tests.schemer.sample.stubnow")
+        with self.assertRaises(AttributeError):
+            load_schema("tests.schemer.sample.post_schema")
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, *lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def run_main(self, *args, **kwargs):
+        schema = kwargs.get('schema', "tests.schemer.sample.comment_schema")
+        out, err = StringIO(), StringIO()
+        status = main([schema] + list(args), out, err)
+        return status, out.getvalue().splitlines(), err.getvalue()
+
+    def valid(self):
+        return '{"commenter": {"first": "John", "last": "Humphreys"}, "comment": "Great post"}'
+
+    def test_valid_files(self):
+        first = self.write("first.ndjson", self.valid(), self.valid())
+        second = self.write("second.ndjson", self.valid(), "", self.valid())
+        status, report, stats = self.run_main("-p", "1", first, second)
+        self.assertEqual(0, status)
+        self.assertEqual([], report)
+        self.assertTrue(stats.startswith("4 documents, 0 invalid, in "))
+
+    def test_report_invalid_documents(self):
+        path = self.write("comments.ndjson",
+            self.valid(),
+            '{"commenter": {"first": "John"}, "votes": "ten"}',
+            self.valid(),
+            '{"comment": ',
+            '[]')
+        status, report, stats = self.run_main("-p", "1", "--chunk-size", "2", path)
+        self.assertEqual(1, status)
+        self.assertEqual([
+            "{}:2: comment: comment is required.".format(path),
+            "{}:2: commenter.last: commenter.last is required.".format(path),
+            "{}:2: votes: Field should be of type <type 'int'>".format(path),
+            "{}:4: : Invalid JSON: No JSON object could be decoded".format(path),
+            "{}:5: : Expected instance of dict to validate against schema.".format(path),
+        ], report)
+        self.assertTrue(stats.startswith("5 documents, 3 invalid, in "))
+
+    def test_non_ascii_paths_are_written_as_utf8(self):
+        path = self.write("comments.ndjson", '{"comment": "Great", "caf\\u00e9": 1}')
+        for processes in ("1", "2"):
+            status, report, stats = self.run_main("-p", processes, path)
+            self.assertEqual([
+                "{}:1: caf\xc3\xa9: Unexpected document field not present in schema".format(path),
+                "{}:1: commenter: commenter is required.".format(path),
+            ], report)
+
+    def test_schema_errors_are_reported_per_document(self):
+        path = self.write("posts.ndjson", '{"author": "John"}', '{"author": 5}')
+        out, err = StringIO(), StringIO()
+        status = main(["tests.schemer.sample.blog_post_schema", "-p", "1", "--max-errors", "1", path], out, err)
+        self.assertEqual(1, status)
+        report = out.getvalue().splitlines()
+        self.assertEqual(2, len(report))
+        self.assertTrue(report[0].startswith("{}:1: author: Schema error: Dynamic schema function".format(path)))
+        self.assertTrue(err.getvalue().startswith("2 documents, 2 invalid, in "))
+
+    def test_max_errors(self):
+        path = self.write("comments.ndjson", '{"votes": "ten"}')
+        status, report, stats = self.run_main("-p", "1", "--max-errors", "1", path)
+        self.assertEqual(1, status)
+        self.assertEqual(1, len(report))
+
+    def test_parallel_workers(self):
+        lines = [self.valid()] * 50
+        lines[17] = '{"comment": "Great post"}'
+        lines[41] = '{"comment": "Great post"}'
+        path = self.write("comments.ndjson", *lines)
+        status, report, stats = self.run_main("-p", "2", "--chunk-size", "10", path)
+        self.assertEqual(1, status)
+        self.assertEqual([
+            "{}:18: commenter: commenter is required.".format(path),
+            "{}:42: commenter: commenter is required.".format(path),
+        ], report)
+        self.assertTrue(stats.startswith("50 documents, 2 invalid, in "))
+
+    def test_documents_are_loaded(self):
+        path = self.write("events.ndjson", '{"name": "Launch", "start": "2014-03-04T05:06:07"}',
+                          '{"name": "Launch", "start": "whenever"}')
+        for processes in ("1", "2"):
+            status, report, stats = self.run_main("-p", processes, path, schema="tests.schemer.main_test.event_schema")
+            self.assertEqual(["{}:2: start: Field should be of type <type 'datetime.datetime'>".format(path)], report)
+            self.assertTrue(stats.startswith("2 documents, 1 invalid, in "))
+
+        status, report, stats = self.run_main("--raw", "-p", "1", path, schema="tests.schemer.main_test.event_schema")
+        self.assertEqual(2, len(report))
+
+    def test_unreadable_files(self):
+        path = self.write("comments.ndjson", self.valid())
+        for processes in ("1", "2"):
+            with self.assertRaises(SystemExit) as cm:
+                self.run_main("-p", processes, path, os.path.join(self.directory, "missing.ndjson"))
+            self.assertEqual(2, cm.exception.code)
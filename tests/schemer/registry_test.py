@@ -0,0 +1,114 @@
+from schemer import Schema, Array, SchemaRef
+from schemer.registry import SchemaRegistry
+from schemer.exceptions import SchemaFormatException
+from sample import blog_post_schema
+from mock import patch, Mock
+import threading
+import time
+import unittest
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = SchemaRegistry()
+
+    def test_register_schema(self):
+        self.registry.register("post", blog_post_schema)
+        self.assertIs(blog_post_schema, self.registry["post"])
+        self.assertIn("post", self.registry)
+        self.assertEqual(["post"], list(self.registry))
+
+    def test_factories_are_built_once(self):
+        factory = Mock(return_value=blog_post_schema)
+        self.registry.register("post", factory)
+        self.assertEqual(0, factory.call_count)
+        self.assertIs(blog_post_schema, self.registry.get("post"))
+        self.assertIs(blog_post_schema, self.registry.get("post"))
+        self.assertEqual(1, factory.call_count)
+
+    def test_unknown_schema(self):
+        with self.assertRaises(KeyError):
+            self.registry.get("post")
+
+    def test_factory_needing_its_own_schema(self):
+        self.registry.register("post", lambda: self.registry.get("post"))
+        with self.assertRaises(KeyError):
+            self.registry.get("post")
+        self.assertIn("post", self.registry)
+
+    def test_duplicate_name(self):
+        self.registry.register("post", blog_post_schema)
+        with self.assertRaises(ValueError):
+            self.registry.register("post", lambda: blog_post_schema)
+
+    def test_invalid_registrations(self):
+        with self.assertRaises(TypeError):
+            self.registry.register("post", {"title": {"type": basestring}})
+        self.registry.register("comment", lambda: {"title": {"type": basestring}})
+        with self.assertRaises(TypeError):
+            self.registry.get("comment")
+
+    def test_prepare_builds_and_verifies_all_schemas(self):
+        self.registry.register("post", lambda: blog_post_schema)
+        self.registry.prepare(freeze=False)
+        self.assertTrue(self.registry.prepared)
+        self.assertEqual(1, len(self.registry))
+        self.assertIs(blog_post_schema, self.registry["post"])
+
+        self.registry = SchemaRegistry()
+        self.registry.register("post", lambda: Schema({"title": {"type": "string"}}))
+        with self.assertRaises(SchemaFormatException):
+            self.registry.prepare(freeze=False)
+
+    def test_cannot_register_once_prepared(self):
+        self.registry.prepare(freeze=False)
+        with self.assertRaises(ValueError):
+            self.registry.register("post", blog_post_schema)
+
+    @patch('schemer.registry.gc')
+    def test_prepare_freezes_if_supported(self, gc):
+        self.registry.prepare()
+        gc.collect.assert_called_once_with()
+        gc.freeze.assert_called_once_with()
+
+        gc.reset_mock()
+        SchemaRegistry().prepare(freeze=False)
+        self.assertEqual(0, gc.freeze.call_count)
+
+    def test_prepare_resolves_references(self):
+        self.registry.register("post", lambda: Schema({
+            "author": {"type": SchemaRef("person", self.registry)},
+            "comments": {"type": Array(Schema({"author": {"type": SchemaRef("person", self.registry)}}))}
+        }))
+        self.registry.register("person", Schema({"name": {"type": basestring}}))
+        self.registry.prepare(freeze=False)
+        comments = self.registry["post"]._fields_by_name["comments"].type.contained_type
+        self.assertIs(self.registry["person"], comments._fields_by_name["author"].type.schema)
+
+    def test_prepare_fails_on_unregistered_references(self):
+        self.registry.register("post", Schema({"author": {"type": SchemaRef("person", self.registry)}}))
+        with self.assertRaises(SchemaFormatException):
+            self.registry.prepare(freeze=False)
+
+    def test_concurrent_first_use_of_factory(self):
+        def build():
+            time.sleep(0.05)
+            return Schema({"name": {"type": basestring}})
+        factory = Mock(side_effect=build)
+        self.registry.register("person", factory)
+        post_schema = Schema({"author": {"type": SchemaRef("person", self.registry)}})
+
+        failures = []
+        def work():
+            try:
+                post_schema.validate({"author": {"name": u"John"}})
+            except Exception as e:
+                failures.append(e)
+        threads = [threading.Thread(target=work) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], failures)
+        self.assertEqual(1, factory.call_count)
+        self.assertEqual(["person"], list(self.registry))
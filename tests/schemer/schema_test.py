@@ -1,10 +1,14 @@
 from copy import deepcopy
 
-from schemer import Schema, Array
-from schemer.exceptions import ValidationException, SchemaFormatException
-from schemer.validators import one_of, lte, gte, length
+from schemer import Schema, Array, Sample, Budget, FieldSpec, SchemaRef, OneOf, _POOLS
+from schemer.exceptions import ValidationException, SchemaFormatException, BudgetExceededException
+from schemer.validators import one_of, lte, gte, length, each_item, distinct, Length
 import unittest
-from mock import patch
+import threading
+import os
+import signal
+import time
+from mock import patch, Mock
 from datetime import datetime
 from sample import blog_post_schema, stubnow, valid_doc
 
@@ -332,6 +336,15 @@ class TestBlogValidation(unittest.TestCase):
         self.document_1['editors'] = ['Jordan Gansey', {'last': 'Gansey'}]
         self.assert_document_paths_invalid(self.document_1, ['editors.1.first'])
 
+    def test_first_failing_validator_is_reported(self):
+        schema = Schema({"count": {"type": int, "validates": [gte(0), lte(10), one_of(1, 2, 3)]}})
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"count": 11})
+        self.assertEqual({"count": "11 is not less than or equal to 10"}, cm.exception.errors)
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"count": 5})
+        self.assertEqual({"count": "5 is not in the list [1, 2, 3]"}, cm.exception.errors)
+
     def test_schema_level_validator_list_item_failure_to_small(self):
         self.document_1.update(
             {'creation_date': datetime(2014, 1, 1),
@@ -429,3 +442,727 @@ class TestDefaultApplication(unittest.TestCase):
         blog_post_schema.apply_defaults(self.document_1)
         self.assertEquals(copy_of_doc_spec['most_popular_comments']['default'], blog_post_schema._doc_spec['most_popular_comments']['default'])
 
+
+
+class TestValidateMany(unittest.TestCase):
+    def test_returns_none_for_valid_documents(self):
+        self.assertEqual([None, None], blog_post_schema.validate_many([valid_doc(), valid_doc()]))
+
+    def test_returns_exception_for_invalid_documents(self):
+        invalid = valid_doc()
+        del invalid['author']
+        results = blog_post_schema.validate_many([valid_doc(), invalid], threads=2)
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], ValidationException)
+        self.assertEqual(['author'], results[1].errors.keys())
+
+    def test_schema_format_errors_propagate(self):
+        invalid = valid_doc()
+        invalid['author'] = 33
+        with self.assertRaises(SchemaFormatException):
+            blog_post_schema.validate_many([invalid])
+
+    @patch('schemer.ThreadPool')
+    def test_pools_are_shared_between_calls(self, ThreadPool):
+        ThreadPool.return_value.map.return_value = [None]
+        blog_post_schema.validate_many([valid_doc()], threads=3)
+        blog_post_schema.validate_many([valid_doc()], threads=3)
+        ThreadPool.assert_called_once_with(3)
+        self.assertEqual(2, ThreadPool.return_value.map.call_count)
+        self.assertEqual(0, ThreadPool.return_value.close.call_count)
+        _POOLS.pop(3)
+
+    @patch('schemer.os.getpid')
+    @patch('schemer.ThreadPool')
+    def test_pools_are_not_shared_with_forked_processes(self, ThreadPool, getpid):
+        ThreadPool.return_value.map.return_value = [None]
+        getpid.return_value = 100
+        blog_post_schema.validate_many([valid_doc()], threads=3)
+        getpid.return_value = 101
+        blog_post_schema.validate_many([valid_doc()], threads=3)
+        blog_post_schema.validate_many([valid_doc()], threads=3)
+        self.assertEqual(2, ThreadPool.call_count)
+        _POOLS.pop(3)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "requires fork")
+    def test_validate_many_in_forked_process(self):
+        blog_post_schema.validate_many([valid_doc()], threads=2)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                blog_post_schema.validate_many([valid_doc()], threads=2)
+                os._exit(0)
+            except BaseException:
+                os._exit(1)
+        for i in range(100):
+            finished, status = os.waitpid(pid, os.WNOHANG)
+            if finished:
+                break
+            time.sleep(0.05)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self.fail("validate_many hung in the forked process")
+        self.assertEqual(0, status)
+
+    def test_given_pool_is_used(self):
+        pool = Mock()
+        pool.map.side_effect = map
+        self.assertEqual([None], blog_post_schema.validate_many([valid_doc()], pool=pool))
+        self.assertEqual(1, pool.map.call_count)
+        self.assertEqual(0, pool.close.call_count)
+
+
+class TestConcurrentUse(unittest.TestCase):
+    def test_shared_schema_across_threads(self):
+        failures = []
+
+        def work(n):
+            for i in range(200):
+                document = valid_doc()
+                if i % 2:
+                    del document['content']['title']
+                    document['editors'] = ['Jordan Gansey', {'last': 'Gansey'}]
+                defaulted = {'comments': [{}]}
+                blog_post_schema.apply_defaults(defaulted)
+                try:
+                    blog_post_schema.validate(document)
+                    errors = {}
+                except ValidationException as e:
+                    errors = e.errors
+                expected = ['content.title', 'editors.1.first'] if i % 2 else []
+                if sorted(errors.keys()) != expected or defaulted['comments'][0]['votes'] != 0:
+                    failures.append((n, i, errors))
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], failures)
+
+
+class TestMaxErrors(unittest.TestCase):
+    def setUp(self):
+        self.document = valid_doc()
+        self.document['comments'] = [{} for i in range(1000)]
+
+    def test_all_errors_collected_by_default(self):
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document)
+        self.assertEqual(2000, len(cm.exception.errors))
+        self.assertFalse(cm.exception.truncated)
+
+    def test_stops_once_limit_exceeded(self):
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document, max_errors=10)
+        self.assertEqual(10, len(cm.exception.errors))
+        self.assertTrue(cm.exception.truncated)
+        self.assertIn("truncated after 10 errors", str(cm.exception))
+
+    def test_not_truncated_when_limit_reached_exactly(self):
+        self.document['comments'] = [{}]
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document, max_errors=2)
+        self.assertEqual(['comments.0.commenter', 'comments.0.comment'], sorted(cm.exception.errors.keys(), reverse=True))
+        self.assertFalse(cm.exception.truncated)
+
+    def test_valid_document_with_limit(self):
+        blog_post_schema.validate(valid_doc(), max_errors=1)
+
+    def test_limit_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            blog_post_schema.validate(valid_doc(), max_errors=0)
+
+    def test_validate_many_passes_limit(self):
+        results = blog_post_schema.validate_many([self.document], max_errors=5)
+        self.assertEqual(5, len(results[0].errors))
+        self.assertTrue(results[0].truncated)
+
+
+class TestSample(unittest.TestCase):
+    def test_first_and_last(self):
+        self.assertEqual([0, 1, 8, 9], Sample(first=2, last=2).indices(10))
+
+    def test_short_list_validates_everything(self):
+        self.assertEqual([0, 1, 2], Sample(first=2, last=2).indices(3))
+        self.assertEqual([], Sample(first=2, last=2).indices(0))
+
+    def test_stride(self):
+        self.assertEqual([0, 3, 6, 9], Sample(first=1, last=1, stride=3).indices(10))
+
+    def test_random_is_deterministic_under_seed(self):
+        indices = Sample(random=5, seed=42).indices(1000)
+        self.assertEqual(5, len(indices))
+        self.assertEqual(indices, Sample(random=5, seed=42).indices(1000))
+
+    def test_random_sample_larger_than_list(self):
+        self.assertEqual(range(10), Sample(random=50).indices(10))
+
+    def test_random_sample_of_list_shorter_than_first_or_last(self):
+        self.assertEqual([0, 1, 2], Sample(first=5, random=2).indices(3))
+        self.assertEqual([0, 1, 2], Sample(last=5, random=2).indices(3))
+        self.assertEqual([0, 1, 2], Sample(first=2, last=2, random=2, seed=1).indices(3))
+        schema = Schema({"v": {"type": Array(int, sample=Sample(first=5, random=2))}})
+        schema.validate({"v": [1, 2, 3]}, sampled=True)
+
+    def test_invalid_stride(self):
+        with self.assertRaises(ValueError):
+            Sample(stride=0)
+
+    def test_array_sample_must_be_a_sample(self):
+        with self.assertRaises(SchemaFormatException) as cm:
+            Schema({"numbers": {"type": Array(int, sample=10)}})
+        self.assertEqual('numbers', cm.exception.path)
+
+
+class TestSampledValidation(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema({
+            "points": {"type": Array(int, sample=Sample(first=2, last=2, stride=10))},
+            "checked": {"type": Array(int, sample=Sample(first=1, escalate=True))},
+            "comments": {"type": Array(Schema({"votes": {"type": int, "required": True}}),
+                                       sample=Sample(last=1))}
+        })
+
+    def assert_paths_invalid(self, document, paths, sampled):
+        with self.assertRaises(ValidationException) as cm:
+            self.schema.validate(document, sampled=sampled)
+        self.assertEqual(sorted(paths), sorted(cm.exception.errors.keys()))
+
+    def test_unsampled_items_are_not_validated(self):
+        points = range(100)
+        points[5] = 'wrong'
+        self.schema.validate({"points": points}, sampled=True)
+        self.assert_paths_invalid({"points": points}, ['points.5'], sampled=False)
+
+    def test_sampled_items_are_validated(self):
+        points = range(100)
+        points[10] = 'wrong'
+        points[99] = 'wrong'
+        self.assert_paths_invalid({"points": points}, ['points.10', 'points.99'], sampled=True)
+
+    def test_escalates_to_full_validation_on_failure(self):
+        checked = range(10)
+        checked[0] = 'wrong'
+        checked[5] = 'wrong'
+        self.assert_paths_invalid({"checked": checked}, ['checked.0', 'checked.5'], sampled=True)
+
+    def test_escalates_on_failure_of_embedded_documents(self):
+        schema = Schema({
+            "comments": {"type": Array(Schema({"votes": {"type": int, "required": True}}),
+                                       sample=Sample(first=1, escalate=True))},
+            "other": {"type": int}
+        })
+        comments = [{"votes": 1} for i in range(5)]
+        comments[3] = {}
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"comments": comments, "other": "wrong"}, sampled=True)
+        self.assertEqual(['other'], cm.exception.errors.keys())
+
+        comments[0] = {}
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"comments": comments}, sampled=True)
+        self.assertEqual(['comments.0.votes', 'comments.3.votes'], sorted(cm.exception.errors.keys()))
+
+    def test_no_escalation_when_sample_valid(self):
+        checked = range(10)
+        checked[5] = 'wrong'
+        self.schema.validate({"checked": checked}, sampled=True)
+
+    def test_sampled_embedded_documents(self):
+        comments = [{} for i in range(5)]
+        self.assert_paths_invalid({"comments": comments}, ['comments.4.votes'], sampled=True)
+
+
+class TestProjectedValidation(unittest.TestCase):
+    def setUp(self):
+        self.document = {
+            "content": {"title": "How to make cookies"},
+            "comments": [{"votes": 3}, {"votes": "wrong"}],
+            "category": "cooking"
+        }
+
+    def assert_paths_invalid(self, document, fields, paths):
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(document, fields=fields)
+        self.assertEqual(sorted(paths), sorted(cm.exception.errors.keys()))
+
+    def test_unprojected_required_fields_are_ignored(self):
+        blog_post_schema.validate(self.document, fields=['category', 'content.title'])
+
+    def test_projected_fields_are_validated(self):
+        self.document['category'] = 'gardening'
+        self.assert_paths_invalid(self.document, ['category', 'content.title'], ['category'])
+
+    def test_projected_required_fields_must_be_present(self):
+        del self.document['content']['title']
+        self.assert_paths_invalid(self.document, ['content.title'], ['content.title'])
+        self.assert_paths_invalid({}, ['content.title'], ['content'])
+
+    def test_whole_embedded_document_can_be_projected(self):
+        self.assert_paths_invalid(self.document, ['content'], ['content.text'])
+        self.assert_paths_invalid(self.document, ['content', 'content.title'], ['content.text'])
+
+    def test_projection_applies_to_each_array_item(self):
+        self.assert_paths_invalid(self.document, ['comments.votes'], ['comments.1.votes'])
+        self.document['comments'][1]['votes'] = 4
+        blog_post_schema.validate(self.document, fields=['comments.votes'])
+
+    def test_schema_level_validators_are_skipped(self):
+        self.document.update(
+            {'creation_date': datetime(2014, 1, 1),
+             'modification_date': datetime(2013, 1, 1)})
+        blog_post_schema.validate(self.document, fields=['creation_date', 'modification_date'])
+
+    def test_projected_unknown_field(self):
+        self.document['something'] = 'extra'
+        self.assert_paths_invalid(self.document, ['something'], ['something'])
+        blog_post_schema.validate(self.document, fields=['category'])
+
+
+class TestFieldSpecs(unittest.TestCase):
+    def test_field_specs_are_normalized(self):
+        field_spec = blog_post_schema._fields_by_name['author']
+        self.assertIsInstance(field_spec, FieldSpec)
+        self.assertEqual('author', field_spec.name)
+        self.assertTrue(field_spec.required)
+        self.assertFalse(field_spec.nullable)
+        self.assertFalse(field_spec.has_default)
+        self.assertIsNone(field_spec.validation)
+
+        field_spec = blog_post_schema._fields_by_name['likes']
+        self.assertFalse(field_spec.required)
+        self.assertTrue(field_spec.nullable)
+        self.assertTrue(field_spec.has_default)
+        self.assertEqual(0, field_spec.default)
+
+    def test_field_spec_per_declared_field(self):
+        self.assertEqual(sorted(blog_post_schema.doc_spec.keys()),
+                         sorted(field_spec.name for field_spec in blog_post_schema._fields))
+
+    def test_declared_doc_spec_is_unchanged(self):
+        doc_spec = {"name": {"type": basestring, "validates": length(1)}}
+        self.assertEqual(doc_spec, Schema(doc_spec).doc_spec)
+
+    def test_no_instance_dicts(self):
+        for obj in [Schema({}), Array(int), Sample(first=1), blog_post_schema._fields[0]]:
+            self.assertFalse(hasattr(obj, '__dict__'))
+
+
+class _Unwalkable(list):
+    """A list whose items can't be iterated over."""
+    def __iter__(self):
+        raise AssertionError("The items were iterated over")
+
+
+class TestArrayLength(unittest.TestCase):
+    def setUp(self):
+        self.schema = Schema({
+            "tags":     {"type": Array(basestring), "validates": [length(1), length(max=3)]},
+            "comments": {"type": Array(Schema({"text": {"type": basestring}})), "validates": length(max=0)}
+        })
+
+    def test_length_is_merged(self):
+        self.assertEqual(Length(1, 3), self.schema._fields_by_name["tags"].length)
+        self.assertEqual(Length(None, 0), self.schema._fields_by_name["comments"].length)
+        self.assertIsNone(blog_post_schema._fields_by_name["author"].length)
+
+    def test_zero_bounds(self):
+        self.schema.validate({"tags": [u"a"], "comments": []})
+        with self.assertRaises(ValidationException) as cm:
+            self.schema.validate({"tags": [], "comments": [{"text": u"a"}]})
+        self.assertEqual({
+            "tags": "[] does not have a length of at least 1",
+            "comments": "[{'text': u'a'}] does not have a length of at most 0"
+        }, cm.exception.errors)
+
+    @patch('schemer._Validation.items')
+    def test_items_of_arrays_of_the_wrong_length_are_not_validated(self, items):
+        with self.assertRaises(ValidationException) as cm:
+            self.schema.validate({"tags": [1] * 100000, "comments": [{"text": 1}]})
+        self.assertEqual(["comments", "tags"], sorted(cm.exception.errors))
+        self.assertEqual(0, items.call_count)
+
+    def test_length_is_not_checked_when_projecting(self):
+        self.schema.validate({"comments": [{"text": u"a"}]}, fields=["comments.text"])
+
+    def test_items_of_arrays_of_the_wrong_length_are_not_examined_by_validators(self):
+        calls = []
+
+        def custom(value):
+            calls.append(value)
+
+        schema = Schema({"numbers": {"type": Array(int),
+                                     "validates": [custom, distinct(), each_item(lte(5)), length(1), length(max=2)]}})
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"numbers": _Unwalkable([9] * 20000)})
+        self.assertEqual({"numbers": length(max=2)([9] * 20000)}, cm.exception.errors)
+        self.assertEqual([], calls)
+
+
+class TestBudget(unittest.TestCase):
+    def validate(self, document, **limits):
+        with self.assertRaises(BudgetExceededException) as cm:
+            blog_post_schema.validate(document, budget=Budget(**limits))
+        return cm.exception
+
+    def test_within_budget(self):
+        blog_post_schema.validate(valid_doc(), budget=Budget(max_nodes=100, max_array_length=3, max_depth=3,
+                                                             timeout=10))
+
+    def test_invalid_budget(self):
+        with self.assertRaises(ValueError):
+            Budget(max_nodes=-1)
+
+    def test_max_nodes(self):
+        e = self.validate(valid_doc({"tags": [u"tag"] * 10}), max_nodes=20)
+        self.assertIsInstance(e, ValidationException)
+        self.assertTrue(e.truncated)
+        self.assertEqual("Validation visited more than 20 values", str(e))
+
+    def test_max_array_length(self):
+        e = self.validate(valid_doc({"tags": [u"tag"] * 1000000, "likes": "many"}), max_array_length=100)
+        self.assertEqual("tags", e.path)
+        self.assertEqual("tags has more than 100 items", str(e))
+
+    def test_max_array_length_of_array_with_length(self):
+        schema = Schema({"numbers": {"type": Array(int), "validates": length(max=1000)}})
+        with self.assertRaises(BudgetExceededException) as cm:
+            schema.validate({"numbers": range(10000)}, budget=Budget(max_array_length=100))
+        self.assertEqual("numbers has more than 100 items", str(cm.exception))
+
+    def test_max_depth_of_array_of_wrong_length(self):
+        schema = Schema({"a": {"type": Schema({"numbers": {"type": Array(int), "validates": length(max=1)}})}})
+        with self.assertRaises(BudgetExceededException) as cm:
+            schema.validate({"a": {"numbers": [1, 2]}}, budget=Budget(max_depth=1))
+        self.assertEqual("a.numbers", cm.exception.path)
+
+    def test_max_depth(self):
+        e = self.validate(valid_doc(), max_depth=2)
+        self.assertEqual(3, len(e.path.split('.')))
+        self.assertTrue(e.path.startswith("comments."))
+        self.assertIn("is nested more than 2 deep", str(e))
+
+        root = node = {"text": u"root", "replies": []}
+        for i in range(100):
+            node["replies"].append({"text": u"reply", "replies": []})
+            node = node["replies"][0]
+        with self.assertRaises(BudgetExceededException) as cm:
+            reply_schema.validate(root, budget=Budget(max_depth=50))
+        self.assertEqual(51, len(cm.exception.path.split('.')))
+
+    @patch('schemer.time')
+    def test_timeout(self, time):
+        time.time.side_effect = [100.0, 100.0, 100.1, 100.6]
+        e = self.validate(valid_doc(), timeout=0.5)
+        self.assertEqual("Validation took longer than 0.5s", str(e))
+
+    def test_errors_found_before_exceeding(self):
+        e = self.validate(valid_doc({"likes": "many", "tags": [u"tag"] * 100}), max_array_length=10)
+        self.assertIn(e.errors, [{}, {"likes": "Field should be of type <type 'int'>"}])
+
+    def test_validate_many(self):
+        results = blog_post_schema.validate_many([valid_doc(), valid_doc({"tags": [u"tag"] * 10})],
+                                                 budget=Budget(max_array_length=5))
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], BudgetExceededException)
+
+
+class TestCoercedValidation(unittest.TestCase):
+    def setUp(self):
+        self.document = valid_doc()
+        self.document.update({"likes": "12", "tags": ["blog", "5"]})
+        self.document["comments"][0]["votes"] = " 3 "
+
+    def test_values_are_coerced_in_place(self):
+        blog_post_schema.validate(self.document, coerce=True)
+        self.assertEqual(12, self.document["likes"])
+        self.assertEqual(3, self.document["comments"][0]["votes"])
+        self.assertEqual(["blog", "5"], self.document["tags"])
+
+    def test_values_are_not_coerced_by_default(self):
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document)
+        self.assertEqual(['comments.0.votes', 'likes'], sorted(cm.exception.errors.keys()))
+        self.assertEqual("12", self.document["likes"])
+
+    def test_values_which_cannot_be_coerced_fail(self):
+        self.document["likes"] = "many"
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document, coerce=True)
+        self.assertEqual(['likes'], cm.exception.errors.keys())
+        self.assertEqual("many", self.document["likes"])
+
+    def test_array_items_are_coerced(self):
+        schema = Schema({"scores": {"type": Array(float), "validates": length(1)}})
+        document = {"scores": ["1.5", 2, "x"]}
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate(document, coerce=True)
+        self.assertEqual(['scores.2'], cm.exception.errors.keys())
+        self.assertEqual([1.5, 2.0, "x"], document["scores"])
+
+    def test_validators_apply_to_coerced_values(self):
+        schema = Schema({"age": {"type": int, "validates": gte(18)}})
+        schema.validate({"age": "21"}, coerce=True)
+        with self.assertRaises(ValidationException):
+            schema.validate({"age": "12"}, coerce=True)
+
+    def test_schema_level_validators_see_coerced_values(self):
+        schema = Schema({"low": {"type": int}, "high": {"type": int}},
+                        validates=[lambda doc: None if doc["low"] <= doc["high"] else "low > high"])
+        schema.validate({"low": "9", "high": "10"}, coerce=True)
+
+
+class TestUnknownFields(unittest.TestCase):
+    def setUp(self):
+        self.document = valid_doc()
+        self.document["something"] = "extra"
+        self.document["content"]["other"] = "extra"
+        self.document["comments"][1]["other"] = "extra"
+        self.unknown = ["comments.1.other", "content.other", "something"]
+
+    def test_unknown_fields_fail_by_default(self):
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document)
+        self.assertEqual(self.unknown, sorted(cm.exception.errors.keys()))
+
+    def test_ignore_unknown_fields(self):
+        self.assertIsNone(blog_post_schema.validate(self.document, unknown='ignore'))
+
+    def test_unknown_fields_of_non_strict_schemas_can_be_errors(self):
+        schema = Schema({"name": {"type": basestring}}, strict=False)
+        schema.validate({"other": 1})
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"other": 1}, unknown='error')
+        self.assertEqual(["other"], cm.exception.errors.keys())
+
+    def test_count_unknown_fields(self):
+        self.assertEqual(self.unknown, sorted(blog_post_schema.validate(self.document, unknown='count')))
+        self.assertEqual("extra", self.document["something"])
+
+    def test_strip_unknown_fields(self):
+        self.assertEqual(self.unknown, sorted(blog_post_schema.validate(self.document, unknown='strip')))
+        self.assertNotIn("something", self.document)
+        self.assertNotIn("other", self.document["content"])
+        self.assertNotIn("other", self.document["comments"][1])
+        self.assertEqual([], blog_post_schema.validate(self.document, unknown='strip'))
+
+    def test_strip_projected_unknown_fields(self):
+        self.assertEqual(["something"], blog_post_schema.validate(
+            self.document, fields=["something", "author"], unknown='strip'))
+        self.assertNotIn("something", self.document)
+        self.assertIn("other", self.document["content"])
+
+    def test_other_failures_are_still_raised(self):
+        del self.document["author"]
+        with self.assertRaises(ValidationException) as cm:
+            blog_post_schema.validate(self.document, unknown='strip')
+        self.assertEqual(["author"], cm.exception.errors.keys())
+
+    def test_invalid_option(self):
+        with self.assertRaises(ValueError):
+            blog_post_schema.validate(self.document, unknown='delete')
+
+
+class TestPrune(unittest.TestCase):
+    def test_prune_removes_unknown_fields_in_place(self):
+        document = valid_doc()
+        document["something"] = "extra"
+        document["content"]["other"] = "extra"
+        document["comments"][1]["other"] = "extra"
+        document["comments"][1]["commenter"]["other"] = "extra"
+        document["website"] = [{"url": u"a", "name": u"b", "other": "extra"}]
+
+        removed = blog_post_schema.prune(document)
+        self.assertEqual(["comments.1.commenter.other", "comments.1.other", "content.other",
+                          "something", "website.0.other"], sorted(removed))
+        self.assertEqual({"url": u"a", "name": u"b"}, document["website"][0])
+        blog_post_schema.validate(document)
+
+    def test_prune_valid_document(self):
+        document = valid_doc()
+        self.assertEqual([], blog_post_schema.prune(document))
+        self.assertEqual(valid_doc(), document)
+
+    def test_prune_ignores_values_of_the_wrong_type(self):
+        document = {"content": "text", "comments": ["comment", None], "author": None}
+        self.assertEqual([], blog_post_schema.prune(document))
+
+    def test_prune_non_strict_schema(self):
+        schema = Schema({"name": {"type": basestring}}, strict=False)
+        document = {"name": u"bob", "other": 1}
+        self.assertEqual(["other"], schema.prune(document))
+        self.assertEqual({"name": u"bob"}, document)
+
+
+def reply_type(value):
+    return reply_schema
+
+reply_schema = Schema({
+    "text":     {"type": basestring, "required": True},
+    "replies":  {"type": Array(reply_type), "validates": length(max=2)}
+})
+
+
+class TestDeeplyNestedDocuments(unittest.TestCase):
+    depth = 5000
+
+    def thread(self):
+        root = node = {"text": u"root", "replies": []}
+        for i in range(self.depth):
+            reply = {"text": u"reply", "replies": []}
+            node["replies"].append(reply)
+            node = reply
+        return root, node
+
+    def test_validate_deeply_nested_document(self):
+        root, leaf = self.thread()
+        reply_schema.validate(root)
+
+        del leaf["text"]
+        leaf["replies"] = [{"text": u"a"}, {"text": u"b"}, {"text": 5}]
+        with self.assertRaises(ValidationException) as cm:
+            reply_schema.validate(root)
+        path = ".".join(["replies.0"] * self.depth)
+        self.assertEqual(sorted([path + ".text", path + ".replies"]), sorted(cm.exception.errors.keys()))
+
+        leaf["replies"] = [{"text": u"a"}, {"text": 5}]
+        with self.assertRaises(ValidationException) as cm:
+            reply_schema.validate(root)
+        self.assertEqual(sorted([path + ".text", path + ".replies.1.text"]), sorted(cm.exception.errors.keys()))
+
+    def test_apply_defaults_and_prune_deeply_nested_document(self):
+        schema = Schema({"value": {"type": int, "default": 0}})
+        for i in range(self.depth):
+            schema = Schema({"value": {"type": int, "default": i}, "child": {"type": schema}})
+        document = node = {}
+        for i in range(self.depth):
+            node["child"] = {"other": 1}
+            node = node["child"]
+
+        schema.apply_defaults(document)
+        self.assertEqual(0, node["value"])
+        self.assertEqual(self.depth, len(schema.prune(document)))
+        schema.validate(document)
+
+
+class TestSchemaReferences(unittest.TestCase):
+    def setUp(self):
+        from schemer.registry import SchemaRegistry
+        self.registry = SchemaRegistry()
+        self.registry.register("reply", Schema({
+            "text":     {"type": basestring, "required": True},
+            "parent":   {"type": SchemaRef("reply", self.registry)},
+            "replies":  {"type": Array(SchemaRef("reply", self.registry)), "default": []}
+        }))
+        self.schema = self.registry["reply"]
+
+    def test_self_referential_schema(self):
+        self.schema.validate({"text": u"a", "replies": [{"text": u"b", "replies": [{"text": u"c"}]}],
+                              "parent": {"text": u"z"}})
+        with self.assertRaises(ValidationException) as cm:
+            self.schema.validate({"text": u"a", "replies": [{"replies": [{"text": 5}]}], "parent": []})
+        self.assertEqual(['parent', 'replies.0.replies.0.text', 'replies.0.text'],
+                         sorted(cm.exception.errors.keys()))
+
+    def test_references_are_resolved_once(self):
+        registry = Mock()
+        registry.get.return_value = Schema({"text": {"type": basestring}})
+        schema = Schema({"parent": {"type": SchemaRef("reply", registry)}})
+        schema.validate({"parent": {"text": u"a"}})
+        schema.validate({"parent": {"text": u"b"}})
+        registry.get.assert_called_once_with("reply")
+
+    def test_defaults_and_prune_follow_references(self):
+        document = {"text": u"a", "parent": {"text": u"b", "other": 1}}
+        self.schema.apply_defaults(document)
+        self.assertEqual([], document["parent"]["replies"])
+        self.assertEqual(["parent.other"], self.schema.prune(document))
+
+    def test_unregistered_reference(self):
+        schema = Schema({"child": {"type": SchemaRef("missing", self.registry)}})
+        schema.validate({})
+        with self.assertRaises(SchemaFormatException):
+            schema.validate({"child": {}})
+
+    def test_default_registry(self):
+        from schemer.registry import default_registry
+        schema = Schema({"child": {"type": SchemaRef("default_registry_test")}})
+        default_registry.register("default_registry_test", Schema({"name": {"type": basestring}}))
+        try:
+            with self.assertRaises(ValidationException):
+                schema.validate({"child": {"name": 5}})
+        finally:
+            del default_registry._schemas["default_registry_test"]
+
+    def test_reference_default_must_be_dict(self):
+        with self.assertRaises(SchemaFormatException):
+            Schema({"child": {"type": SchemaRef("reply", self.registry), "default": 5}})
+        with self.assertRaises(SchemaFormatException):
+            Schema({"child": {"type": SchemaRef("reply", self.registry), "validates": length(1)}})
+
+
+click_schema = Schema({
+    "kind":     {"type": basestring, "required": True},
+    "x":        {"type": int, "required": True},
+    "y":        {"type": int, "required": True}
+})
+
+key_schema = Schema({
+    "kind":     {"type": basestring, "required": True},
+    "key":      {"type": basestring, "required": True},
+    "repeat":   {"type": bool, "default": False}
+})
+
+event_schema = Schema({
+    "first":    {"type": OneOf("kind", {"click": click_schema, "key": key_schema})},
+    "events":   {"type": Array(OneOf("kind", {"click": click_schema, "key": key_schema}))}
+})
+
+
+class TestOneOf(unittest.TestCase):
+    def assert_paths_invalid(self, document, paths):
+        with self.assertRaises(ValidationException) as cm:
+            event_schema.validate(document)
+        self.assertEqual(sorted(paths), sorted(cm.exception.errors.keys()))
+        return cm.exception.errors
+
+    def test_valid_documents(self):
+        event_schema.validate({
+            "first": {"kind": "click", "x": 1, "y": 2},
+            "events": [{"kind": "key", "key": "a"}, {"kind": "click", "x": 3, "y": 4}]
+        })
+
+    def test_documents_are_validated_against_their_schema(self):
+        self.assert_paths_invalid({
+            "first": {"kind": "click", "x": 1},
+            "events": [{"kind": "key", "key": 5}, {"kind": "click", "x": 3, "y": 4, "key": "a"}]
+        }, ["first.y", "events.0.key", "events.1.key"])
+
+    def test_unknown_and_missing_discriminators(self):
+        errors = self.assert_paths_invalid({
+            "first": {"kind": "scroll"},
+            "events": [{"key": "a"}, {"kind": ["unhashable"]}]
+        }, ["first.kind", "events.0.kind", "events.1.kind"])
+        self.assertEqual("'scroll' is not a known kind (expected one of 'click', 'key')", errors["first.kind"])
+        self.assertEqual("events.0.kind is required.", errors["events.0.kind"])
+
+    def test_values_which_are_not_documents(self):
+        self.assert_paths_invalid({"first": "click", "events": ["click"]}, ["first", "events.0"])
+
+    def test_apply_defaults_and_prune(self):
+        document = {"first": {"kind": "key", "key": "a", "other": 1},
+                    "events": [{"kind": "key", "key": "b"}, {"kind": "unknown"}]}
+        event_schema.apply_defaults(document)
+        self.assertFalse(document["first"]["repeat"])
+        self.assertFalse(document["events"][0]["repeat"])
+        self.assertEqual(["first.other"], event_schema.prune(document))
+
+    def test_schemas_must_declare_the_discriminator(self):
+        with self.assertRaises(SchemaFormatException):
+            Schema({"event": {"type": OneOf("type", {"click": click_schema})}})
+        with self.assertRaises(SchemaFormatException):
+            Schema({"event": {"type": Array(OneOf("kind", {"click": int}))}})
+        with self.assertRaises(SchemaFormatException):
+            Schema({"event": {"type": OneOf("kind", {})}})
@@ -0,0 +1,253 @@
+from schemer import Schema, Array, Mixed, SchemaRef, OneOf
+from schemer.registry import SchemaRegistry
+from schemer.serialization import Serializer, register_type, _Compiler, _DUMPERS, _LOADERS
+from schemer.coercion import FixedOffset
+from schemer.type_checks import MAX_CACHED_TYPES
+from schemer.exceptions import ValidationException, SchemaFormatException
+from schemer.validators import gte
+from datetime import datetime
+from decimal import Decimal
+from sample import blog_post_schema, valid_doc
+import json
+import threading
+import time
+import unittest
+from mock import patch
+
+
+event_schema = Schema({
+    "name":     {"type": basestring, "required": True},
+    "start":    {"type": datetime, "required": True},
+    "dates":    {"type": Array(datetime)},
+    "extra":    {"type": Mixed(basestring, datetime)},
+    "attendees": {"type": Array(Schema({
+        "name":     {"type": basestring},
+        "joined":   {"type": datetime}
+    }))},
+    "count":    {"type": int, "validates": gte(0)}
+}, strict=False)
+
+
+class TestDump(unittest.TestCase):
+    def setUp(self):
+        self.serializer = Serializer(event_schema)
+
+    def test_dump_converts_declared_types(self):
+        event = {"name": u"Launch", "start": datetime(2014, 3, 4, 5, 6, 7),
+                 "dates": [datetime(2014, 3, 5), datetime(2014, 3, 6, 0, 0, 0, 500)],
+                 "attendees": [{"name": u"Bob", "joined": datetime(2014, 1, 1)}],
+                 "count": 1}
+        self.assertEqual(
+            {"name": u"Launch", "start": "2014-03-04T05:06:07",
+             "dates": ["2014-03-05T00:00:00", "2014-03-06T00:00:00.000500"],
+             "attendees": [{"name": u"Bob", "joined": "2014-01-01T00:00:00"}],
+             "count": 1},
+            self.serializer.dump(event))
+
+    def test_dump_does_not_modify_document(self):
+        event = {"name": u"Launch", "start": datetime(2014, 3, 4)}
+        self.serializer.dump(event)
+        self.assertEqual(datetime(2014, 3, 4), event["start"])
+
+    def test_dump_converts_undeclared_and_mixed_values_by_type(self):
+        event = {"name": u"Launch", "start": datetime(2014, 3, 4), "extra": datetime(2014, 3, 5),
+                 "other": {"when": [datetime(2014, 3, 6)]}}
+        dumped = self.serializer.dump(event)
+        self.assertEqual("2014-03-05T00:00:00", dumped["extra"])
+        self.assertEqual({"when": ["2014-03-06T00:00:00"]}, dumped["other"])
+        json.dumps(dumped)
+
+    def test_dump_with_validation(self):
+        event = {"start": u"today", "dates": [u"tomorrow"], "count": -1,
+                 "attendees": [{"joined": None}, 5]}
+        with self.assertRaises(ValidationException) as cm:
+            self.serializer.dump(event, validate=True)
+        self.assertEqual(['attendees.1', 'count', 'dates.0', 'name', 'start'],
+                         sorted(cm.exception.errors.keys()))
+
+    def test_blog_post_round_trip(self):
+        serializer = Serializer(blog_post_schema)
+        document = valid_doc()
+        dumped = serializer.dump(document, validate=True)
+        json.dumps(dumped)
+        self.assertEqual(document, serializer.load(dumped, validate=True))
+
+    def test_errors_match_validate(self):
+        document = valid_doc()
+        document['likes'] = None
+        document['external_code'] = None
+        document['tags'] = []
+        del document['comments'][0]['commenter']
+        document['website'] = [{'url': u'a'}]
+        with self.assertRaises(ValidationException) as expected:
+            blog_post_schema.validate(document)
+        with self.assertRaises(ValidationException) as cm:
+            Serializer(blog_post_schema).dump(document, validate=True)
+        self.assertEqual(expected.exception.errors, cm.exception.errors)
+
+    def test_embedded_document_errors_match_validate(self):
+        document = valid_doc()
+        document['content'] = u"Text"
+        document['comments'][0] = 5
+        with self.assertRaises(ValidationException) as expected:
+            blog_post_schema.validate(document)
+        with self.assertRaises(ValidationException) as cm:
+            Serializer(blog_post_schema).dump(document, validate=True)
+        self.assertEqual(expected.exception.errors, cm.exception.errors)
+        self.assertEqual("content should be an embedded document", cm.exception.errors['content'])
+
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        self.serializer = Serializer(event_schema)
+
+    def test_load_converts_declared_types(self):
+        data = {"name": u"Launch", "start": "2014-03-04T05:06:07",
+                "dates": ["2014-03-06T00:00:00.000500"],
+                "attendees": [{"joined": "2014-01-01T00:00:00"}]}
+        self.assertEqual(
+            {"name": u"Launch", "start": datetime(2014, 3, 4, 5, 6, 7),
+             "dates": [datetime(2014, 3, 6, 0, 0, 0, 500)],
+             "attendees": [{"joined": datetime(2014, 1, 1)}]},
+            self.serializer.load(data, validate=True))
+
+    def test_load_leaves_unconvertible_values(self):
+        data = {"name": u"Launch", "start": "whenever"}
+        self.assertEqual(data, self.serializer.load(data))
+        with self.assertRaises(ValidationException) as cm:
+            self.serializer.load(data, validate=True)
+        self.assertEqual(['start'], cm.exception.errors.keys())
+
+    def test_time_zone_aware_datetimes_round_trip(self):
+        start = datetime(2014, 3, 4, 5, 6, 7, tzinfo=FixedOffset(-330))
+        dumped = self.serializer.dump({"name": u"Launch", "start": start})
+        self.assertEqual("2014-03-04T05:06:07-05:30", dumped["start"])
+        loaded = self.serializer.load(dumped, validate=True)
+        self.assertEqual(start, loaded["start"])
+        self.assertEqual(start.utcoffset(), loaded["start"].utcoffset())
+
+        loaded = self.serializer.load({"name": u"Launch", "start": "2014-03-04T05:06:07Z"}, validate=True)
+        self.assertEqual(datetime(2014, 3, 4, 5, 6, 7, tzinfo=FixedOffset(0)), loaded["start"])
+
+    def test_dynamic_type_function_failures(self):
+        serializer = Serializer(blog_post_schema)
+        data = serializer.dump(valid_doc())
+        data['author'] = u"John"
+        self.assertEqual(u"John", serializer.load(data)['author'])
+        with self.assertRaises(SchemaFormatException) as expected:
+            blog_post_schema.validate(serializer.load(data))
+        with self.assertRaises(SchemaFormatException) as cm:
+            serializer.load(data, validate=True)
+        self.assertEqual(str(expected.exception), str(cm.exception))
+
+    def test_schema_level_validators_apply_to_loaded_document(self):
+        serializer = Serializer(blog_post_schema)
+        data = serializer.dump(valid_doc())
+        data.update({'creation_date': "2014-01-01T00:00:00",
+                     'modification_date': "2013-01-01T00:00:00",
+                     'final_date': "2015-01-01T00:00:00"})
+        with self.assertRaises(ValidationException) as cm:
+            serializer.load(data, validate=True)
+        self.assertEqual([''], cm.exception.errors.keys())
+
+
+class TestRegisterType(unittest.TestCase):
+    def tearDown(self):
+        _DUMPERS.pop(Decimal, None)
+        _LOADERS.pop(Decimal, None)
+
+    def test_registered_type(self):
+        register_type(Decimal, str, Decimal)
+        serializer = Serializer(Schema({"price": {"type": Decimal}}))
+        self.assertEqual({"price": "1.50"}, serializer.dump({"price": Decimal("1.50")}))
+        self.assertEqual({"price": Decimal("1.50")}, serializer.load({"price": "1.50"}))
+
+    def test_types_registered_for_subclasses(self):
+        class Stamp(datetime):
+            pass
+        register_type(Stamp, lambda stamp: stamp.strftime("%s"), None)
+        try:
+            serializer = Serializer(Schema({"at": {"type": Stamp}, "when": {"type": datetime}}, strict=False))
+            dumped = serializer.dump({"at": Stamp(2014, 1, 1), "when": Stamp(2014, 1, 1),
+                                      "other": Stamp(2014, 1, 1)})
+            self.assertEqual(Stamp(2014, 1, 1).strftime("%s"), dumped["at"])
+            self.assertEqual(dumped["at"], dumped["other"])
+            self.assertEqual("2014-01-01T00:00:00", dumped["when"])
+        finally:
+            _DUMPERS.pop(Stamp)
+            _LOADERS.pop(Stamp)
+
+
+class TestSchemaReferences(unittest.TestCase):
+    def test_self_referential_schema(self):
+        registry = SchemaRegistry()
+        registry.register("node", Schema({
+            "at":       {"type": datetime},
+            "children": {"type": Array(SchemaRef("node", registry))}
+        }))
+        serializer = Serializer(registry["node"])
+        node = {"at": datetime(2014, 1, 1), "children": [{"at": datetime(2014, 1, 2), "children": []}]}
+        dumped = serializer.dump(node, validate=True)
+        self.assertEqual("2014-01-02T00:00:00", dumped["children"][0]["at"])
+        self.assertEqual(node, serializer.load(dumped, validate=True))
+
+
+class TestOneOf(unittest.TestCase):
+    def test_dump_and_load_by_discriminator(self):
+        schema = Schema({"events": {"type": Array(OneOf("kind", {
+            "start": Schema({"kind": {"type": basestring}, "at": {"type": datetime}}),
+            "stop": Schema({"kind": {"type": basestring}, "code": {"type": int}})
+        }))}})
+        serializer = Serializer(schema)
+        document = {"events": [{"kind": "start", "at": datetime(2014, 1, 1)}, {"kind": "stop", "code": 1}]}
+        dumped = serializer.dump(document, validate=True)
+        self.assertEqual({"events": [{"kind": "start", "at": "2014-01-01T00:00:00"}, {"kind": "stop", "code": 1}]},
+                         dumped)
+        self.assertEqual(document, serializer.load(dumped, validate=True))
+
+        with self.assertRaises(ValidationException) as cm:
+            serializer.dump({"events": [{"kind": "pause"}]}, validate=True)
+        self.assertEqual(["events.0.kind"], cm.exception.errors.keys())
+
+
+class TestConcurrentUse(unittest.TestCase):
+    def test_first_use_from_several_threads(self):
+        def slow_schema(value):
+            time.sleep(0.01)
+            return Schema({"kind": {"type": basestring}, "at": {"type": datetime}})
+        schema = Schema({
+            "e": {"type": OneOf("kind", {"start": Schema({"kind": {"type": basestring}, "at": {"type": datetime}})})},
+            "d": {"type": slow_schema}
+        })
+        serializer = Serializer(schema)
+        document = {"e": {"kind": "start", "at": datetime(2014, 1, 1)},
+                    "d": {"kind": "start", "at": datetime(2014, 1, 1)}}
+        results, failures = [], []
+
+        def work():
+            try:
+                results.append(serializer.dump(document, validate=True))
+            except Exception as e:
+                failures.append(e)
+        field = _Compiler._field
+
+        def slow_field(compiler, schema, field_spec):
+            time.sleep(0.01)
+            return field(compiler, schema, field_spec)
+        threads = [threading.Thread(target=work) for i in range(8)]
+        with patch.object(_Compiler, '_field', slow_field):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual([], failures)
+        self.assertEqual(8, len(results))
+
+    def test_types_returned_by_dynamic_functions_are_not_all_cached(self):
+        schema = Schema({"d": {"type": lambda value: Schema({"at": {"type": datetime}})}})
+        compiler = _Compiler(schema, _DUMPERS, False)
+        dump = compiler.compile(schema)
+        for i in range(MAX_CACHED_TYPES * 2):
+            self.assertEqual({"d": {"at": "2014-01-01T00:00:00"}}, dump({"d": {"at": datetime(2014, 1, 1)}}, '', None))
+        self.assertEqual(MAX_CACHED_TYPES, len([key for key in compiler._compiled if key[0] is not schema
+                                                and isinstance(key[0], Schema)]))
@@ -0,0 +1,107 @@
+from schemer import Schema, Array, Mixed
+from schemer.bson_reader import validate_bson
+from schemer.columnar import validate_columns
+from schemer.exceptions import ValidationException
+from schemer.serialization import Serializer
+from schemer.type_checks import register_type_check, type_check, _CHECKS, MAX_CACHED_TYPES
+from abc import ABCMeta
+from datetime import datetime
+from mock import Mock
+from bson_reader_test import encode
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Timestamp(datetime):
+    pass
+
+
+class Legacy:
+    pass
+
+
+class TestTypeCheck(unittest.TestCase):
+    def tearDown(self):
+        _CHECKS.pop(datetime, None)
+        _CHECKS.pop(int, None)
+
+    def test_isinstance_is_used_for_ordinary_types(self):
+        self.assertIsNone(type_check(int))
+        self.assertIsNone(type_check(basestring))
+        self.assertIsNone(type_check(Legacy))
+
+    def test_mixed_types_are_checked_once_per_type(self):
+        mixed = Mixed(int, basestring)
+        check = type_check(mixed)
+        self.assertIs(check, type_check(mixed))
+        self.assertIsNotNone(check)
+
+        self.assertTrue(check(1))
+        self.assertTrue(check(u"a"))
+        self.assertFalse(check(1.5))
+        self.assertFalse(check(None))
+
+        instancecheck = Mock(return_value=True)
+        type(mixed).__instancecheck__ = instancecheck
+        self.assertTrue(check(2))
+        self.assertFalse(check(2.5))
+        self.assertEqual(0, instancecheck.call_count)
+
+    def test_abstract_base_classes(self):
+        class Sized(object):
+            __metaclass__ = ABCMeta
+        Sized.register(list)
+        check = type_check(Sized)
+        self.assertTrue(check([]))
+        self.assertFalse(check({}))
+
+    def test_cache_is_bounded(self):
+        mixed = Mixed(int, Legacy)
+        check = type_check(mixed)
+        for i in range(MAX_CACHED_TYPES * 2):
+            self.assertFalse(check(type('Type{}'.format(i), (object,), {})()))
+        self.assertTrue(check(Legacy()))
+        self.assertFalse(check(Mock()))
+
+    def test_registered_checks(self):
+        exact = lambda value: type(value) is datetime
+        register_type_check(datetime, exact)
+        self.assertIs(exact, type_check(datetime))
+
+        schema = Schema({"created": {"type": datetime}, "edits": {"type": Array(datetime)}})
+        schema.validate({"created": datetime(2012, 4, 5), "edits": [datetime(2012, 4, 6)]})
+        with self.assertRaises(ValidationException) as cm:
+            schema.validate({"created": Timestamp(2012, 4, 5), "edits": [Timestamp(2012, 4, 6)]})
+        self.assertEqual(["created", "edits.0"], sorted(cm.exception.errors))
+
+    def test_validation_with_mixed_types(self):
+        schema = Schema({"id": {"type": Mixed(int, basestring)}, "ids": {"type": Array(Mixed(int, basestring))}})
+        for i in range(2):
+            schema.validate({"id": 1, "ids": [1, u"a"]})
+            with self.assertRaises(ValidationException) as cm:
+                schema.validate({"id": 1.5, "ids": [1, 2.5]})
+            self.assertEqual(["id", "ids.1"], sorted(cm.exception.errors))
+
+    def test_registered_checks_are_used_by_every_validation(self):
+        spec = {"n": {"type": int}, "ns": {"type": Array(int)}}
+        document = {"n": True, "ns": [1, True]}
+        schema = Schema(spec)
+        for validate in (schema.validate, lambda document: Serializer(schema).dump(document, validate=True),
+                         lambda document: validate_bson(schema, encode(document))):
+            validate(document)
+        self.assertEqual({}, validate_columns(schema, {"n": [True, 1]}))
+
+        register_type_check(int, lambda value: type(value) is int)
+        schema = Schema(spec)
+        for validate in (schema.validate, lambda document: Serializer(schema).dump(document, validate=True),
+                         lambda document: validate_bson(schema, encode(document))):
+            with self.assertRaises(ValidationException) as cm:
+                validate(document)
+            self.assertEqual(["n", "ns.1"], sorted(cm.exception.errors))
+        self.assertEqual({"n": [0]}, validate_columns(schema, {"n": [True, 1]}))
+        if numpy is not None:
+            self.assertEqual({"n": [0, 1]}, validate_columns(schema, {"n": numpy.array([True, False])}))
@@ -1,5 +1,9 @@
 from schemer.validators import (one_of, gte, lte, gt, lt, between,
-    length, match, is_email, is_url, each_item, distinct)
+    length, match, is_email, is_url, each_item, distinct, chain, Chain, Interval, Length)
+from schemer.validators import Validator
+from schemer import Schema
+from schemer.exceptions import SchemaFormatException
+import pickle
 import unittest
 
 
@@ -118,6 +122,17 @@ class TestLen(unittest.TestCase):
         self.assertIsNone(validator('abcde'))
         self.assertEqual("'abcdef' does not have a length of at most 5", self.validator('abcdef'))
 
+    def test_zero_bounds(self):
+        self.assertEqual("'a' does not have a length of at most 0", length(max=0)('a'))
+        self.assertIsNone(length(max=0)(''))
+        self.assertIsNone(length(0, 1)([]))
+        self.assertEqual("[1, 2] does not have a length of at most 1", length(0, 1)([1, 2]))
+
+    def test_long_values_are_abbreviated(self):
+        self.assertEqual("[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, ... (1000 items)]"
+                         " does not have a length of at most 5", self.validator(range(1000)))
+        self.assertEqual("(0, 1, 2, 3, 4, 5, 6) does not have a length of at most 5", self.validator(tuple(range(7))))
+
 
 class TestMatch(unittest.TestCase):
     def setUp(self):
@@ -211,3 +226,104 @@ class TestDistinct(unittest.TestCase):
             "[{'a': 1}, {'a': 1}, {'a': 3}] is not a distinct set of values",
             self.validator([{'a': 1}, {'a': 1}, {'a': 3}]))
 
+
+
+class TestValidatorObjects(unittest.TestCase):
+    def test_subclass_without_call_is_rejected(self):
+        class Incomplete(Validator):
+            __slots__ = ()
+            kind = 'incomplete'
+        self.assertFalse(callable(Incomplete()))
+        with self.assertRaises(SchemaFormatException):
+            Schema({"name": {"type": basestring, "validates": Incomplete()}})
+
+    def test_kind_and_args(self):
+        self.assertEqual(('gte', (3,)), (gte(3).kind, gte(3).args))
+        self.assertEqual(('between', (1, 5)), (between(1, 5).kind, between(1, 5).args))
+        self.assertEqual(('one_of', (['a', 'b'],)), (one_of('a', 'b').kind, one_of('a', 'b').args))
+        self.assertEqual(('length', (1, None)), (length(1).kind, length(1).args))
+        self.assertEqual(('match', ('^a',)), (match('^a').kind, match('^a').args))
+        self.assertEqual(('is_url', ()), (is_url().kind, is_url().args))
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            gte(3).something = True
+
+    def test_equality(self):
+        self.assertEqual(gte(3), gte(3))
+        self.assertNotEqual(gte(3), gte(4))
+        self.assertNotEqual(gte(3), lte(3))
+        self.assertEqual(hash(one_of('a', 'b')), hash(one_of(['a', 'b'])))
+
+    def test_repr(self):
+        self.assertEqual("between(1, 5)", repr(between(1, 5)))
+        self.assertEqual("each_item(gte(1))", repr(each_item(gte(1))))
+
+    def test_pickle(self):
+        for validator in [one_of('a', 'b'), gte(1), between(1, 2), length(1, 3),
+                          match('^a'), is_email(), each_item(lte(3)), distinct()]:
+            for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+                copy = pickle.loads(pickle.dumps(validator, protocol))
+                self.assertEqual(validator, copy)
+        self.assertEqual("'b' does not match the pattern '^a'",
+                         pickle.loads(pickle.dumps(match('^a')))('b'))
+
+
+class TestChain(unittest.TestCase):
+    def test_single_validator_is_not_chained(self):
+        validator = gte(1)
+        self.assertIs(validator, chain(validator))
+        self.assertIs(validator, chain([validator]))
+
+    def test_duplicates_are_removed(self):
+        validator = gte(1)
+        self.assertIs(validator, chain([validator, gte(1)]))
+        self.assertEqual((gte(1), lte(3)), chain([gte(1), lte(3), gte(1)]).validators)
+
+    def test_bounds_are_fused_into_an_interval(self):
+        validator = chain([gte(0), lte(10), gt(2), between(1, 8), lt(8)])
+        self.assertEqual((Interval(2, False, 8, False),), validator._checks)
+        for value in [3, 5, 7.9]:
+            self.assertIsNone(validator(value))
+        for value in [-1, 2, 8, 11]:
+            self.assertIsNotNone(validator(value))
+
+    def test_incomparable_bounds_are_not_fused(self):
+        validator = chain([gte('a'), lte(10)])
+        self.assertEqual((gte('a'), lte(10)), validator._checks)
+
+    def test_lengths_are_merged(self):
+        validator = chain([length(1, 10), length(2), length(max=5)])
+        self.assertEqual((Length(2, 5),), validator._checks)
+        self.assertIsNone(validator('abc'))
+        self.assertIsNotNone(validator('a'))
+        self.assertIsNotNone(validator('abcdef'))
+
+    def test_zero_lengths_are_merged(self):
+        self.assertEqual((Length(0, 0),), chain([length(0), length(max=0)])._checks)
+        self.assertEqual((Length(None, 0),), chain([length(max=0), length(max=3)])._checks)
+
+    def test_cheap_checks_first(self):
+        def custom(value):
+            pass
+        validator = chain([is_email(), custom, one_of('a@b.com'), lte('z')])
+        self.assertEqual([lte('z'), one_of('a@b.com'), custom, is_email()], list(validator._checks))
+
+    def test_first_error_is_returned(self):
+        validator = chain([gte(0), lte(10), length(max=2)])
+        self.assertEqual("-1 is not greater than or equal to 0", validator(-1))
+        self.assertEqual("11 is not less than or equal to 10", validator(11))
+
+        validator = chain([match('^a'), length(max=2)])
+        self.assertEqual("'bcd' does not match the pattern '^a'", validator('bcd'))
+        self.assertEqual("'abc' does not have a length of at most 2", validator('abc'))
+
+    def test_first_error_of_overlapping_bounds(self):
+        validator = chain([gte(0), gt(5)])
+        self.assertEqual("-1 is not greater than or equal to 0", validator(-1))
+        self.assertEqual("3 is not greater than 5", validator(3))
+
+    def test_pickle(self):
+        validator = chain([gte(0), lte(10), match('^1')])
+        self.assertEqual(validator, pickle.loads(pickle.dumps(validator)))
+        self.assertEqual("11 is not less than or equal to 10", pickle.loads(pickle.dumps(validator))(11))